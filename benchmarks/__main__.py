@@ -0,0 +1,63 @@
+# SPDX-FileCopyrightText: (c) 2022 Artëm IG <github.com/rtmigo>
+# SPDX-License-Identifier: BSD-3-Clause
+
+"""Runs the benchmarks and compares the results with `baselines.json`.
+
+    python -m benchmarks                      # all benchmarks
+    python -m benchmarks overhead micro       # only the listed groups
+    python -m benchmarks --update-baselines   # store the current results
+
+Exits with code 1 if any result is worse than its baseline multiplied
+by the tolerance.
+"""
+
+import argparse
+import sys
+
+from benchmarks import bench_install, bench_integrity, bench_micro, \
+    bench_modindex, bench_overhead, bench_pack
+from benchmarks.common import Report, load_baselines, save_baselines
+
+GROUPS = ["overhead", "micro", "pack", "modindex", "install",
+          "integrity"]
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks")
+    parser.add_argument("groups", nargs="*", metavar="GROUP",
+                        help=f"one of {', '.join(GROUPS)}")
+    parser.add_argument("--warmup", type=int, default=3)
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--update-baselines", action="store_true")
+    ns = parser.parse_args()
+    groups = ns.groups or GROUPS
+    for group in groups:
+        if group not in GROUPS:
+            parser.error(f"unknown group: {group}")
+
+    report = Report(load_baselines())
+    if "overhead" in groups:
+        bench_overhead.run(report, warmup=ns.warmup, repeat=ns.repeat)
+    if "micro" in groups:
+        bench_micro.run(report, repeat=ns.repeat)
+    if "pack" in groups:
+        bench_pack.run(report, warmup=ns.warmup, repeat=ns.repeat)
+    if "modindex" in groups:
+        bench_modindex.run(report, repeat=ns.repeat)
+    if "install" in groups:
+        bench_install.run(report, warmup=ns.warmup, repeat=ns.repeat)
+    if "integrity" in groups:
+        bench_integrity.run(report, repeat=ns.repeat)
+
+    if ns.update_baselines:
+        save_baselines(report.updated_baselines())
+        print("Baselines updated.")
+        return 0
+    if report.regressions:
+        print(f"Regressions: {', '.join(report.regressions)}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
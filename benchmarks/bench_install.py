@@ -0,0 +1,101 @@
+# SPDX-FileCopyrightText: (c) 2022 Artëm IG <github.com/rtmigo>
+# SPDX-License-Identifier: BSD-3-Clause
+
+"""Compares installing a set of downloaded wheels with pip and with
+`vien install-wheels`.
+
+Each run installs the synthetic wheels into a fresh clone of an empty
+environment, so both installers do the whole work. Pip also resolves
+nothing (`--no-deps --no-index`), and both byte-compile the modules.
+"""
+
+from __future__ import annotations
+
+import shutil
+import subprocess
+import sys
+import time
+import zipfile
+from pathlib import Path
+from typing import Callable, List
+
+from benchmarks.bench_overhead import Sandbox
+from benchmarks.common import Report, measure_pair
+from vien._clone import clone_venv
+
+WHEELS = 200
+MODULES = 5
+
+# installing 200 wheels takes seconds, so fewer runs are enough
+MAX_REPEAT = 5
+
+
+def make_wheels(directory: Path) -> List[Path]:
+    result = []
+    for w in range(WHEELS):
+        name = f"bench_wheel_{w}"
+        dist_info = f"{name}-1.0.dist-info"
+        wheel = directory / f"{name}-1.0-py3-none-any.whl"
+        with zipfile.ZipFile(str(wheel), "w", zipfile.ZIP_DEFLATED) as z:
+            z.writestr(f"{name}/__init__.py", "def main():\n    pass\n")
+            for m in range(MODULES):
+                z.writestr(f"{name}/mod_{m}.py",
+                           "\n".join(f"def func_{i}(x):\n    return x + {i}"
+                                     for i in range(50)) + "\n")
+            z.writestr(f"{dist_info}/METADATA",
+                       f"Metadata-Version: 2.1\nName: {name}\nVersion: 1.0\n")
+            z.writestr(f"{dist_info}/WHEEL",
+                       "Wheel-Version: 1.0\nGenerator: bench\n"
+                       "Root-Is-Purelib: true\nTag: py3-none-any\n")
+            z.writestr(f"{dist_info}/entry_points.txt",
+                       f"[console_scripts]\n{name} = {name}:main\n")
+            z.writestr(f"{dist_info}/RECORD", "")
+        result.append(wheel)
+    return result
+
+
+def _timed_install(sandbox: Sandbox, args: Callable[[Path], List[str]]
+                   ) -> Callable[[], float]:
+    def run() -> float:
+        target = sandbox.temp_dir / "viendir" / "target_venv"
+        if target.exists():
+            shutil.rmtree(target)
+        clone_venv(sandbox.venv_dir, target)
+        t0 = time.perf_counter()
+        subprocess.run(args(target), env=sandbox.env, check=True,
+                       stdout=subprocess.DEVNULL, cwd=sandbox.project_dir)
+        return time.perf_counter() - t0
+
+    return run
+
+
+def run(report: Report, warmup: int, repeat: int) -> None:
+    print(f"Installing {WHEELS} downloaded wheels:")
+    sandbox = Sandbox()
+    try:
+        wheels_dir = sandbox.temp_dir / "wheels"
+        wheels_dir.mkdir()
+        wheels = [str(w) for w in make_wheels(wheels_dir)]
+        # the target environment is the one of the project "target"
+        (sandbox.temp_dir / "target").mkdir()
+
+        def pip_args(target: Path) -> List[str]:
+            return [sys.executable, "-m", "pip", "--python",
+                    str(target / "bin" / "python"), "install", "--no-deps",
+                    "--no-index", "--disable-pip-version-check", "--quiet",
+                    *wheels]
+
+        def vien_args(target: Path) -> List[str]:
+            return sandbox.vien("-p", str(sandbox.temp_dir / "target"),
+                                "install-wheels", str(wheels_dir))
+
+        diff = measure_pair(_timed_install(sandbox, pip_args),
+                            _timed_install(sandbox, vien_args),
+                            warmup=min(warmup, 1),
+                            repeat=min(repeat, MAX_REPEAT))
+        report.add("install_ms", "pip install", diff.a.mean, diff.a.ci95,
+                   unit="ms", scale=1000)
+        report.add("install_ms", "vien install-wheels", diff.b.mean,
+                   diff.b.ci95, unit="ms", scale=1000)
+    finally:
+        sandbox.close()
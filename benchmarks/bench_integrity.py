@@ -0,0 +1,65 @@
+# SPDX-FileCopyrightText: (c) 2022 Artëm IG <github.com/rtmigo>
+# SPDX-License-Identifier: BSD-3-Clause
+
+"""Measures `vien verify` and `vien fingerprint` of an unchanged
+environment with many files, when the hashes are already cached."""
+
+from __future__ import annotations
+
+import base64
+import hashlib
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from benchmarks.common import Report, measure_function
+from vien._compile import site_packages_dirs
+from vien._integrity import _RACY_NS, verify, fingerprint
+
+DISTRIBUTIONS = 100
+FILES_PER_DISTRIBUTION = 1000
+
+# each call takes about a second
+MAX_REPEAT = 5
+
+
+def make_distributions(site: Path) -> None:
+    for d in range(DISTRIBUTIONS):
+        name = f"bench_dist_{d}"
+        rows = []
+        (site / name).mkdir()
+        for i in range(FILES_PER_DISTRIBUTION):
+            data = f"VALUE = {i}\n".encode()
+            (site / name / f"mod_{i}.py").write_bytes(data)
+            digest = base64.urlsafe_b64encode(
+                hashlib.sha256(data).digest()).decode().rstrip("=")
+            rows.append(f"{name}/mod_{i}.py,sha256={digest},{len(data)}")
+        dist_info = site / f"{name}-1.0.dist-info"
+        dist_info.mkdir()
+        rows.append(f"{dist_info.name}/RECORD,,")
+        (dist_info / "RECORD").write_text("\n".join(rows) + "\n")
+
+
+def run(report: Report, repeat: int) -> None:
+    files = DISTRIBUTIONS * FILES_PER_DISTRIBUTION
+    print(f"Checking an unchanged environment of {files} files:")
+    temp_dir = Path(tempfile.mkdtemp())
+    try:
+        venv_dir = temp_dir / "venv"
+        subprocess.run([sys.executable, "-m", "venv", "--without-pip",
+                        str(venv_dir)], check=True)
+        make_distributions(site_packages_dirs(venv_dir)[0])
+        # the files changed just now are never cached
+        time.sleep(_RACY_NS / 1e9)
+        assert not verify(venv_dir).problems
+        fingerprint(venv_dir)
+        for title, func in [("verify", lambda: verify(venv_dir)),
+                            ("fingerprint", lambda: fingerprint(venv_dir))]:
+            sample = measure_function(func, repeat=min(repeat, MAX_REPEAT))
+            report.add("integrity_ms", title, sample.mean, sample.ci95,
+                       unit="ms", scale=1000)
+    finally:
+        shutil.rmtree(temp_dir)
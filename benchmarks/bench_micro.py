@@ -0,0 +1,36 @@
+# SPDX-FileCopyrightText: (c) 2022 Artëm IG <github.com/rtmigo>
+# SPDX-License-Identifier: BSD-3-Clause
+
+"""Micro-benchmarks of the code that runs on each `vien call`."""
+
+from __future__ import annotations
+
+import tempfile
+from pathlib import Path
+from typing import Callable, Dict
+
+from benchmarks.common import Report, measure_function
+from vien._core import child_env
+from vien._parsed_args import ParsedArgs
+from vien._parsed_call import ParsedCall
+
+
+def functions() -> Dict[str, Callable[[], object]]:
+    call_args = ["-p", "..", "call", "-B", "-m", "pkg/main.py", "arg1", "arg2"]
+    other_dir = Path(tempfile.gettempdir()).absolute()
+    assert other_dir != Path.cwd()
+    return {
+        "ParsedArgs call": lambda: ParsedArgs(call_args),
+        "ParsedArgs path": lambda: ParsedArgs(["path"]),
+        "ParsedCall": lambda: ParsedCall(call_args),
+        "child_env (cwd)": lambda: child_env(Path.cwd()),
+        "child_env (other dir)": lambda: child_env(other_dir),
+    }
+
+
+def run(report: Report, repeat: int) -> None:
+    print("Micro-benchmarks (per call):")
+    for name, func in functions().items():
+        sample = measure_function(func, repeat=repeat)
+        report.add("micro_us", name, sample.mean, sample.ci95,
+                   unit="µs", scale=1e6)
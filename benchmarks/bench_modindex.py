@@ -0,0 +1,49 @@
+# SPDX-FileCopyrightText: (c) 2022 Artëm IG <github.com/rtmigo>
+# SPDX-License-Identifier: BSD-3-Clause
+
+"""Compares finding a top-level module with the standard PathFinder and
+with the module index, when the module is in the last of many sys.path
+entries."""
+
+from __future__ import annotations
+
+import importlib
+import shutil
+import sys
+import tempfile
+from importlib.machinery import PathFinder
+from pathlib import Path
+
+from benchmarks.common import Report, measure_function
+from vien._modindex_finder import IndexFinder
+from vien._modindex_worker import build
+
+ENTRIES = 40
+
+
+def run(report: Report, repeat: int) -> None:
+    print(f"Finding a module in the last of {ENTRIES} sys.path entries:")
+    temp_dir = Path(tempfile.mkdtemp())
+    old_path = list(sys.path)
+    try:
+        entries = []
+        for i in range(ENTRIES):
+            entry = temp_dir / f"entry_{i}"
+            entry.mkdir()
+            (entry / f"module_{i}.py").write_text("")
+            entries.append(str(entry))
+        name = f"module_{ENTRIES - 1}"
+        data = build(entries)
+        finder = IndexFinder(data["index"], data["known"])
+        sys.path[:] = entries + old_path
+        importlib.invalidate_caches()
+        assert PathFinder.find_spec(name) is not None
+        assert finder.find_spec(name) is not None
+        for title, func in [("PathFinder", lambda: PathFinder.find_spec(name)),
+                            ("IndexFinder", lambda: finder.find_spec(name))]:
+            sample = measure_function(func, repeat=repeat)
+            report.add("modindex_us", title, sample.mean, sample.ci95,
+                       unit="µs", scale=1e6)
+    finally:
+        sys.path[:] = old_path
+        shutil.rmtree(temp_dir)
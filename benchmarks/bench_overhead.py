@@ -0,0 +1,84 @@
+# SPDX-FileCopyrightText: (c) 2022 Artëm IG <github.com/rtmigo>
+# SPDX-License-Identifier: BSD-3-Clause
+
+"""Measures how much latency `vien` adds on top of running the same thing
+directly."""
+
+from __future__ import annotations
+
+import shutil
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+
+from benchmarks.common import Report, measure_pair, time_process, repo_env
+from vien._core import venv_dir_to_python_exe
+
+
+class Sandbox:
+    """Temporary VIENDIR with a project and its virtual environment."""
+
+    def __init__(self):
+        self.temp_dir = Path(tempfile.mkdtemp())
+        self.vien_dir = self.temp_dir / "viendir"
+        self.project_dir = self.temp_dir / "project"
+        self.venv_dir = self.vien_dir / "project_venv"
+        self.project_dir.mkdir()
+        (self.project_dir / "noop.py").write_text("")
+        subprocess.run([sys.executable, "-m", "venv", "--without-pip",
+                        str(self.venv_dir)], check=True)
+        self.python = venv_dir_to_python_exe(self.venv_dir)
+        self.env = {**repo_env(), "VIENDIR": str(self.vien_dir)}
+
+    def vien(self, *args: str) -> List[str]:
+        return [sys.executable, "-m", "vien"] + list(args)
+
+    def close(self):
+        shutil.rmtree(self.temp_dir)
+
+
+def _runner(sandbox: Sandbox, args: List[str],
+            input: Optional[bytes] = None) -> Callable[[], float]:
+    return lambda: time_process(args, env=sandbox.env, input=input,
+                                cwd=sandbox.project_dir)
+
+
+def pairs(sb: Sandbox) -> Dict[str, Tuple[Callable[[], float],
+                                          Callable[[], float]]]:
+    """For each benchmark returns (vien command, direct equivalent)."""
+    # vien sources ~/.bashrc before the activate script, so the direct
+    # equivalent does the same
+    rc_file = sb.temp_dir / "direct.rc"
+    bashrc = Path("~/.bashrc").expanduser()
+    rc_lines = [f"source {sb.venv_dir / 'bin' / 'activate'}"]
+    if bashrc.exists():
+        rc_lines.insert(0, f"source {bashrc}")
+    rc_file.write_text("\n".join(rc_lines))
+    return {
+        # `vien path` does not run anything, so all its time is overhead
+        "path": (_runner(sb, sb.vien("path")),
+                 _runner(sb, ["true"])),
+        "call noop.py": (_runner(sb, sb.vien("call", "noop.py")),
+                         _runner(sb, [str(sb.python), "noop.py"])),
+        "run true": (_runner(sb, sb.vien("run", "true")),
+                     _runner(sb, ["true"])),
+        "shell (piped)": (
+            _runner(sb, sb.vien("shell"), input=b"exit\n"),
+            _runner(sb, ["/bin/bash", "--rcfile", str(rc_file), "-i"],
+                    input=b"exit\n")),
+    }
+
+
+def run(report: Report, warmup: int, repeat: int) -> None:
+    print("Wrapper overhead (vien minus direct equivalent):")
+    sandbox = Sandbox()
+    try:
+        for name, (with_vien, direct) in pairs(sandbox).items():
+            diff = measure_pair(with_vien, direct,
+                                warmup=warmup, repeat=repeat)
+            report.add("overhead_ms", name, diff.mean, diff.ci95,
+                       unit="ms", scale=1000)
+    finally:
+        sandbox.close()
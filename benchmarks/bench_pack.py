@@ -0,0 +1,86 @@
+# SPDX-FileCopyrightText: (c) 2022 Artëm IG <github.com/rtmigo>
+# SPDX-License-Identifier: BSD-3-Clause
+
+"""Compares cold imports from a packed and an unpacked environment.
+
+Two environments get the same synthetic pure-Python distributions, one of
+them is packed. Each run is a new interpreter importing all the modules.
+Both environments have up-to-date bytecode, so the difference is in
+finding and reading the files.
+"""
+
+from __future__ import annotations
+
+import os
+import subprocess
+from pathlib import Path
+from typing import List
+
+from benchmarks.bench_overhead import Sandbox
+from benchmarks.common import Report, measure_pair, time_process
+from vien import _pack
+from vien._compile import site_packages_dirs
+
+DISTS = 10
+SUBPACKAGES = 5
+MODULES = 10
+
+
+def install_synthetic(venv_dir: Path) -> List[str]:
+    """Writes the distributions to site-packages as an installer would.
+    Returns the names of the modules."""
+    site = site_packages_dirs(venv_dir)[0]
+    modules = []
+    for d in range(DISTS):
+        top = f"bench_dist_{d}"
+        files = [f"{top}/__init__.py"]
+        for s in range(SUBPACKAGES):
+            files.append(f"{top}/sub_{s}/__init__.py")
+            for m in range(MODULES):
+                files.append(f"{top}/sub_{s}/mod_{m}.py")
+                modules.append(f"{top}.sub_{s}.mod_{m}")
+        for f in files:
+            path = site / f
+            path.parent.mkdir(parents=True, exist_ok=True)
+            path.write_text("\n".join(f"def func_{i}(x):\n    return x + {i}"
+                                      for i in range(20)) + "\n")
+        dist_info = site / f"{top}-1.0.dist-info"
+        dist_info.mkdir()
+        (dist_info / "METADATA").write_text(f"Name: {top}\nVersion: 1.0\n")
+        record = files + [f"{dist_info.name}/METADATA",
+                          f"{dist_info.name}/RECORD"]
+        (dist_info / "RECORD").write_text(
+            "".join(f"{f},,\n" for f in record))
+    return modules
+
+
+def run(report: Report, warmup: int, repeat: int) -> None:
+    print("Cold import of 550 modules from site-packages:")
+    unpacked, packed = Sandbox(), Sandbox()
+    try:
+        script = None
+        for sandbox in (unpacked, packed):
+            modules = install_synthetic(sandbox.venv_dir)
+            script = "import " + ", ".join(modules)
+            subprocess.run([str(sandbox.python), "-m", "compileall", "-q",
+                            *map(str, site_packages_dirs(sandbox.venv_dir))],
+                           check=True)
+        _pack.pack(packed.venv_dir)
+        env = {k: v for k, v in os.environ.items()
+               if k != "PYTHONDONTWRITEBYTECODE"}
+        # the timed runs hide the errors
+        subprocess.run([str(packed.python), "-c", script], env=env,
+                       check=True)
+        diff = measure_pair(
+            lambda: time_process([str(unpacked.python), "-c", script],
+                                 env=env),
+            lambda: time_process([str(packed.python), "-c", script],
+                                 env=env),
+            warmup=warmup, repeat=repeat)
+        report.add("pack_ms", "import unpacked", diff.a.mean, diff.a.ci95,
+                   unit="ms", scale=1000)
+        report.add("pack_ms", "import packed", diff.b.mean, diff.b.ci95,
+                   unit="ms", scale=1000)
+    finally:
+        unpacked.close()
+        packed.close()
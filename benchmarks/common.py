@@ -0,0 +1,168 @@
+# SPDX-FileCopyrightText: (c) 2022 Artëm IG <github.com/rtmigo>
+# SPDX-License-Identifier: BSD-3-Clause
+
+from __future__ import annotations
+
+import json
+import math
+import os
+import statistics
+import subprocess
+import time
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Sequence
+
+BASELINES_FILE = Path(__file__).parent / "baselines.json"
+
+# two-sided 95% Student's t values by degrees of freedom
+_T95 = {1: 12.71, 2: 4.30, 3: 3.18, 4: 2.78, 5: 2.57, 6: 2.45, 7: 2.36,
+        8: 2.31, 9: 2.26, 10: 2.23, 12: 2.18, 15: 2.13, 20: 2.09, 25: 2.06,
+        30: 2.04, 40: 2.02, 60: 2.00, 120: 1.98}
+
+
+def t95(dof: int) -> float:
+    if dof <= 0:
+        return math.inf
+    best = 1.96
+    for known in sorted(_T95, reverse=True):
+        if dof >= known:
+            return _T95[known] if dof < 1000 else best
+    raise AssertionError("Not expected to run this line")
+
+
+class Sample:
+    """Durations of repeated runs, in seconds."""
+
+    def __init__(self, values: Sequence[float]):
+        self.values = list(values)
+
+    @property
+    def mean(self) -> float:
+        return statistics.mean(self.values)
+
+    @property
+    def stderr(self) -> float:
+        if len(self.values) < 2:
+            return math.inf
+        return statistics.stdev(self.values) / math.sqrt(len(self.values))
+
+    @property
+    def ci95(self) -> float:
+        """Half-width of the 95% confidence interval of the mean."""
+        return t95(len(self.values) - 1) * self.stderr
+
+
+class Difference:
+    """Difference of the means of two samples (Welch's interval)."""
+
+    def __init__(self, a: Sample, b: Sample):
+        self.a = a
+        self.b = b
+
+    @property
+    def mean(self) -> float:
+        return self.a.mean - self.b.mean
+
+    @property
+    def ci95(self) -> float:
+        se = math.sqrt(self.a.stderr ** 2 + self.b.stderr ** 2)
+        dof = min(len(self.a.values), len(self.b.values)) - 1
+        return t95(dof) * se
+
+
+def time_process(args: List[str], env: Optional[Dict] = None,
+                 input: Optional[bytes] = None,
+                 cwd: Optional[Path] = None) -> float:
+    t0 = time.perf_counter()
+    subprocess.run(args, env=env, input=input, cwd=cwd,
+                   stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    return time.perf_counter() - t0
+
+
+def measure_pair(run_a: Callable[[], float], run_b: Callable[[], float],
+                 warmup: int, repeat: int) -> Difference:
+    """Runs A and B interleaved, so a drift of the system load affects
+    both of them equally."""
+    for _ in range(warmup):
+        run_a()
+        run_b()
+    a: List[float] = list()
+    b: List[float] = list()
+    for _ in range(repeat):
+        a.append(run_a())
+        b.append(run_b())
+    return Difference(Sample(a), Sample(b))
+
+
+def measure_function(func: Callable[[], object], repeat: int) -> Sample:
+    """Returns the per-call durations. Each value is the mean of a loop
+    long enough to make the timer resolution negligible."""
+    number = 1
+    while True:
+        t0 = time.perf_counter()
+        for _ in range(number):
+            func()
+        if time.perf_counter() - t0 >= 0.05:
+            break
+        number *= 2
+    values = list()
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        for _ in range(number):
+            func()
+        values.append((time.perf_counter() - t0) / number)
+    return Sample(values)
+
+
+def load_baselines() -> Dict:
+    return json.loads(BASELINES_FILE.read_text(encoding="utf-8"))
+
+
+def save_baselines(data: Dict) -> None:
+    BASELINES_FILE.write_text(json.dumps(data, indent=2) + "\n",
+                              encoding="utf-8")
+
+
+class Report:
+    """Collects the results and compares them with the baselines."""
+
+    def __init__(self, baselines: Dict):
+        self.baselines = baselines
+        self.tolerance: float = baselines.get("tolerance", 1.5)
+        self.results: Dict[str, Dict[str, float]] = dict()
+        self.regressions: List[str] = list()
+
+    def add(self, group: str, name: str, value: float, ci95: float,
+            unit: str, scale: float) -> None:
+        """The `value` and `ci95` are in seconds. The `scale` converts
+        them to the `unit`."""
+        shown = value * scale
+        self.results.setdefault(group, dict())[name] = shown
+        baseline = self.baselines.get(group, dict()).get(name)
+        verdict = ""
+        if baseline is not None:
+            limit = baseline * self.tolerance
+            # failing only when even the optimistic end of the interval
+            # is above the limit
+            if (value - ci95) * scale > limit:
+                verdict = f"REGRESSION (limit {limit:.2f} {unit})"
+                self.regressions.append(f"{group}/{name}")
+            else:
+                verdict = f"ok (baseline {baseline:.2f} {unit})"
+        print(f"  {name:<28} {shown:9.2f} ± {ci95 * scale:6.2f} {unit}  "
+              f"{verdict}")
+
+    def updated_baselines(self) -> Dict:
+        data = dict(self.baselines)
+        for group, values in self.results.items():
+            data[group] = {name: round(v, 2) for name, v in values.items()}
+        return data
+
+
+def repo_env() -> Dict[str, str]:
+    """Environment for child processes that must import vien from this
+    source tree, not an installed copy."""
+    root = str(Path(__file__).parent.parent.absolute())
+    old = os.environ.get("PYTHONPATH")
+    return {**os.environ,
+            "PYTHONPATH": root if not old else f"{root}{os.pathsep}{old}"}
@@ -1 +1,25 @@
-from vien import is_posix
\ No newline at end of file
+import zipfile
+from pathlib import Path
+from typing import Dict, Optional
+
+from vien import is_posix
+
+
+def make_wheel(dir: Path, name: str, purelib: bool = True,
+               extra: Optional[Dict[str, str]] = None) -> Path:
+    """Creates a wheel of a one-module package, so nothing is downloaded.
+    The `extra` are more files, by their paths in the wheel."""
+    wheel = dir / f"{name}-1.0-py3-none-any.whl"
+    dist_info = f"{name}-1.0.dist-info"
+    with zipfile.ZipFile(str(wheel), "w") as z:
+        z.writestr(f"{name}.py", "VALUE = 42\n")
+        z.writestr(f"{dist_info}/METADATA",
+                   f"Metadata-Version: 2.1\nName: {name}\nVersion: 1.0\n")
+        z.writestr(f"{dist_info}/WHEEL",
+                   "Wheel-Version: 1.0\nGenerator: test\n"
+                   f"Root-Is-Purelib: {str(purelib).lower()}\n"
+                   "Tag: py3-none-any\n")
+        for path, text in (extra or {}).items():
+            z.writestr(path, text)
+        z.writestr(f"{dist_info}/RECORD", "")
+    return wheel
@@ -0,0 +1,123 @@
+# SPDX-FileCopyrightText: (c) 2022 Artëm IG <github.com/rtmigo>
+# SPDX-License-Identifier: BSD-3-Clause
+
+import asyncio
+import time
+import unittest
+from pathlib import Path
+from tempfile import TemporaryDirectory
+
+from tests.common import is_posix
+from vien import aio
+from vien._exceptions import VenvDoesNotExistError, PyFileNotFoundError
+from vien.testing import VenvTestCase
+
+
+def run_async(coro):
+    return asyncio.run(coro)
+
+
+@unittest.skipUnless(is_posix, "not POSIX")
+class TestAio(VenvTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.project_dir = self.project.project_dir
+
+    def test_needs_venv(self):
+        (self.project_dir / "main.py").write_text("")
+        with self.assertRaises(VenvDoesNotExistError):
+            run_async(aio.call(self.project_dir, ["main.py"]))
+
+    def test_call_exit_code(self):
+        self.create_venv()
+        (self.project_dir / "main.py").write_text("exit(7)")
+        self.assertEqual(
+            run_async(aio.call(self.project_dir, ["main.py"])), 7)
+
+    def test_call_nonexistent_file(self):
+        self.create_venv()
+        with self.assertRaises(PyFileNotFoundError):
+            run_async(aio.call(self.project_dir, ["nonexistent.py"]))
+
+    def test_call_module_from_other_cwd(self):
+        self.create_venv()
+        pkg = self.project_dir / "pkg"
+        pkg.mkdir()
+        (pkg / "__init__.py").touch()
+        (pkg / "const.py").write_text("X = 5")
+        (pkg / "main.py").write_text("import pkg.const\n"
+                                     "exit(pkg.const.X)")
+        with TemporaryDirectory() as td:
+            code = run_async(aio.call(self.project_dir,
+                                      ["-m", str(pkg / "main.py")], cwd=td))
+        self.assertEqual(code, 5)
+
+    def test_run(self):
+        self.create_venv()
+        code = run_async(aio.run(self.project_dir,
+                                 ["python", "-c", "exit(3)"]))
+        self.assertEqual(code, 3)
+
+    def test_stdout_lines(self):
+        self.create_venv()
+        (self.project_dir / "main.py").write_text("print('a')\nprint('b')")
+
+        async def lines():
+            process = await aio.start_call(self.project_dir, ["main.py"],
+                                           stdout=asyncio.subprocess.PIPE)
+            async with process:
+                result = [line async for line in process.stdout_lines()]
+                await process.wait()
+                return result
+
+        self.assertEqual(run_async(lines()), [b"a\n", b"b\n"])
+
+    def test_timeout_kills(self):
+        self.create_venv()
+        (self.project_dir / "main.py").write_text(
+            "import time\ntime.sleep(30)")
+        t0 = time.monotonic()
+
+        async def call():
+            process = await aio.start_call(self.project_dir, ["main.py"])
+            try:
+                await process.wait(timeout=0.5)
+            finally:
+                self.assertIsNotNone(process.returncode)
+
+        with self.assertRaises(asyncio.TimeoutError):
+            run_async(call())
+        self.assertLess(time.monotonic() - t0, 10)
+
+    def test_bounded_gather(self):
+        self.create_venv()
+        for i in range(4):
+            (self.project_dir / f"m{i}.py").write_text(f"exit({i})")
+        results = run_async(aio.bounded_gather(
+            (aio.call(self.project_dir, [f"m{i}.py"]) for i in range(4)),
+            limit=2))
+        self.assertEqual(results, [0, 1, 2, 3])
+
+
+class TestBoundedGather(unittest.TestCase):
+    def test_limit(self):
+        running = 0
+        max_running = 0
+
+        async def job(i):
+            nonlocal running, max_running
+            running += 1
+            max_running = max(max_running, running)
+            await asyncio.sleep(0.01)
+            running -= 1
+            return i
+
+        results = run_async(aio.bounded_gather(
+            (job(i) for i in range(10)), limit=3))
+        self.assertEqual(results, list(range(10)))
+        self.assertEqual(max_running, 3)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,123 @@
+# SPDX-FileCopyrightText: (c) 2022 Artëm IG <github.com/rtmigo>
+# SPDX-License-Identifier: BSD-3-Clause
+
+import io
+import subprocess
+import unittest
+from contextlib import redirect_stdout
+from tempfile import TemporaryDirectory
+
+from tests.common import is_posix
+from vien import api
+from vien.testing import VenvTestCase
+
+
+class TestApi(VenvTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.project_dir = self.project.project_dir
+
+    def test_path(self):
+        self.assertEqual(api.path(self.project_dir), self.project.venv_dir)
+        self.assertFalse(api.path(self.project_dir).exists())
+
+    def test_create_prints_nothing(self):
+        output = io.StringIO()
+        with redirect_stdout(output):
+            created = api.create(self.project_dir)
+        self.assertEqual(output.getvalue(), "")
+        self.assertEqual(created.venv_dir, self.project.venv_dir)
+        self.assertTrue(created.python_exe.exists())
+
+    def test_create_existing(self):
+        self.create_venv()
+        with self.assertRaises(api.VenvExistsError):
+            api.create(self.project_dir)
+
+    def test_create_unknown_interpreter(self):
+        with self.assertRaises(api.CannotFindExecutableError):
+            api.create(self.project_dir, interpreter="nonexistent_python")
+
+    def test_delete(self):
+        self.create_venv()
+        self.assertEqual(api.delete(self.project_dir), self.project.venv_dir)
+        self.assertFalse(self.project.venv_dir.exists())
+        with self.assertRaises(api.VenvDoesNotExistError):
+            api.delete(self.project_dir)
+
+    def test_errors_do_not_exit(self):
+        # the errors must not be caught by `except SystemExit`
+        self.assertFalse(issubclass(api.VienError, SystemExit))
+        with self.assertRaises(api.VienError):
+            api.call(self.project_dir, ["main.py"])
+
+    def test_call_without_interpreter(self):
+        self.create_venv()
+        (self.project_dir / "main.py").write_text("exit(0)")
+        for exe in self.project.venv_dir.glob("*/python*"):
+            if not exe.is_dir():  # not lib/python3.x
+                exe.unlink()
+        with self.assertRaises(api.PythonNotFoundError) as ce:
+            api.call(self.project_dir, ["main.py"])
+        self.assertEqual(ce.exception.path, self.project.venv_dir)
+
+    def test_call_captures_output(self):
+        self.create_venv()
+        (self.project_dir / "main.py").write_text(
+            "import sys\n"
+            "print(sys.stdin.read().upper())\n"
+            "exit(3)")
+        result = api.call(self.project_dir, ["main.py"], input=b"abc",
+                          capture_output=True)
+        self.assertEqual(result.returncode, 3)
+        self.assertEqual(result.stdout.strip(), b"ABC")
+
+    def test_call_env(self):
+        self.create_venv()
+        (self.project_dir / "main.py").write_text(
+            "import os\n"
+            "print(os.environ['VIEN_API_TEST'])")
+        result = api.call(self.project_dir, ["main.py"],
+                          env={"VIEN_API_TEST": "xyz"}, capture_output=True)
+        self.assertEqual(result.stdout.strip(), b"xyz")
+
+    def test_call_module_from_other_cwd(self):
+        self.create_venv()
+        pkg = self.project_dir / "pkg"
+        pkg.mkdir()
+        (pkg / "__init__.py").touch()
+        (pkg / "const.py").write_text("X = 5")
+        (pkg / "main.py").write_text("import pkg.const\n"
+                                     "exit(pkg.const.X)")
+        with TemporaryDirectory() as td:
+            result = api.call(self.project_dir, ["-m", str(pkg / "main.py")],
+                              cwd=td)
+        self.assertEqual(result.returncode, 5)
+
+    def test_call_nonexistent_file(self):
+        self.create_venv()
+        with self.assertRaises(api.PyFileNotFoundError):
+            api.call(self.project_dir, ["nonexistent.py"])
+
+    def test_call_timeout(self):
+        self.create_venv()
+        (self.project_dir / "main.py").write_text(
+            "import time\n"
+            "time.sleep(60)")
+        with self.assertRaises(subprocess.TimeoutExpired):
+            api.call(self.project_dir, ["main.py"], timeout=0.5)
+
+    @unittest.skipUnless(is_posix, "not POSIX")
+    def test_run(self):
+        self.create_venv()
+        result = api.run(self.project_dir,
+                         ["python", "-c", "import sys; print(sys.prefix)"],
+                         capture_output=True)
+        self.assertEqual(result.returncode, 0)
+        self.assertEqual(result.stdout.decode().strip(),
+                         str(self.project.venv_dir))
+
+
+if __name__ == "__main__":
+    unittest.main()
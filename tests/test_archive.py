@@ -0,0 +1,146 @@
+# SPDX-FileCopyrightText: (c) 2022 Artëm IG <github.com/rtmigo>
+# SPDX-License-Identifier: BSD-3-Clause
+
+import io
+import os
+import shutil
+import subprocess
+import sys
+import unittest
+from contextlib import redirect_stdout
+from pathlib import Path
+from tempfile import TemporaryDirectory
+
+from vien._archive import key, save, restore, manifest, dependency_files, \
+    _split, ArchiveError
+from vien._common import is_posix
+from vien._compile import site_packages_dirs
+from vien._core import venv_dir_to_python_exe
+from vien._exceptions import VienExit
+from vien._main import main_entry_point
+from vien.testing import VenvTestCase
+
+
+class TestKey(unittest.TestCase):
+
+    def test_dependency_files(self):
+        with TemporaryDirectory() as temp:
+            project = Path(temp)
+            for name in ("requirements.txt", "requirements-dev.txt",
+                         "pyproject.toml", "README.md"):
+                (project / name).write_text(name)
+            self.assertEqual(
+                [p.name for p in dependency_files(project)],
+                ["pyproject.toml", "requirements-dev.txt",
+                 "requirements.txt"])
+
+    def test_stable(self):
+        with TemporaryDirectory() as temp:
+            a, b = Path(temp) / "a", Path(temp) / "b"
+            for project in (a, b):
+                project.mkdir()
+                (project / "requirements.txt").write_text("requests==2.0\n")
+            # the location of the project does not matter
+            self.assertEqual(key(a, sys.executable),
+                             key(b, sys.executable))
+            self.assertEqual(len(key(a, sys.executable)), 64)
+            (b / "requirements.txt").write_text("requests==2.1\n")
+            self.assertNotEqual(key(a, sys.executable),
+                                key(b, sys.executable))
+            self.assertNotEqual(key(a, sys.executable),
+                                key(a, sys.executable, files=[]))
+            with self.assertRaises(ArchiveError):
+                key(a, sys.executable, files=[a / "nonexistent.txt"])
+
+    def test_split(self):
+        parts = _split([("a", 100), ("b", 60), ("c", 50), ("d", 0)], 2)
+        self.assertEqual(parts, [["a", "d"], ["b", "c"]])
+        self.assertEqual(_split([("a", 1)], 4), [["a"]])
+
+
+@unittest.skipUnless(is_posix, "POSIX only")
+class TestSaveRestore(VenvTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.venv_dir = self.create_venv()
+        self.cache_dir = self.project.temp_dir / "ci-cache"
+        site = site_packages_dirs(self.venv_dir)[0]
+        (site / "restored_mod.py").write_text("VALUE = 1\n")
+        script = self.venv_dir / "bin" / "restored-script"
+        script.write_text(f"#!{venv_dir_to_python_exe(self.venv_dir)}\n"
+                          f"import restored_mod\n"
+                          f"print(restored_mod.VALUE)\n")
+        script.chmod(0o755)
+
+    def test_roundtrip_to_other_path(self):
+        saved = save(self.venv_dir, self.cache_dir, "k1", jobs=3)
+        self.assertTrue(saved.created)
+        self.assertEqual(len(list(saved.archive.glob("part-*.tar.gz"))), 3)
+        # saving the same key again does nothing
+        self.assertFalse(save(self.venv_dir, self.cache_dir, "k1").created)
+
+        other = self.project.temp_dir / "other_viendir" / "other_venv"
+        restore(other, self.cache_dir, "k1", jobs=2)
+        self.assertNotIn(str(self.venv_dir),
+                         (other / "pyvenv.cfg").read_text())
+        self.assertEqual(subprocess.check_output(
+            [str(other / "bin" / "restored-script")]).strip(), b"1")
+        self.assertEqual(list(other.parent.glob("*.vien-restore")), [])
+
+        with self.assertRaises(ArchiveError):
+            restore(other, self.cache_dir, "k1")
+
+    def test_packed_to_other_path(self):
+        from vien import _pack
+        site = site_packages_dirs(self.venv_dir)[0]
+        dist_info = site / "restored_mod-1.0.dist-info"
+        dist_info.mkdir()
+        (dist_info / "RECORD").write_text(
+            f"restored_mod.py,,\n{dist_info.name}/RECORD,,\n")
+        [result] = _pack.pack(self.venv_dir)
+        self.assertEqual(result["packed"], ["restored-mod"])
+        save(self.venv_dir, self.cache_dir, "k2")
+        # the old environment is gone, so nothing is loaded from there
+        shutil.rmtree(str(self.venv_dir))
+
+        other = self.project.temp_dir / "other_viendir" / "other_venv"
+        restore(other, self.cache_dir, "k2")
+        self.assertEqual(subprocess.check_output(
+            [str(venv_dir_to_python_exe(other)), "-c",
+             "import restored_mod, os; "
+             "print(os.path.dirname(restored_mod.__file__))"],
+            universal_newlines=True).strip(),
+            str(site_packages_dirs(other)[0] / "vien-packed.zip"))
+
+    def test_missing(self):
+        self.assertIsNone(manifest(self.cache_dir, "nope"))
+        with self.assertRaises(ArchiveError):
+            restore(self.venv_dir.with_name("x"), self.cache_dir, "nope")
+        with self.assertRaises(ArchiveError):
+            save(self.venv_dir, self.cache_dir, "../k")
+
+    def test_commands(self):
+        (self.project.project_dir / "requirements.txt").write_text("x\n")
+        with redirect_stdout(io.StringIO()) as out:
+            main_entry_point(["key"])
+        env_key = out.getvalue().strip()
+        main_entry_point(["save", "--cache-dir", str(self.cache_dir)])
+        self.assertTrue((self.cache_dir / env_key).is_dir())
+
+        # a CI run in another checkout, with another VIENDIR
+        os.environ["VIENDIR"] = str(self.project.temp_dir / "viendir2")
+        main_entry_point(["restore", "--cache-dir", str(self.cache_dir)])
+        restored = self.project.temp_dir / "viendir2" / "project_venv"
+        self.assertTrue((restored / "pyvenv.cfg").exists())
+
+        # the dependencies changed: a cache miss
+        (self.project.project_dir / "requirements.txt").write_text("y\n")
+        os.environ["VIENDIR"] = str(self.project.temp_dir / "viendir3")
+        with self.assertRaises(VienExit):
+            main_entry_point(["restore", "--cache-dir",
+                              str(self.cache_dir)])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -99,6 +99,16 @@ class TestParseCall(unittest.TestCase):
         self.assertEqual(pd.call.filename, "myfile.py")
         self.assertEqual(pd.call.before_filename, "-m")
 
+    def test_watch(self):
+        pd = ParsedArgs('-p a/b/c call --watch -m myfile.py arg1'.split())
+        self.assertTrue(pd.call_watch)
+        self.assertEqual(pd.args_to_python, ['-m', 'myfile.py', 'arg1'])
+
+    def test_watch_after_filename_is_for_program(self):
+        pd = ParsedArgs('call myfile.py --watch'.split())
+        self.assertFalse(pd.call_watch)
+        self.assertEqual(pd.args_to_python, ['myfile.py', '--watch'])
+
 
 class TestParseShell(unittest.TestCase):
     def test_no_args(self):
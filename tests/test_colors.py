@@ -0,0 +1,16 @@
+# SPDX-FileCopyrightText: (c) 2021 Artëm IG <github.com/rtmigo>
+# SPDX-License-Identifier: BSD-3-Clause
+
+import unittest
+
+from vien._colors import color_escape
+
+
+class TestColorEscape(unittest.TestCase):
+    def test(self):
+        # it's easy to lose significant backslashes so
+        self.assertEqual(color_escape("inner"), r"\[\e[;inner\]")
+
+
+if __name__ == "__main__":
+    unittest.main()
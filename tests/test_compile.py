@@ -0,0 +1,121 @@
+# SPDX-FileCopyrightText: (c) 2022 Artëm IG <github.com/rtmigo>
+# SPDX-License-Identifier: BSD-3-Clause
+
+import importlib.util
+import json
+import struct
+import subprocess
+import sys
+import unittest
+from pathlib import Path
+from tempfile import TemporaryDirectory
+
+from vien import _compile_worker
+from vien._compile import is_install_command, compile_trees, \
+    CompileResult, PROJECT_EXCLUDE
+from vien._exceptions import ChildExit
+from vien._main import main_entry_point
+from vien.testing import VenvTestCase
+
+
+class TestIsInstallCommand(unittest.TestCase):
+    def test(self):
+        self.assertTrue(is_install_command(["pip", "install", "requests"]))
+        self.assertTrue(is_install_command(
+            ["python", "-m", "pip", "install", "-r", "requirements.txt"]))
+        self.assertTrue(is_install_command(["/x/bin/pip3", "install", "a"]))
+        self.assertFalse(is_install_command(["pip", "list"]))
+        self.assertFalse(is_install_command(["make", "install"]))
+
+
+class TestCompile(VenvTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.venv_dir = self.create_venv()
+        self.project_dir = self.project.project_dir
+        self.module = self.project_dir / "pkg" / "module.py"
+        self.module.parent.mkdir()
+        self.module.write_text("X = 1\n")
+        hidden = self.project_dir / ".hidden" / "skipped.py"
+        hidden.parent.mkdir()
+        hidden.write_text("X = 1\n")
+
+    def compile(self, **kwargs) -> CompileResult:
+        return compile_trees(self.venv_dir, [self.project_dir],
+                             exclude=PROJECT_EXCLUDE, **kwargs)
+
+    def pyc_flags(self, optimization="") -> int:
+        cfile = importlib.util.cache_from_source(str(self.module),
+                                                 optimization=optimization)
+        with open(cfile, "rb") as f:
+            return struct.unpack("<I", f.read(8)[4:])[0]
+
+    def test_skips_up_to_date(self):
+        self.assertEqual(self.compile(), CompileResult(1, 0, 0))
+        self.assertEqual(self.pyc_flags(), 0)
+        self.assertEqual(self.compile(), CompileResult(0, 1, 0))
+        self.module.write_text("X = 22\n")
+        self.assertEqual(self.compile(), CompileResult(1, 0, 0))
+
+    def test_hash_modes(self):
+        self.compile(invalidation="unchecked-hash")
+        self.assertEqual(self.pyc_flags(), 0b01)
+        self.assertEqual(self.compile(invalidation="unchecked-hash"),
+                         CompileResult(0, 1, 0))
+        self.compile(invalidation="checked-hash")
+        self.assertEqual(self.pyc_flags(), 0b11)
+
+    def test_optimization_levels(self):
+        self.assertEqual(self.compile(optimize=[0, 2]),
+                         CompileResult(2, 0, 0))
+        self.assertEqual(self.pyc_flags(optimization=2), 0)
+
+    def test_syntax_error(self):
+        (self.project_dir / "broken.py").write_text("def (:\n")
+        self.assertEqual(self.compile(), CompileResult(1, 0, 1))
+        with self.assertRaises(ChildExit):
+            main_entry_point(["compile", "--only", "project"])
+
+    def test_command(self):
+        main_entry_point(["compile", "--only", "project", "-j", "2"])
+        self.assertEqual(self.compile(), CompileResult(0, 1, 0))
+
+
+# runs the worker with the processes started as on macOS
+_SPAWN_RUNNER = """\
+import multiprocessing
+import sys
+sys.path.insert(0, {worker_dir!r})
+import _compile_worker
+if __name__ == "__main__":
+    multiprocessing.set_start_method("spawn")
+    _compile_worker.main()
+"""
+
+
+@unittest.skipIf(sys.version_info < (3, 8), "no pycache_prefix")
+class TestWorker(unittest.TestCase):
+
+    def test_prefix_in_spawned_processes(self):
+        with TemporaryDirectory() as temp:
+            sources = Path(temp) / "sources"
+            sources.mkdir()
+            for i in range(120):
+                (sources / f"m{i}.py").write_text("X = 1\n")
+            prefix = Path(temp) / "prefix"
+            runner = Path(temp) / "runner.py"
+            runner.write_text(_SPAWN_RUNNER.format(
+                worker_dir=str(Path(_compile_worker.__file__).parent)))
+            config = {"roots": [str(sources)], "exclude": [],
+                      "optimize": [0], "invalidation": "timestamp",
+                      "jobs": 2, "pycache_prefix": str(prefix)}
+            output = subprocess.check_output(
+                [sys.executable, str(runner), json.dumps(config)])
+            self.assertEqual(json.loads(output)["compiled"], 120)
+            self.assertEqual(len(list(prefix.rglob("*.pyc"))), 120)
+            self.assertFalse((sources / "__pycache__").exists())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,117 @@
+# SPDX-FileCopyrightText: (c) 2022 Artëm IG <github.com/rtmigo>
+# SPDX-License-Identifier: BSD-3-Clause
+
+import os
+import shlex
+import subprocess
+import unittest
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from typing import List
+
+from tests.common import is_posix
+from vien._completion import BASH_SCRIPT, read_index, find_interpreters, \
+    update_index
+from vien._expose import venv_scripts
+from vien._main import main_entry_point
+from vien.testing import VenvTestCase
+
+
+def bash_complete(words: List[str]) -> List[str]:
+    """Runs the completion function as bash would do for the command line
+    where the last of the `words` is being typed."""
+    script = BASH_SCRIPT + "\n" \
+        + f"COMP_WORDS=({' '.join(shlex.quote(w) for w in words)})\n" \
+        + f"COMP_CWORD={len(words) - 1}\n" \
+        + "_vien\n" \
+        + 'printf "%s\\n" "${COMPREPLY[@]}"\n'
+    output = subprocess.check_output(["/bin/bash", "-c", script])
+    return sorted(line for line in output.decode().splitlines() if line)
+
+
+class TestIndexFunctions(unittest.TestCase):
+    def test_find_interpreters(self):
+        with TemporaryDirectory() as td:
+            for name in ["python3", "python3.10", "python-config", "pip"]:
+                Path(td, name).touch(mode=0o755)
+            self.assertEqual(find_interpreters(td), ["python3", "python3.10"])
+
+
+@unittest.skipUnless(is_posix, "not POSIX")
+class TestCompletion(VenvTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.project_dir = self.project.project_dir
+        pkg = self.project_dir / "pkg"
+        pkg.mkdir()
+        (pkg / "main.py").touch()
+        (pkg / "not.a.module.py").touch()
+        (pkg / "data.txt").touch()
+        (self.project_dir / "__pycache__").mkdir()
+
+    def test_index_is_updated_by_create_and_delete(self):
+        self.create_venv()
+        update_index(self.project.vien_dir, commands=["call"],
+                     created_project=self.project_dir)
+        self.assertIn(("project", str(self.project_dir)),
+                      read_index(self.project.vien_dir))
+        main_entry_point(["delete"])
+        self.assertNotIn(("project", str(self.project_dir)),
+                         read_index(self.project.vien_dir))
+
+    def test_commands(self):
+        main_entry_point(["completion", "update"])
+        self.assertEqual(bash_complete(["vien", "re"]),
+                         ["recreate", "restore"])
+        self.assertIn("shebang", bash_complete(["vien", ""]))
+
+    def test_commands_without_index(self):
+        self.assertEqual(bash_complete(["vien", "cre"]), ["create"])
+
+    def test_project_dir(self):
+        self.create_venv()
+        update_index(self.project.vien_dir, commands=[],
+                     created_project=self.project_dir)
+        completions = bash_complete(["vien", "-p", str(self.project_dir)])
+        self.assertIn(str(self.project_dir), completions)
+
+    def test_call_files(self):
+        self.assertEqual(bash_complete(["vien", "call", "pkg/"]),
+                         ["pkg/main.py", "pkg/not.a.module.py"])
+        self.assertEqual(bash_complete(["vien", "call", ""]), ["pkg"])
+
+    def test_call_modules(self):
+        self.assertEqual(bash_complete(["vien", "call", "-m", "pkg/"]),
+                         ["pkg/main.py"])
+        # outside the project dir
+        outer = self.project_dir.parent / "outer.py"
+        outer.touch()
+        self.assertEqual(
+            bash_complete(["vien", "call", "-m", "../outer"]), [])
+        # with -p the project dir is not the working dir
+        self.assertEqual(
+            bash_complete(["vien", "-p", ".", "call", "-m", "../outer"]),
+            ["../outer.py"])
+
+    def test_expose_scripts(self):
+        venv_dir = self.create_venv()
+        script = venv_dir / "bin" / "mytool"
+        script.write_text("#!/bin/sh\n")
+        os.chmod(str(script), 0o755)
+        self.assertEqual(bash_complete(["vien", "expose", ""]), ["mytool"])
+
+    def test_expose_scripts_named_like_own_files(self):
+        venv_dir = self.create_venv()
+        for name in ("pip-compile", "python-lsp-server", "pip3.99"):
+            script = venv_dir / "bin" / name
+            script.write_text("#!/bin/sh\n")
+            os.chmod(str(script), 0o755)
+        self.assertEqual(bash_complete(["vien", "expose", ""]),
+                         ["pip-compile", "python-lsp-server"])
+        self.assertEqual(bash_complete(["vien", "expose", ""]),
+                         venv_scripts(venv_dir))
+
+
+if __name__ == "__main__":
+    unittest.main()
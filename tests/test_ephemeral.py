@@ -0,0 +1,95 @@
+# SPDX-FileCopyrightText: (c) 2022 Artëm IG <github.com/rtmigo>
+# SPDX-License-Identifier: BSD-3-Clause
+
+import os
+import signal
+import subprocess
+import unittest
+from pathlib import Path
+from tempfile import TemporaryDirectory
+
+from vien._common import is_posix
+from vien._ephemeral import ephemeral_venv, remove_abandoned, \
+    signals_as_exit, EPHEMERAL_DIR_ENV
+from vien._main import main_entry_point
+from vien._parsed_args import ParsedArgs
+from vien._venv_cache import default_cache_dir
+from vien.testing import VenvTestCase
+
+
+def _dead_pid() -> int:
+    process = subprocess.Popen(["true"])
+    process.wait()
+    return process.pid
+
+
+class TestRemoveAbandoned(unittest.TestCase):
+    def test(self):
+        with TemporaryDirectory() as temp:
+            alive = Path(temp) / f"my-project-{os.getpid()}_venv"
+            dead = Path(temp) / f"my-project-{_dead_pid()}_venv"
+            other = Path(temp) / "other"
+            for d in (alive, dead, other):
+                (d / "bin").mkdir(parents=True)
+            remove_abandoned(Path(temp))
+            self.assertTrue(alive.exists())
+            self.assertFalse(dead.exists())
+            self.assertTrue(other.exists())
+
+
+@unittest.skipUnless(is_posix, "POSIX only")
+class TestSignals(unittest.TestCase):
+    def test_sigterm_raises_system_exit(self):
+        old = signal.getsignal(signal.SIGTERM)
+        with self.assertRaises(SystemExit) as cm:
+            with signals_as_exit():
+                os.kill(os.getpid(), signal.SIGTERM)
+        self.assertEqual(cm.exception.code, 128 + signal.SIGTERM)
+        self.assertIs(signal.getsignal(signal.SIGTERM), old)
+
+
+@unittest.skipUnless(is_posix, "POSIX only")
+class TestEphemeral(VenvTestCase):
+
+    def setUp(self):
+        super().setUp()
+        # the base environments are reused by the next test runs
+        self._old_dir = os.environ.get(EPHEMERAL_DIR_ENV)
+        os.environ[EPHEMERAL_DIR_ENV] = str(default_cache_dir() / "ephemeral")
+
+    def tearDown(self):
+        if self._old_dir is None:
+            del os.environ[EPHEMERAL_DIR_ENV]
+        else:
+            os.environ[EPHEMERAL_DIR_ENV] = self._old_dir
+        super().tearDown()
+
+    def test_removed_after_exception(self):
+        with self.assertRaises(ZeroDivisionError):
+            with ephemeral_venv("my-project") as venv_dir:
+                self.assertTrue((venv_dir / "pyvenv.cfg").exists())
+                _ = 1 / 0
+        self.assertFalse(venv_dir.exists())
+
+    def test_command(self):
+        with self.assertRaises(SystemExit) as cm:
+            main_entry_point(["run", "--ephemeral", "python", "-c",
+                              "import sys; sys.exit(sys.prefix.endswith("
+                              "'_venv') and 7)"])
+        self.assertEqual(cm.exception.code, 7)
+        # the project environment was not created
+        self.assertFalse(self.project.venv_dir.exists())
+
+    def test_python_requires_ephemeral(self):
+        self.assertEqual(
+            ParsedArgs(["run", "--ephemeral", "--python", "python3",
+                        "pytest", "--ephemeral"]).run_args,
+            ["pytest", "--ephemeral"])
+        self.create_venv()
+        with self.assertRaises(SystemExit) as cm:
+            main_entry_point(["run", "--python", "python3", "true"])
+        self.assertIn("--ephemeral", str(cm.exception.code))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,87 @@
+# SPDX-FileCopyrightText: (c) 2022 Artëm IG <github.com/rtmigo>
+# SPDX-License-Identifier: BSD-3-Clause
+
+import os
+import subprocess
+import unittest
+from pathlib import Path
+
+from tests.common import is_posix
+from vien._exceptions import VienExit
+from vien._expose import shims_dir, venv_scripts, exposed, shim_venv
+from vien._main import main_entry_point
+from vien.testing import VenvTestCase
+
+
+@unittest.skipUnless(is_posix, "not POSIX")
+class TestExpose(VenvTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.venv_dir = self.create_venv()
+        self.shims = shims_dir(self.venv_dir)
+        self.add_script("mytool")
+
+    def add_script(self, name: str) -> Path:
+        script = self.venv_dir / "bin" / name
+        script.write_text(f"#!{self.venv_dir / 'bin' / 'python'}\n"
+                          f"import sys\n"
+                          f"print(sys.prefix, sys.argv[1:])\n")
+        os.chmod(str(script), 0o755)
+        return script
+
+    def test_venv_scripts_skip_own_files(self):
+        self.assertEqual(venv_scripts(self.venv_dir), ["mytool"])
+        for name in ("pip3.99", "python3.99", "easy_install-3.99"):
+            self.add_script(name)
+        self.assertEqual(venv_scripts(self.venv_dir), ["mytool"])
+
+    def test_venv_scripts_named_like_own_files(self):
+        tools = ["pip-compile", "pip-sync", "pipdeptree", "pipenv",
+                 "python-lsp-server"]
+        for name in tools:
+            self.add_script(name)
+        self.assertEqual(venv_scripts(self.venv_dir),
+                         sorted(tools + ["mytool"]))
+
+    def test_shim_runs_script(self):
+        main_entry_point(["expose"])
+        output = subprocess.check_output([str(self.shims / "mytool"), "a"])
+        self.assertEqual(output.decode().strip(), f"{self.venv_dir} ['a']")
+
+    def test_unknown_script(self):
+        with self.assertRaises(VienExit):
+            main_entry_point(["expose", "labuda"])
+        self.assertFalse((self.shims / "labuda").exists())
+
+    def test_other_venv_shim_is_not_replaced(self):
+        other_venv = self.venv_dir.parent / "other_venv"
+        self.shims.mkdir()
+        (self.shims / "mytool").write_text(
+            f"#!/bin/sh\n# Generated by `vien expose`.\n"
+            f"# vien-venv: {other_venv}\n")
+        with self.assertRaises(VienExit):
+            main_entry_point(["expose", "mytool"])
+        main_entry_point(["expose", "--force", "mytool"])
+        self.assertEqual(shim_venv(self.shims / "mytool"), self.venv_dir)
+
+    def test_remove(self):
+        self.add_script("othertool")
+        main_entry_point(["expose"])
+        main_entry_point(["expose", "--remove", "othertool"])
+        self.assertEqual(exposed(self.venv_dir), ["mytool"])
+
+    def test_delete_removes_shims(self):
+        main_entry_point(["expose"])
+        main_entry_point(["delete"])
+        self.assertEqual(exposed(self.venv_dir), [])
+        self.assertFalse((self.shims / "mytool").exists())
+
+    def test_recreate_restores_shims(self):
+        main_entry_point(["expose"])
+        main_entry_point(["recreate"])
+        self.assertEqual(exposed(self.venv_dir), ["mytool"])
+
+
+if __name__ == "__main__":
+    unittest.main()
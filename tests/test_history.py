@@ -0,0 +1,126 @@
+# SPDX-FileCopyrightText: (c) 2022 Artëm IG <github.com/rtmigo>
+# SPDX-License-Identifier: BSD-3-Clause
+
+import os
+import unittest
+from pathlib import Path
+from tempfile import TemporaryDirectory
+
+from vien._exceptions import ChildExit
+from vien._history import LogHistogram, append_record, iter_records, \
+    rotated_file, recorded, history_file, aggregate, HISTORY_ENV, \
+    format_stats, _rotate
+
+
+class TestLogHistogram(unittest.TestCase):
+    def test_percentiles_are_close(self):
+        h = LogHistogram()
+        for i in range(1, 1001):
+            h.add(i / 1000)
+        self.assertAlmostEqual(h.percentile(50), 0.5, delta=0.5 * 0.01)
+        self.assertAlmostEqual(h.percentile(95), 0.95, delta=0.95 * 0.01)
+        self.assertAlmostEqual(h.percentile(99), 0.99, delta=0.99 * 0.01)
+
+    def test_single(self):
+        h = LogHistogram()
+        h.add(0.25)
+        self.assertAlmostEqual(h.percentile(1), 0.25, delta=0.25 * 0.01)
+        self.assertAlmostEqual(h.percentile(99), 0.25, delta=0.25 * 0.01)
+
+    def test_empty(self):
+        with self.assertRaises(ValueError):
+            LogHistogram().percentile(50)
+
+    def test_buckets_are_bounded(self):
+        h = LogHistogram()
+        for i in range(100000):
+            h.add(0.1 + (i % 100) / 10000)
+        self.assertLess(len(h.counts), 20)
+
+
+class TestLog(unittest.TestCase):
+    def test_append_and_read(self):
+        with TemporaryDirectory() as td:
+            log = Path(td) / "history" / "project_venv.log"
+            append_record(log, {"cmd": "call", "exit": 0})
+            append_record(log, {"cmd": "run", "exit": 1})
+            self.assertEqual([r["cmd"] for r in iter_records(log)],
+                             ["call", "run"])
+
+    def test_rotation(self):
+        with TemporaryDirectory() as td:
+            log = Path(td) / "project_venv.log"
+            for i in range(10):
+                append_record(log, {"i": i}, max_bytes=30)
+            self.assertTrue(rotated_file(log).exists())
+            self.assertLessEqual(log.stat().st_size, 30)
+            # only the last records survive, but they are in order
+            indexes = [r["i"] for r in iter_records(log)]
+            self.assertEqual(indexes, sorted(indexes))
+            self.assertEqual(indexes[-1], 9)
+
+    def test_concurrent_rotation(self):
+        with TemporaryDirectory() as td:
+            log = Path(td) / "project_venv.log"
+            for i in range(3):
+                append_record(log, {"i": i}, max_bytes=1000)
+            # another writer found the same full log, but was slower
+            fd = os.open(str(log), os.O_WRONLY | os.O_APPEND)
+            try:
+                append_record(log, {"i": 3}, max_bytes=10)
+                _rotate(log, fd, 10)
+            finally:
+                os.close(fd)
+            # the full log is not replaced by the new one
+            self.assertEqual([r["i"] for r in iter_records(log)],
+                             [0, 1, 2, 3])
+
+    def test_malformed_lines_skipped(self):
+        with TemporaryDirectory() as td:
+            log = Path(td) / "project_venv.log"
+            append_record(log, {"i": 1})
+            with log.open('ab') as f:
+                f.write(b'{"i": 2, "trunc')
+            append_record(log, {"i": 3})
+            # the truncated line glued to the next one is lost,
+            # but reading does not fail
+            self.assertEqual([r["i"] for r in iter_records(log)][0], 1)
+
+
+class TestRecorded(unittest.TestCase):
+    def setUp(self):
+        self._td = TemporaryDirectory()
+        self.venv_dir = Path(self._td.name) / "project_venv"
+        os.environ[HISTORY_ENV] = "1"
+
+    def tearDown(self):
+        del os.environ[HISTORY_ENV]
+        self._td.cleanup()
+
+    def test_records_child_exit(self):
+        for code in (0, 0, 3):
+            with self.assertRaises(ChildExit):
+                with recorded(self.venv_dir, "call", "main.py", ["main.py"]):
+                    raise ChildExit(code)
+        stats = aggregate(iter_records(history_file(self.venv_dir)))
+        self.assertEqual(list(stats), ["call main.py"])
+        self.assertEqual(stats["call main.py"].runs, 3)
+        self.assertEqual(stats["call main.py"].failures, 1)
+        self.assertEqual(len(format_stats(stats)), 2)
+
+    def test_disabled(self):
+        os.environ[HISTORY_ENV] = "0"
+        with self.assertRaises(ChildExit):
+            with recorded(self.venv_dir, "call", "main.py", ["main.py"]):
+                raise ChildExit(0)
+        self.assertFalse(history_file(self.venv_dir).exists())
+
+    def test_other_errors_not_recorded(self):
+        with self.assertRaises(ValueError):
+            with recorded(self.venv_dir, "call", "main.py", ["main.py"]):
+                raise ValueError
+        self.assertFalse(history_file(self.venv_dir).exists())
+
+
+if __name__ == "__main__":
+    unittest.main()
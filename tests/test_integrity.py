@@ -0,0 +1,159 @@
+# SPDX-FileCopyrightText: (c) 2022 Artëm IG <github.com/rtmigo>
+# SPDX-License-Identifier: BSD-3-Clause
+
+import marshal
+import unittest
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from unittest import mock
+
+from vien import _integrity
+from vien._common import is_posix
+from vien._compile import site_packages_dirs
+from vien._exceptions import VienExit
+from vien._integrity import HashCache, verify, fingerprint, CACHE_NAME
+from vien._main import main_entry_point
+from vien._wheels import install
+from vien.testing import VenvTestCase
+
+from tests.common import make_wheel
+
+
+class TestHashCache(unittest.TestCase):
+
+    def test_cached_until_changed(self):
+        with TemporaryDirectory() as temp:
+            root = Path(temp)
+            (root / "a.txt").write_text("aaa")
+            (root / "sub").mkdir()
+            (root / "sub" / "b.txt").write_text("bbb")
+            with mock.patch.object(_integrity, "_RACY_NS", 0):
+                cache = HashCache(root)
+                first = cache.digests(["a.txt", "sub/b.txt", "none.txt"])
+                cache.save()
+            self.assertTrue((root / CACHE_NAME).exists())
+            self.assertIsNone(first["none.txt"])
+            self.assertTrue(first["a.txt"].startswith("sha256="))
+
+            self.assertEqual(HashCache(root).digests(["a.txt"]),
+                             {"a.txt": first["a.txt"]})
+            # the same size, but another file
+            (root / "a.txt").unlink()
+            (root / "a.txt").write_text("ccc")
+            self.assertNotEqual(HashCache(root).digests(["a.txt"]),
+                                {"a.txt": first["a.txt"]})
+
+    def test_broken_cache_file(self):
+        with TemporaryDirectory() as temp:
+            root = Path(temp)
+            (root / "a.txt").write_text("aaa")
+            for data in (b"", b"garbage", marshal.dumps((1, [1, 2])),
+                         marshal.dumps((1, {"a.txt": 5})),
+                         marshal.dumps(7)):
+                (root / CACHE_NAME).write_bytes(data)
+                self.assertTrue(HashCache(root).digests(["a.txt"])["a.txt"]
+                                .startswith("sha256="))
+
+    def test_save_leaves_no_temp_files(self):
+        with TemporaryDirectory() as temp:
+            root = Path(temp)
+            (root / "a.txt").write_text("aaa")
+            with mock.patch.object(_integrity, "_RACY_NS", 0):
+                cache = HashCache(root)
+                cache.digests(["a.txt"])
+                cache.save()
+            self.assertEqual(sorted(p.name for p in root.iterdir()),
+                             [CACHE_NAME, "a.txt"])
+
+    def test_recent_files_are_not_cached(self):
+        with TemporaryDirectory() as temp:
+            root = Path(temp)
+            (root / "a.txt").write_text("aaa")
+            cache = HashCache(root)
+            cache.digests(["a.txt"])
+            cache.save()
+            self.assertFalse((root / CACHE_NAME).exists())
+
+
+@unittest.skipUnless(is_posix, "POSIX only")
+class TestVerify(VenvTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.venv_dir = self.create_venv()
+        self.site = site_packages_dirs(self.venv_dir)[0]
+        wheels = self.project.temp_dir / "wheels"
+        wheels.mkdir()
+        install(self.venv_dir, [make_wheel(wheels, "vienchecked", extra={
+            "vienchecked-1.0.dist-info/entry_points.txt":
+                "[console_scripts]\nvien-checked = vienchecked:main\n"})],
+                compile=False)
+
+    def test_verify(self):
+        result = verify(self.venv_dir)
+        self.assertEqual(result.problems, [])
+        self.assertGreater(result.files, 10)
+        self.assertGreater(result.distributions, 1)
+
+        (self.site / "vienchecked.py").unlink()
+        (self.site / "vienchecked.py").write_text("VALUE = 43\n")
+        script = self.venv_dir / "bin" / "vien-checked"
+        script.unlink()
+        result = verify(self.venv_dir)
+        self.assertEqual(
+            sorted((p.distribution, p.path, p.reason)
+                   for p in result.problems),
+            [("vienchecked-1.0", "../../../bin/vien-checked", "missing"),
+             ("vienchecked-1.0", "vienchecked.py", "modified")])
+
+    def test_relocated_scripts(self):
+        # the scripts of the cloned environment have another path in the
+        # shebang than the one they were installed with
+        clone = self.project.temp_dir / "clone_venv"
+        from vien._clone import clone_venv
+        clone_venv(self.venv_dir, clone)
+        self.assertEqual(verify(clone).problems, [])
+        # the RECORD of the original environment is not changed
+        self.assertEqual(verify(self.venv_dir).problems, [])
+
+        # a changed body with the shebang of the environment
+        script = clone / "bin" / "vien-checked"
+        first_line = script.read_text().splitlines()[0]
+        script.write_text(first_line + "\nprint('replaced')\n")
+        self.assertEqual(
+            [(p.distribution, p.path, p.reason)
+             for p in verify(clone).problems],
+            [("vienchecked-1.0", "../../../bin/vien-checked", "modified")])
+
+    def test_command(self):
+        main_entry_point(["verify"])
+        (self.site / "vienchecked.py").unlink()
+        with self.assertRaises(VienExit):
+            main_entry_point(["verify"])
+
+
+@unittest.skipUnless(is_posix, "POSIX only")
+class TestFingerprint(VenvTestCase):
+
+    def test_fingerprint(self):
+        venv_dir = self.create_venv()
+        first = fingerprint(venv_dir)
+        self.assertEqual(len(first), 64)
+        self.assertEqual(fingerprint(venv_dir), first)
+
+        # the bytecode is not a part of the contents
+        site = site_packages_dirs(venv_dir)[0]
+        (site / "__pycache__").mkdir(exist_ok=True)
+        (site / "__pycache__" / "x.cpython-311.pyc").write_bytes(b"x")
+        self.assertEqual(fingerprint(venv_dir), first)
+
+        (site / "added.py").write_text("")
+        second = fingerprint(venv_dir)
+        self.assertNotEqual(second, first)
+        (site / "added.py").unlink()
+        (site / "added.py").write_text("#")
+        self.assertNotEqual(fingerprint(venv_dir), second)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,77 @@
+# SPDX-FileCopyrightText: (c) 2022 Artëm IG <github.com/rtmigo>
+# SPDX-License-Identifier: BSD-3-Clause
+
+import subprocess
+import unittest
+
+from vien._common import is_posix
+from vien._compile import site_packages_dirs
+from vien._core import venv_dir_to_python_exe
+from vien._layers import base_of, base_venv_dir, children
+from vien._main import main_entry_point
+from vien.testing import VenvTestCase, default_cache
+
+from tests.common import make_wheel
+
+
+@unittest.skipUnless(is_posix, "POSIX only")
+class TestLayers(VenvTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.base = base_venv_dir("common")
+        default_cache().clone(self.base)
+        (site_packages_dirs(self.base)[0] / "frombase.py").write_text(
+            "VALUE = 1\n")
+
+    def python(self, code: str) -> str:
+        return subprocess.check_output(
+            [str(venv_dir_to_python_exe(self.project.venv_dir)), "-c", code],
+            universal_newlines=True).strip()
+
+    def test_create(self):
+        main_entry_point(["create", "--base", "common"])
+        self.assertEqual(base_of(self.project.venv_dir), self.base)
+        self.assertEqual(children(self.project.vien_dir, self.base),
+                         [self.project.venv_dir])
+        self.assertEqual(self.python("import frombase; print(frombase.VALUE)"),
+                         "1")
+        # the packages of the base are not copied
+        self.assertFalse(
+            (site_packages_dirs(self.project.venv_dir)[0] / "pip").exists())
+        # the updates of the base are seen at once
+        (site_packages_dirs(self.base)[0] / "frombase.py").write_text(
+            "VALUE = 2\n")
+        self.assertEqual(self.python("import frombase; print(frombase.VALUE)"),
+                         "2")
+
+    def test_pip_installs_into_the_layer(self):
+        main_entry_point(["create", "--base", "common"])
+        wheel = make_wheel(self.project.temp_dir, "vienextra")
+        with self.assertRaises(SystemExit) as cm:
+            main_entry_point(["run", "pip", "install", "--quiet",
+                              "--disable-pip-version-check", str(wheel)])
+        self.assertEqual(cm.exception.code, 0)
+        self.assertTrue(
+            (site_packages_dirs(self.project.venv_dir)[0]
+             / "vienextra.py").exists())
+        self.assertFalse(
+            (site_packages_dirs(self.base)[0] / "vienextra.py").exists())
+
+    def test_recreate_keeps_base(self):
+        main_entry_point(["create", "--base", "common"])
+        main_entry_point(["recreate"])
+        self.assertEqual(base_of(self.project.venv_dir), self.base)
+
+    def test_errors(self):
+        with self.assertRaises(SystemExit) as cm:
+            main_entry_point(["create", "--base", "missing"])
+        self.assertIn("does not exist", str(cm.exception.code))
+        with self.assertRaises(SystemExit) as cm:
+            main_entry_point(["create", "--base", "common", "python3"])
+        self.assertIn("base", str(cm.exception.code))
+        self.assertFalse(self.project.venv_dir.exists())
+
+
+if __name__ == "__main__":
+    unittest.main()
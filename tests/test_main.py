@@ -22,6 +22,7 @@ from vien import main_entry_point
 from vien._common import is_windows
 from vien._exceptions import ChildExit, VenvExistsExit, VenvDoesNotExistExit, \
     PyFileNotFoundExit, CannotFindExecutableExit
+from vien.testing import default_cache
 
 
 class CapturedOutput:
@@ -138,6 +139,11 @@ class TestsInsideTempProjectDir(unittest.TestCase):
             # It seems the reason for this exception was the CWD in _temp_dir.
             # But anyway I'll try to ignore it if it's possible
 
+    def create_venv(self):
+        """Does the same as `vien create`, but faster. For the tests
+        that need a virtual environment, but do not test creating it."""
+        default_cache().clone(self.expectedVenvDir)
+
     def assertInVenv(self, inner: Path):
         inner_str = str(inner.absolute())
         outer_str = str(self.expectedVenvDir.absolute())
@@ -252,7 +258,7 @@ class TestsInsideTempProjectDir(unittest.TestCase):
         self.assertVenvExists()
 
     def test_create_fails_if_twice(self):
-        main_entry_point(["create"])
+        self.create_venv()
         with self.assertRaises(VenvExistsExit) as ce:
             main_entry_point(["create"])
         self.assertIsErrorExit(ce.exception)
@@ -288,7 +294,7 @@ class TestsInsideTempProjectDir(unittest.TestCase):
     def test_recreate_with_argument(self):
         self.assertVenvNotExists()
 
-        main_entry_point(["create", sys.executable])
+        self.create_venv()
 
         self.assertTrue(self.expectedVenvDir.exists())
 
@@ -340,7 +346,7 @@ class TestsInsideTempProjectDir(unittest.TestCase):
     def test_run_exit_code_0(self):
         """Test that main_entry_point returns the same exit code,
         as the called command"""
-        main_entry_point(["create"])  # need venv to run
+        self.create_venv()  # need venv to run
         with self.assertRaises(ChildExit) as ce:
             main_entry_point(windows_too(["run", "python3", "-c", "exit(0)"]))
         self.assertEqual(ce.exception.code, 0)
@@ -349,7 +355,7 @@ class TestsInsideTempProjectDir(unittest.TestCase):
     def test_run_exit_code_1(self):
         """Test that main_entry_point returns the same exit code,
         as the called command"""
-        main_entry_point(["create"])  # need venv to run
+        self.create_venv()  # need venv to run
         with self.assertRaises(ChildExit) as ce:
             main_entry_point(windows_too(["run", "python3", "-c", "exit(1)"]))
         self.assertEqual(ce.exception.code, 1)
@@ -358,14 +364,14 @@ class TestsInsideTempProjectDir(unittest.TestCase):
     def test_run_exit_code_2(self):
         """Test that main_entry_point returns the same exit code,
         as the called command"""
-        main_entry_point(["create"])  # need venv to run
+        self.create_venv()  # need venv to run
         with self.assertRaises(ChildExit) as ce:
             main_entry_point(windows_too(["run", "python3", "-c", "exit(2)"]))
         self.assertEqual(ce.exception.code, 2)
 
     @unittest.skipUnless(is_posix, "not POSIX")
     def test_run_python_version(self):
-        main_entry_point(["create"])
+        self.create_venv()
 
         with self.assertRaises(ChildExit):
             # just check the argparser handles --version properly
@@ -414,7 +420,7 @@ class TestsInsideTempProjectDir(unittest.TestCase):
     def test_run_p(self):
         """Checking the -p changes both venv directory and the first item
         in PYTHONPATH"""
-        main_entry_point(["create"])
+        self.create_venv()
         with TemporaryDirectory() as temp_cwd:
             # we will run it NOT from the project dir as CWD
             os.chdir(temp_cwd)
@@ -436,7 +442,7 @@ class TestsInsideTempProjectDir(unittest.TestCase):
     @unittest.skipUnless(is_posix, "not POSIX")
     def test_run_python_code(self):
         """Testing vien run python3 -c '...'"""
-        main_entry_point(["create"])
+        self.create_venv()
 
         file_to_be_created = self.projectDir / "hello.txt"
         self.assertFalse(file_to_be_created.exists())
@@ -478,14 +484,14 @@ class TestsInsideTempProjectDir(unittest.TestCase):
         self.assertIsErrorExit(ce.exception)
 
     def test_call_nonexistent_file(self):
-        main_entry_point(["create"])
+        self.create_venv()
         with self.assertRaises(PyFileNotFoundExit) as ce:
             main_entry_point(["call", "nonexistent.py"])
         self.assertIsErrorExit(ce.exception)
 
     def _call_for_exit_code(self, exit_code: int):
         (self.projectDir / "main.py").write_text(f"exit({exit_code})")
-        main_entry_point(["create"])
+        self.create_venv()
         with self.assertRaises(SystemExit) as ce:
             main_entry_point(["call", "main.py"])
         self.assertEqual(ce.exception.code, exit_code)
@@ -501,7 +507,7 @@ class TestsInsideTempProjectDir(unittest.TestCase):
         self._call_for_exit_code(23)
 
     def test_call_file_as_module(self):
-        main_entry_point(["create"])
+        self.create_venv()
 
         # creating pkg/sub/module.py
         file_py = self.project_pkg_sub / "module.py"
@@ -522,7 +528,7 @@ class TestsInsideTempProjectDir(unittest.TestCase):
                       self.reported_syspath)
 
     def test_call_file_as_file(self):
-        main_entry_point(["create"])
+        self.create_venv()
 
         # creating pkg/sub/module.py
         file_py = self.project_pkg_sub / "module.py"
@@ -545,7 +551,7 @@ class TestsInsideTempProjectDir(unittest.TestCase):
     def test_call_parameters(self):
         """Testing that call really passes parameters to child."""
 
-        main_entry_point(["create"])
+        self.create_venv()
 
         self.write_reporting_program(self.projectDir / "file.py")
 
@@ -560,7 +566,7 @@ class TestsInsideTempProjectDir(unittest.TestCase):
         """Tests that the -p parameter actually changes the project directory,
         so the correct virtual environment is found."""
 
-        main_entry_point(["create"])
+        self.create_venv()
         pkg_dir = self.projectDir / "subpkg"
         pkg_dir.mkdir()
         (pkg_dir / "__init__.py").touch()
@@ -617,7 +623,7 @@ class TestsInsideTempProjectDir(unittest.TestCase):
         """ Tests that modules are importable from the project dir
         set by -p parameter"""
 
-        main_entry_point(["create"])
+        self.create_venv()
         pkg_dir = self.projectDir / "subpkg"
         pkg_dir.mkdir()
         (pkg_dir / "__init__.py").touch()
@@ -646,7 +652,7 @@ class TestsInsideTempProjectDir(unittest.TestCase):
     def test_shell_p(self):
         """Checking the -p changes both venv directory and the first item
         in PYTHONPATH"""
-        main_entry_point(["create"])
+        self.create_venv()
         with TempCwd() as temp_cwd:
             # creating .py file to run
             code_py = Path(temp_cwd) / "code.py"
@@ -675,7 +681,7 @@ class TestsInsideTempProjectDir(unittest.TestCase):
 
     @unittest.skipUnless(is_posix, "not POSIX")
     def test_shell_ok(self):
-        main_entry_point(["create"])
+        self.create_venv()
 
         with TemporaryDirectory() as td:
             dir_to_create = Path(td) / "to_be_or_not_to_be"
@@ -705,13 +711,13 @@ class TestsInsideTempProjectDir(unittest.TestCase):
 
     @unittest.skipUnless(is_posix, "features implemented only for POSIX yet")
     def test_shell_exit_code_non_zero(self):
-        main_entry_point(["create"])
+        self.create_venv()
         self._run_and_check(["shell", "--input", "exit 42"],
                             expected_exit_code=42)
 
     @unittest.skipUnless(is_posix, "not POSIX")
     def test_shell_exit_code_zero(self):
-        main_entry_point(["create"])
+        self.create_venv()
         with TimeLimited(10):  # safety net
             self._run_and_check(["shell", "--input", "exit"],
                                 expected_exit_code=0)
@@ -729,7 +735,7 @@ class TestsInsideTempProjectDir(unittest.TestCase):
         with TemporaryDirectory() as tds:
             file_with_path = Path(tds) / "path.txt"
 
-            main_entry_point(["create"])
+            self.create_venv()
             try:
                 main_entry_point(
                     ["-p", str(self.projectDir.absolute()),
@@ -0,0 +1,120 @@
+# SPDX-FileCopyrightText: (c) 2022 Artëm IG <github.com/rtmigo>
+# SPDX-License-Identifier: BSD-3-Clause
+
+import sys
+import unittest
+from pathlib import Path
+from tempfile import TemporaryDirectory
+
+from vien import _modindex, api
+from vien._compile import site_packages_dirs
+from vien._main import main_entry_point
+from vien._modindex_finder import IndexFinder, is_fresh
+from vien._modindex_worker import build
+from vien.testing import VenvTestCase
+
+
+class TestBuild(unittest.TestCase):
+
+    def setUp(self):
+        self._temp = TemporaryDirectory()
+        self.temp = Path(self._temp.name)
+        self.a, self.b = self.temp / "a", self.temp / "b"
+        for d in (self.a, self.b):
+            (d / "ns").mkdir(parents=True)
+            (d / "pkg").mkdir()
+            (d / "pkg" / "__init__.py").write_text("")
+        (self.a / "only_a.py").write_text("")
+        (self.b / "not-identifier.py").write_text("")
+        self.archive = self.temp / "packed.zip"
+        self.archive.write_bytes(b"")
+
+    def tearDown(self):
+        self._temp.cleanup()
+
+    def test_index(self):
+        data = build([str(self.a), str(self.archive), str(self.b),
+                      str(self.temp / "missing")])
+        self.assertEqual(data["index"]["pkg"], (str(self.a), str(self.b)))
+        self.assertEqual(data["index"]["only_a"], (str(self.a),))
+        # left to the PathFinder
+        self.assertNotIn("ns", data["index"])
+        self.assertNotIn("not-identifier", data["index"])
+        self.assertNotIn(str(self.archive), data["known"])
+        self.assertTrue(is_fresh(data["stamps"]))
+        (self.b / "new.py").write_text("")
+        self.assertFalse(is_fresh(data["stamps"]))
+        (self.temp / "missing").mkdir()
+        self.assertFalse(is_fresh(data["stamps"][2:]))
+
+    def test_search_path(self):
+        data = build([str(self.a), str(self.b)])
+        finder = IndexFinder(data["index"], data["known"])
+        old_path = list(sys.path)
+        try:
+            unknown = str(self.temp / "script_dir")
+            sys.path[:] = [unknown, str(self.b), str(self.a)]
+            # the unknown entries are searched too, the known ones only if
+            # the module is there
+            self.assertEqual(finder.search_path("only_a"),
+                             [unknown, str(self.a)])
+            self.assertEqual(finder.search_path("pkg"), [unknown, str(self.b)])
+            self.assertIsNone(finder.search_path("json"))
+            sys.path[:] = [str(self.a)]
+            self.assertEqual(finder.search_path("pkg"), [str(self.a)])
+            spec = finder.find_spec("only_a")
+            self.assertEqual(spec.origin, str(self.a / "only_a.py"))
+            finder.invalidate_caches()
+            self.assertIsNone(finder.find_spec("only_a"))
+        finally:
+            sys.path[:] = old_path
+
+
+class TestModindexSetting(VenvTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.venv_dir = self.create_venv()
+        self.project_dir = self.project.project_dir
+        (self.project_dir / "main.py").write_text(
+            "import sys, first\n"
+            "print(first.X, any(type(f).__name__ == 'IndexFinder' "
+            "for f in sys.meta_path))\n")
+        (self.project_dir / "first.py").write_text("X = 1\n")
+
+    def call(self) -> str:
+        result = api.call(self.project_dir, ["main.py"], capture_output=True)
+        self.assertEqual(result.returncode, 0, result.stderr)
+        return result.stdout.decode().strip()
+
+    def test_on_and_off(self):
+        site = site_packages_dirs(self.venv_dir)[0]
+        main_entry_point(["config", "modindex", "on"])
+        self.assertTrue((site / _modindex.PTH_NAME).exists())
+        self.assertTrue(_modindex.is_fresh(self.venv_dir, self.project_dir))
+        self.assertGreater(_modindex.module_count(self.venv_dir), 0)
+        self.assertEqual(self.call(), "1 True")
+
+        main_entry_point(["config", "modindex", "off"])
+        self.assertFalse((site / _modindex.PTH_NAME).exists())
+        self.assertFalse(_modindex.data_file(self.venv_dir).exists())
+        self.assertEqual(self.call(), "1 False")
+
+    def test_stale_index_is_ignored_and_refreshed(self):
+        main_entry_point(["config", "modindex", "on"])
+        (self.project_dir / "first.py").unlink()
+        (self.project_dir / "first").mkdir()
+        (self.project_dir / "first" / "__init__.py").write_text("X = 2\n")
+        self.assertFalse(_modindex.is_fresh(self.venv_dir, self.project_dir))
+        self.assertEqual(self.call(), "2 False")
+        self.assertTrue(_modindex.refresh(self.venv_dir, self.project_dir))
+        self.assertFalse(_modindex.refresh(self.venv_dir, self.project_dir))
+        self.assertEqual(self.call(), "2 True")
+
+    def test_wrong_value(self):
+        with self.assertRaises(SystemExit):
+            main_entry_point(["config", "modindex", "yes"])
+
+
+if __name__ == "__main__":
+    unittest.main()
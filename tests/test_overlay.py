@@ -0,0 +1,63 @@
+# SPDX-FileCopyrightText: (c) 2022 Artëm IG <github.com/rtmigo>
+# SPDX-License-Identifier: BSD-3-Clause
+
+import os
+import time
+import unittest
+from pathlib import Path
+
+from vien._common import is_posix
+from vien._compile import site_packages_dirs
+from vien._main import main_entry_point
+from vien._overlay import get, evict, overlays_dir, packages_of
+from vien.testing import VenvTestCase
+
+from tests.common import make_wheel
+
+
+@unittest.skipUnless(is_posix, "POSIX only")
+class TestOverlay(VenvTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.venv_dir = self.create_venv()
+        self.wheel = make_wheel(self.project.temp_dir, "vienextra")
+
+    def test_get(self):
+        overlay = get(self.project.vien_dir, self.venv_dir, [str(self.wheel)])
+        self.assertEqual(packages_of(overlay), [str(self.wheel)])
+        self.assertTrue(
+            (site_packages_dirs(overlay)[0] / "vienextra.py").exists())
+        # the project environment is not changed
+        self.assertFalse(
+            (site_packages_dirs(self.venv_dir)[0] / "vienextra.py").exists())
+        # the same packages give the same overlay, built once
+        self.assertEqual(
+            get(self.project.vien_dir, self.venv_dir, [str(self.wheel)]),
+            overlay)
+
+    def test_command(self):
+        with self.assertRaises(SystemExit) as cm:
+            main_entry_point(["run", "--with", str(self.wheel), "python",
+                              "-c", "import vienextra, pip, sys; "
+                                    "sys.exit(vienextra.VALUE)"])
+        self.assertEqual(cm.exception.code, 42)
+        with self.assertRaises(SystemExit) as cm:
+            main_entry_point(["run", "python", "-c", "import vienextra"])
+        self.assertEqual(cm.exception.code, 1)
+
+    def test_evict(self):
+        root = overlays_dir(self.project.vien_dir)
+        for name in ["a", "b", "c"]:
+            (root / name).mkdir(parents=True)
+        old = time.time() - 7200
+        os.utime(str(root / "a"), (old, old))
+        os.utime(str(root / "b"), (old - 1, old - 1))
+        # "c" was used recently, so it is kept anyway
+        self.assertEqual(evict(self.project.vien_dir, keep=0),
+                         [root / "a", root / "b"])
+        self.assertEqual(list(root.iterdir()), [root / "c"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,134 @@
+# SPDX-FileCopyrightText: (c) 2022 Artëm IG <github.com/rtmigo>
+# SPDX-License-Identifier: BSD-3-Clause
+
+import os
+import subprocess
+import unittest
+from pathlib import Path
+from typing import Dict
+
+from vien import _pack
+from vien._compile import site_packages_dirs
+from vien._core import venv_dir_to_python_exe
+from vien._main import main_entry_point
+from vien._pack_worker import reason_to_keep
+from vien.testing import VenvTestCase
+
+
+class TestReasonToKeep(unittest.TestCase):
+    def test(self):
+        self.assertIsNone(reason_to_keep(
+            "a", ["a/__init__.py", "a/b/__init__.py", "a/b/c.py"], set()))
+        self.assertEqual(reason_to_keep("a", ["a/__init__.py"], {"a"}),
+                         "excluded")
+        self.assertEqual(reason_to_keep("pip", ["pip/__init__.py"], set()),
+                         "installer")
+        self.assertEqual(
+            reason_to_keep("a", ["a/__init__.py", "a/_c.cpython-38.so"],
+                           set()),
+            "native extensions")
+        self.assertEqual(reason_to_keep("a", ["a.pth", "a.py"], set()),
+                         "path configuration file")
+        self.assertEqual(reason_to_keep("a", ["ns/a/__init__.py"], set()),
+                         "namespace package")
+
+
+class TestPack(VenvTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.venv_dir = self.create_venv()
+        self.site = site_packages_dirs(self.venv_dir)[0]
+        self.install("pure_dist", {
+            "pure/__init__.py": "from pure.sub.mod import VALUE\n",
+            "pure/sub/__init__.py": "",
+            "pure/sub/mod.py": "VALUE = 42\n",
+            "pure/data.txt": "data\n",
+            "single.py": "X = 1\n"})
+        self.install("native_dist", {
+            "native/__init__.py": "",
+            "native/_ext.cpython-38-x86_64-linux-gnu.so": ""})
+        (self.site / "single.py").chmod(0o640)
+
+    def install(self, name: str, files: Dict[str, str]):
+        for f, text in files.items():
+            path = self.site / f
+            path.parent.mkdir(parents=True, exist_ok=True)
+            path.write_text(text)
+        dist_info = self.site / f"{name}-1.0.dist-info"
+        dist_info.mkdir()
+        (dist_info / "RECORD").write_text(
+            "".join(f"{f},,\n" for f in files)
+            + f"{dist_info.name}/RECORD,,\n")
+
+    def python(self, code: str) -> str:
+        return subprocess.check_output(
+            [str(venv_dir_to_python_exe(self.venv_dir)), "-c", code],
+            cwd=str(self.venv_dir.parent),
+            universal_newlines=True).strip()
+
+    def test_pack_and_unpack(self):
+        before = {p: p.read_bytes() for p in self.site.rglob("*")
+                  if p.is_file()}
+        mtime = os.stat(str(self.site / "pure" / "sub" / "mod.py")).st_mtime
+
+        [result] = _pack.pack(self.venv_dir)
+        self.assertEqual(result["packed"], ["pure-dist"])
+        self.assertEqual(result["kept"]["native-dist"], "native extensions")
+        self.assertEqual(result["files"], 5)
+        self.assertTrue(_pack.is_packed(self.venv_dir))
+        self.assertFalse((self.site / "pure").exists())
+        self.assertFalse((self.site / "single.py").exists())
+        self.assertTrue((self.site / "native" / "__init__.py").exists())
+        self.assertTrue((self.site / "pure_dist-1.0.dist-info").exists())
+        self.assertEqual(
+            self.python("import pure, single; print(pure.VALUE, "
+                        "type(pure.__loader__).__name__)"),
+            "42 zipimporter")
+
+        [result] = _pack.unpack(self.venv_dir)
+        self.assertEqual(result["files"], 5)
+        self.assertFalse(_pack.is_packed(self.venv_dir))
+        after = {p: p.read_bytes() for p in self.site.rglob("*")
+                 if p.is_file()}
+        self.assertEqual(after, before)
+        self.assertEqual(
+            os.stat(str(self.site / "pure" / "sub" / "mod.py")).st_mtime,
+            mtime)
+        self.assertEqual((self.site / "single.py").stat().st_mode & 0o777,
+                         0o640)
+        self.assertEqual(self.python("import pure; print(pure.__file__)"),
+                         str(self.site / "pure" / "__init__.py"))
+
+    def test_repack(self):
+        _pack.pack(self.venv_dir, ["pure-dist"])
+        self.assertFalse(_pack.is_packed(self.venv_dir))
+        _pack.pack(self.venv_dir)
+        self.install("later_dist", {"later.py": ""})
+        [result] = _pack.pack(self.venv_dir)
+        self.assertEqual(result["packed"], ["later-dist", "pure-dist"])
+
+    def test_unpack_keeps_reinstalled(self):
+        _pack.pack(self.venv_dir)
+        # as if pip reinstalled the files
+        (self.site / "single.py").write_text("X = 2\n")
+        (self.site / "pure" / "sub").mkdir(parents=True)
+        (self.site / "pure" / "sub" / "mod.py").write_text("VALUE = 43\n")
+        _pack.unpack(self.venv_dir)
+        self.assertEqual((self.site / "single.py").read_text(), "X = 2\n")
+        self.assertEqual((self.site / "pure" / "sub" / "mod.py").read_text(),
+                         "VALUE = 43\n")
+        self.assertTrue((self.site / "pure" / "__init__.py").exists())
+
+    def test_commands(self):
+        main_entry_point(["pack", "--exclude", "pure_dist"])
+        self.assertFalse(_pack.is_packed(self.venv_dir))
+        main_entry_point(["pack"])
+        self.assertTrue(_pack.is_packed(self.venv_dir))
+        main_entry_point(["unpack"])
+        self.assertFalse(_pack.is_packed(self.venv_dir))
+        self.assertTrue(Path(self.site / "pure" / "sub" / "mod.py").exists())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,146 @@
+# SPDX-FileCopyrightText: (c) 2022 Artëm IG <github.com/rtmigo>
+# SPDX-License-Identifier: BSD-3-Clause
+
+import io
+import os
+import sys
+import tarfile
+import unittest
+from pathlib import Path
+
+from vien._common import is_posix
+from vien._core import child_env, get_wheels_dir
+from vien._main import main_entry_point
+from vien._prebuild import parse_requirements, find_sdists, select, \
+    cached_wheel, interpreter_tags, Sdist
+from vien.testing import VenvTestCase
+
+
+def _make_sdist(directory: Path, name: str, version: str) -> Path:
+    """Creates an sdist that is built without downloading anything."""
+    base = f"{name}-{version}"
+    files = {
+        "pyproject.toml":
+            '[build-system]\nrequires = []\n'
+            'build-backend = "backend"\nbackend-path = ["."]\n',
+        # the smallest PEP 517 backend
+        "backend.py":
+            "import zipfile\n"
+            "def build_wheel(wheel_directory, config_settings=None,\n"
+            "                metadata_directory=None):\n"
+            f"    name = '{name}-{version}-py3-none-any.whl'\n"
+            "    with zipfile.ZipFile(wheel_directory + '/' + name, 'w') "
+            "as z:\n"
+            f"        z.writestr('{name}.py', '')\n"
+            f"        z.writestr('{name}-{version}.dist-info/METADATA',\n"
+            f"                   'Metadata-Version: 2.1\\nName: {name}\\n'\n"
+            f"                   'Version: {version}\\n')\n"
+            f"        z.writestr('{name}-{version}.dist-info/WHEEL',\n"
+            "                   'Wheel-Version: 1.0\\nGenerator: test\\n'\n"
+            "                   'Root-Is-Purelib: true\\nTag: py3-none-any\\n')\n"
+            f"        z.writestr('{name}-{version}.dist-info/RECORD', '')\n"
+            "    return name\n",
+        "PKG-INFO": f"Metadata-Version: 2.1\nName: {name}\n"
+                    f"Version: {version}\n"}
+    sdist = directory / f"{base}.tar.gz"
+    with tarfile.open(str(sdist), "w:gz") as tar:
+        for path, text in files.items():
+            data = text.encode()
+            info = tarfile.TarInfo(f"{base}/{path}")
+            info.size = len(data)
+            tar.addfile(info, io.BytesIO(data))
+    return sdist
+
+
+class TestParsing(unittest.TestCase):
+    def test_requirements(self):
+        self.assertEqual(
+            parse_requirements("# comment\nFoo_Bar==1.2  # pinned\n"
+                               "baz[extra]>=2\n-r other.txt\n"
+                               "qux == 3.0 ; python_version > '3'\n"
+                               "https://example.com/x.tar.gz\n"),
+            [("foo-bar", "1.2"), ("baz", None), ("qux", "3.0")])
+
+    def test_select(self):
+        sdists = {"foo": [Sdist("foo", "1.10", Path("foo-1.10.tar.gz")),
+                          Sdist("foo", "1.9", Path("foo-1.9.tar.gz"))]}
+        self.assertEqual([s.version for s in select(sdists, None)], ["1.10"])
+        self.assertEqual(
+            [s.version for s in select(sdists, [("foo", "1.9"),
+                                                ("bar", None)])],
+            ["1.9"])
+
+    def test_cached_wheel(self):
+        from tempfile import TemporaryDirectory
+        with TemporaryDirectory() as temp:
+            wheels = Path(temp)
+            sdist = Sdist("foo-bar", "1.0", Path("foo-bar-1.0.tar.gz"))
+            tags = ("cp311", "cp311", "3", "linux_x86_64")
+            (wheels / "foo_bar-1.0-cp310-cp310-linux_x86_64.whl").touch()
+            self.assertIsNone(cached_wheel(wheels, sdist, tags))
+            # the same version, but a debug build
+            (wheels / "foo_bar-1.0-cp311-cp311d-linux_x86_64.whl").touch()
+            self.assertIsNone(cached_wheel(wheels, sdist, tags))
+            (wheels / "foo_bar-1.0-cp311-cp311-linux_x86_64.whl").touch()
+            self.assertEqual(cached_wheel(wheels, sdist, tags).name,
+                             "foo_bar-1.0-cp311-cp311-linux_x86_64.whl")
+
+    def test_cached_wheel_free_threaded(self):
+        from tempfile import TemporaryDirectory
+        with TemporaryDirectory() as temp:
+            wheels = Path(temp)
+            sdist = Sdist("foo", "1.0", Path("foo-1.0.tar.gz"))
+            tags = ("cp313", "cp313t", "3", "linux_x86_64")
+            (wheels / "foo-1.0-cp313-cp313-linux_x86_64.whl").touch()
+            (wheels / "foo-1.0-cp313-abi3-linux_x86_64.whl").touch()
+            self.assertIsNone(cached_wheel(wheels, sdist, tags))
+            (wheels / "foo-1.0-py3-none-any.whl").touch()
+            self.assertIsNotNone(cached_wheel(wheels, sdist, tags))
+
+
+@unittest.skipUnless(is_posix, "POSIX only")
+class TestPrebuild(VenvTestCase):
+
+    def test_command(self):
+        self.create_venv()
+        sources = self.project.temp_dir / "sources"
+        sources.mkdir()
+        _make_sdist(sources, "vienone", "1.0")
+        _make_sdist(sources, "vientwo", "2.0")
+        self.assertEqual(sorted(find_sdists(sources)), ["vienone", "vientwo"])
+        requirements = self.project.project_dir / "requirements.txt"
+        requirements.write_text("vienone==1.0\n")
+
+        main_entry_point(["prebuild", "--sources", str(sources),
+                          "-r", str(requirements)])
+        self.assertEqual([p.name for p in get_wheels_dir().glob("*.whl")],
+                         ["vienone-1.0-py3-none-any.whl"])
+        main_entry_point(["prebuild", "--sources", str(sources)])
+        self.assertEqual(len(list(get_wheels_dir().glob("*.whl"))), 2)
+
+        env = child_env(self.project.project_dir)
+        self.assertIsNotNone(env)
+        self.assertEqual(env["PIP_FIND_LINKS"], str(get_wheels_dir()))
+        # the install uses the wheel, not the sdist
+        with self.assertRaises(SystemExit) as cm:
+            main_entry_point(["run", "pip", "install", "--no-index",
+                              "--quiet", "--disable-pip-version-check",
+                              "vienone"])
+        self.assertEqual(cm.exception.code, 0)
+
+    def test_interpreter_tags(self):
+        venv_dir = self.create_venv()
+        implementation, abi, major, _ = interpreter_tags(venv_dir)
+        self.assertEqual(implementation, "cp%d%d" % sys.version_info[:2])
+        self.assertEqual(abi, implementation + getattr(sys, "abiflags", ""))
+        self.assertEqual(major, str(sys.version_info[0]))
+
+    def test_no_find_links_with_spaces(self):
+        os.environ["VIENDIR"] = str(self.project.temp_dir / "vien dir")
+        get_wheels_dir().mkdir(parents=True)
+        env = child_env(self.project.project_dir)
+        self.assertNotIn("PIP_FIND_LINKS", env or {})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,142 @@
+# SPDX-FileCopyrightText: (c) 2022 Artëm IG <github.com/rtmigo>
+# SPDX-License-Identifier: BSD-3-Clause
+
+import io
+import os
+import sys
+import time
+import unittest
+from contextlib import redirect_stderr
+from pathlib import Path
+from tempfile import TemporaryDirectory
+
+from vien import _settings, api
+from vien._core import child_env
+from vien._exceptions import ChildExit, VienExit
+from vien._main import main_entry_point
+from vien._pycache import cache_dir, trim, prepare
+from vien.testing import VenvTestCase
+
+
+class TestTrim(unittest.TestCase):
+    def test_removes_oldest(self):
+        with TemporaryDirectory() as td:
+            now = time.time()
+            for i, name in enumerate(["old", "middle", "new"]):
+                path = Path(td, name)
+                path.write_bytes(b"x" * 100)
+                os.utime(str(path), (now + i, now + i))
+            self.assertEqual(trim(Path(td), 150), 200)
+            self.assertEqual(sorted(os.listdir(td)), ["new"])
+
+
+@unittest.skipUnless(hasattr(os, "getuid"), "not POSIX")
+class TestPrepare(unittest.TestCase):
+    def test_refuses_shared_base(self):
+        with TemporaryDirectory() as td:
+            base = Path(td, "base")
+            base.mkdir()
+            os.chmod(str(base), 0o777)
+            with self.assertRaises(PermissionError):
+                prepare(base / "project_venv-1234")
+
+
+class TestPycacheSetting(VenvTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.venv_dir = self.project.venv_dir
+        self.base = self.project.temp_dir / "pycache"
+
+    def test_settings_are_outside_venv(self):
+        main_entry_point(["config", "pycache", str(self.base)])
+        self.assertEqual(_settings.get(self.venv_dir, "pycache"),
+                         str(self.base))
+        self.assertFalse(self.venv_dir.exists())
+        main_entry_point(["config", "pycache", "--unset"])
+        self.assertIsNone(_settings.get(self.venv_dir, "pycache"))
+
+    def test_child_env(self):
+        self.assertIsNone(child_env(Path.cwd(), venv_dir=self.venv_dir))
+        main_entry_point(["config", "pycache", str(self.base)])
+        env = child_env(Path.cwd(), venv_dir=self.venv_dir)
+        self.assertEqual(env["PYTHONPYCACHEPREFIX"],
+                         str(cache_dir(self.venv_dir)))
+        self.assertTrue(cache_dir(self.venv_dir).is_dir())
+
+    @unittest.skipUnless(hasattr(os, "getuid"), "not POSIX")
+    def test_config_refuses_shared_directory(self):
+        self.base.mkdir()
+        os.chmod(str(self.base), 0o777)
+        with self.assertRaises(VienExit):
+            main_entry_point(["config", "pycache", str(self.base)])
+        self.assertIsNone(_settings.get(self.venv_dir, "pycache"))
+
+    @unittest.skipUnless(hasattr(os, "getuid"), "not POSIX")
+    def test_call_with_shared_directory(self):
+        self.create_venv()
+        main_entry_point(["config", "pycache", str(self.base)])
+        # made writable by others after the setting was saved
+        os.chmod(str(self.base), 0o777)
+        (self.project.project_dir / "main.py").write_text("exit(7)")
+        stderr = io.StringIO()
+        with redirect_stderr(stderr), self.assertRaises(ChildExit) as ce:
+            main_entry_point(["call", "main.py"])
+        self.assertEqual(ce.exception.code, 7)
+        self.assertIn("Not using the bytecode cache", stderr.getvalue())
+        # the library function runs the child the same way, but silently
+        stderr = io.StringIO()
+        with redirect_stderr(stderr):
+            result = api.call(self.project.project_dir, ["main.py"])
+        self.assertEqual(result.returncode, 7)
+        self.assertEqual(stderr.getvalue(), "")
+
+    def test_config_refuses_foreign_directory(self):
+        self.base.mkdir()
+        (self.base / "thesis.txt").write_text("data")
+        with self.assertRaises(VienExit):
+            main_entry_point(["config", "pycache", str(self.base)])
+        with self.assertRaises(VienExit):
+            main_entry_point(["config", "pycache", "~"])
+        self.assertIsNone(_settings.get(self.venv_dir, "pycache"))
+
+    def test_clear_all_keeps_other_files(self):
+        main_entry_point(["config", "pycache", str(self.base)])
+        child_env(Path.cwd(), venv_dir=self.venv_dir)
+        self.assertTrue(cache_dir(self.venv_dir).is_dir())
+        # put there after the directory was taken
+        (self.base / "thesis.txt").write_text("data")
+        main_entry_point(["cache", "clear", "--all"])
+        self.assertFalse(cache_dir(self.venv_dir).exists())
+        self.assertEqual((self.base / "thesis.txt").read_text(), "data")
+
+    def test_malformed_settings(self):
+        self.create_venv()
+        file = _settings.settings_file(self.venv_dir)
+        file.parent.mkdir(parents=True, exist_ok=True)
+        file.write_text("{not json")
+        (self.project.project_dir / "main.py").write_text("exit(7)")
+        with self.assertRaises(VienExit) as ce:
+            main_entry_point(["call", "main.py"])
+        self.assertIn("malformed", str(ce.exception.code))
+
+    @unittest.skipIf(sys.version_info < (3, 8), "no PYTHONPYCACHEPREFIX")
+    def test_bytecode_is_written_to_cache(self):
+        self.create_venv()
+        main_entry_point(["config", "pycache", str(self.base)])
+        project_dir = self.project.project_dir
+        (project_dir / "imported.py").write_text("X = 1")
+        (project_dir / "main.py").write_text("import imported")
+        result = api.call(project_dir, ["main.py"],
+                          env={"PYTHONDONTWRITEBYTECODE": ""})
+        self.assertEqual(result.returncode, 0)
+        self.assertFalse((project_dir / "__pycache__").exists())
+        cached = list(cache_dir(self.venv_dir).rglob("imported.*.pyc"))
+        self.assertEqual(len(cached), 1)
+
+        main_entry_point(["cache", "clear"])
+        self.assertFalse(cache_dir(self.venv_dir).exists())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,96 @@
+# SPDX-FileCopyrightText: (c) 2022 Artëm IG <github.com/rtmigo>
+# SPDX-License-Identifier: BSD-3-Clause
+
+import os
+import shutil
+import subprocess
+import unittest
+from pathlib import Path
+from tempfile import TemporaryDirectory
+
+from tests.common import is_posix
+from vien._exceptions import VienExit
+from vien._main import main_entry_point
+from vien._shebang import read_launcher, find_launchers, check, module_name
+from vien.testing import VenvTestCase
+
+
+class TestModuleName(unittest.TestCase):
+    def test_inner(self):
+        self.assertEqual(module_name(Path("/abc/proj/pkg/main.py"),
+                                     Path("/abc/proj")), "pkg.main")
+
+    def test_outer(self):
+        with self.assertRaises(ValueError):
+            module_name(Path("/abc/main.py"), Path("/abc/proj"))
+
+
+@unittest.skipUnless(is_posix, "not POSIX")
+class TestShebang(VenvTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.create_venv()
+        self.pkg_dir = self.project.project_dir / "pkg"
+        self.pkg_dir.mkdir()
+        (self.pkg_dir / "__init__.py").touch()
+        (self.pkg_dir / "const.py").write_text("X = 'from pkg'")
+        (self.pkg_dir / "main.py").write_text(
+            "import sys\n"
+            "from pkg.const import X\n"
+            "print(X, sys.prefix, sys.argv[1:])\n")
+        self.launcher = self.pkg_dir / "main"
+
+    def test_launcher_runs_module_in_venv(self):
+        main_entry_point(["shebang", "install", "pkg/main.py"])
+        self.assertTrue(os.access(str(self.launcher), os.X_OK))
+        with TemporaryDirectory() as td:
+            output = subprocess.check_output([str(self.launcher), "a b"],
+                                             cwd=td)
+        self.assertEqual(output.decode().strip().split(maxsplit=2),
+                         ["from", "pkg", f"{self.project.venv_dir} ['a b']"])
+
+    def test_output_arg(self):
+        main_entry_point(["shebang", "install", "pkg/main.py",
+                          "-o", "run_me"])
+        self.assertIsNotNone(
+            read_launcher(self.project.project_dir / "run_me"))
+        self.assertFalse(self.launcher.exists())
+
+    def test_default_path_is_directory(self):
+        (self.pkg_dir / "main").mkdir()
+        with self.assertRaises(VienExit):
+            main_entry_point(["shebang", "install", "pkg/main.py"])
+        self.assertEqual(list((self.pkg_dir / "main").iterdir()), [])
+        main_entry_point(["shebang", "install", "pkg/main.py",
+                          "-o", "pkg/main-launcher"])
+        self.assertIsNotNone(read_launcher(self.pkg_dir / "main-launcher"))
+
+    def test_file_outside_project(self):
+        outside = self.project.project_dir.parent / "outside.py"
+        outside.touch()
+        with self.assertRaises(VienExit):
+            main_entry_point(["shebang", "install", str(outside)])
+
+    def test_check_finds_stale_after_recreate(self):
+        main_entry_point(["shebang", "install", "pkg/main.py"])
+        self.assertEqual(list(find_launchers(self.project.project_dir)),
+                         [self.launcher])
+        self.assertEqual(check([self.launcher]), [])
+        main_entry_point(["shebang", "check"])
+
+        shutil.rmtree(str(self.project.venv_dir))
+        self.create_venv()
+        problems = check([self.launcher])
+        self.assertEqual(len(problems), 1)
+        self.assertIn("recreated", problems[0])
+        with self.assertRaises(VienExit):
+            main_entry_point(["shebang", "check"])
+
+    def test_not_a_launcher(self):
+        self.assertIsNone(read_launcher(self.pkg_dir / "main.py"))
+        self.assertEqual(len(check([self.pkg_dir / "main.py"])), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
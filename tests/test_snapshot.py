@@ -0,0 +1,79 @@
+# SPDX-FileCopyrightText: (c) 2022 Artëm IG <github.com/rtmigo>
+# SPDX-License-Identifier: BSD-3-Clause
+
+import os
+import stat
+import time
+import unittest
+
+from vien._common import is_posix
+from vien._compile import site_packages_dirs
+from vien._main import main_entry_point
+from vien._snapshot import take, rollback, snapshots, remove_old, \
+    SnapshotError
+from vien.testing import VenvTestCase
+
+
+@unittest.skipUnless(is_posix, "POSIX only")
+class TestSnapshot(VenvTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.venv_dir = self.create_venv()
+        self.module = site_packages_dirs(self.venv_dir)[0] / "mod.py"
+        self.module.write_text("VALUE = 1\n")
+
+    def test_take_and_rollback(self):
+        snapshot = take(self.venv_dir, "one")
+        snapshot_module = site_packages_dirs(snapshot)[0] / "mod.py"
+        # the files are not shared
+        self.assertNotEqual(os.stat(str(self.module)).st_ino,
+                            os.stat(str(snapshot_module)).st_ino)
+        self.assertTrue(os.stat(str(self.module)).st_mode & stat.S_IWUSR)
+
+        # changing the file in place leaves the snapshot intact
+        with self.module.open("w") as f:
+            f.write("VALUE = 2\n")
+        self.assertEqual(snapshot_module.read_text(), "VALUE = 1\n")
+        (self.venv_dir / "new.txt").write_text("new")
+
+        self.assertEqual(rollback(self.venv_dir), snapshot)
+        self.assertEqual(self.module.read_text(), "VALUE = 1\n")
+        self.assertFalse((self.venv_dir / "new.txt").exists())
+        # the snapshot may be restored again
+        self.assertTrue((site_packages_dirs(snapshot)[0] / "mod.py").exists())
+        self.assertEqual(
+            sorted(p.name for p in self.venv_dir.parent.iterdir()),
+            [self.venv_dir.name, "snapshots"])
+
+    def test_errors(self):
+        with self.assertRaises(SnapshotError):
+            rollback(self.venv_dir)
+        take(self.venv_dir, "one")
+        with self.assertRaises(SnapshotError):
+            take(self.venv_dir, "one")
+        with self.assertRaises(SnapshotError):
+            take(self.venv_dir, "../one")
+        with self.assertRaises(SnapshotError):
+            rollback(self.venv_dir, "two")
+
+    def test_retention(self):
+        for i, name in enumerate(["a", "b", "c"]):
+            snapshot = take(self.venv_dir, name)
+            t = time.time() - 100 + i
+            os.utime(str(snapshot), (t, t))
+        self.assertEqual([p.name for p in remove_old(self.venv_dir, keep=2)],
+                         ["a"])
+        self.assertEqual([p.name for p in snapshots(self.venv_dir)],
+                         ["b", "c"])
+
+    def test_commands(self):
+        main_entry_point(["snapshot", "good"])
+        self.module.unlink()
+        main_entry_point(["rollback", "good"])
+        self.assertTrue(self.module.exists())
+        main_entry_point(["snapshot", "--list"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,86 @@
+# SPDX-FileCopyrightText: (c) 2022 Artëm IG <github.com/rtmigo>
+# SPDX-License-Identifier: BSD-3-Clause
+
+import os
+import subprocess
+import sys
+import unittest
+from pathlib import Path
+from tempfile import TemporaryDirectory
+
+from tests.common import is_posix
+from vien._clone import clone_tree, replace_in_file
+from vien._core import venv_dir_to_python_exe
+from vien.testing import VenvTestCase, VenvCache, TempProject
+
+
+class TestCloneTree(unittest.TestCase):
+    def test_links_and_symlinks(self):
+        with TemporaryDirectory() as td:
+            src = Path(td) / "src"
+            (src / "sub").mkdir(parents=True)
+            (src / "sub" / "file.txt").write_text("data")
+            os.symlink("sub/file.txt", str(src / "link"))
+
+            dst = Path(td) / "dst"
+            clone_tree(src, dst)
+
+            self.assertEqual((dst / "sub" / "file.txt").read_text(), "data")
+            self.assertEqual(os.readlink(str(dst / "link")), "sub/file.txt")
+            self.assertEqual((dst / "sub" / "file.txt").stat().st_ino,
+                             (src / "sub" / "file.txt").stat().st_ino)
+
+    def test_replace_does_not_touch_other_links(self):
+        with TemporaryDirectory() as td:
+            a = Path(td) / "a"
+            b = Path(td) / "b"
+            a.write_text("old path")
+            os.link(str(a), str(b))
+            self.assertTrue(replace_in_file(b, b"old", b"new"))
+            self.assertEqual(a.read_text(), "old path")
+            self.assertEqual(b.read_text(), "new path")
+            self.assertFalse(replace_in_file(b, b"old", b"new"))
+
+
+@unittest.skipUnless(is_posix, "not POSIX")
+class TestVenvCache(unittest.TestCase):
+    def test_key_depends_on_requirements(self):
+        cache = VenvCache(Path("/nonexistent"))
+        self.assertEqual(cache.key(sys.executable, ["a", "b"]),
+                         cache.key(sys.executable, ["b", "a"]))
+        self.assertNotEqual(cache.key(sys.executable, ["a"]),
+                            cache.key(sys.executable, []))
+
+    def test_clones_are_independent(self):
+        with TemporaryDirectory() as td:
+            cache = VenvCache(Path(td) / "cache")
+            first = cache.clone(Path(td) / "first_venv")
+            second = cache.clone(Path(td) / "second_venv")
+            for venv_dir in (first, second):
+                activate = (venv_dir / "bin" / "activate").read_text()
+                self.assertIn(str(venv_dir), activate)
+                subprocess.run(
+                    [str(venv_dir_to_python_exe(venv_dir)), "-c", "pass"],
+                    check=True)
+            cache.clear()
+            self.assertTrue(venv_dir_to_python_exe(first).exists())
+
+
+class TestVenvTestCase(VenvTestCase):
+    def test_project(self):
+        self.assertEqual(Path.cwd().resolve(),
+                         self.project.project_dir.resolve())
+        self.assertEqual(os.environ["VIENDIR"], str(self.project.vien_dir))
+        self.assertFalse(self.project.venv_dir.exists())
+        self.create_venv()
+        self.assertTrue(self.project.venv_dir.exists())
+
+    def test_temp_project_restores_environ(self):
+        old = os.environ.get("VIENDIR")
+        with TempProject() as project:
+            self.assertEqual(os.environ["VIENDIR"], str(project.vien_dir))
+        self.assertEqual(os.environ.get("VIENDIR"), old)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,121 @@
+# SPDX-FileCopyrightText: (c) 2022 Artëm IG <github.com/rtmigo>
+# SPDX-License-Identifier: BSD-3-Clause
+
+import os
+import sys
+import time
+import unittest
+from pathlib import Path
+
+from vien import api
+from vien._main import main_entry_point
+from vien._tier import promote, demote, sweep, exchange, fast_path, \
+    TierError, lock_file, use_lock_file, in_use, start_sweep_if_due, \
+    IDLE_DAYS_ENV
+from vien.testing import VenvTestCase
+
+
+@unittest.skipUnless(sys.platform.startswith("linux"), "Linux only")
+class TestTier(VenvTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.venv_dir = self.create_venv()
+        self.fast = self.project.temp_dir / "fast"
+        self.project_dir = self.project.project_dir
+        (self.project_dir / "main.py").write_text(
+            "import sys; print(sys.prefix)")
+
+    def prefix(self) -> str:
+        result = api.call(self.project_dir, ["main.py"], capture_output=True)
+        self.assertEqual(result.returncode, 0, result.stderr)
+        return result.stdout.decode().strip()
+
+    def test_exchange(self):
+        a, b = self.project.temp_dir / "a", self.project.temp_dir / "b"
+        a.mkdir()
+        b.write_text("b")
+        exchange(a, b)
+        self.assertTrue(b.is_dir())
+        self.assertEqual(a.read_text(), "b")
+
+    def test_promote_and_demote(self):
+        self.assertTrue(promote(self.venv_dir, self.fast))
+        self.assertFalse(promote(self.venv_dir, self.fast))
+        self.assertTrue(self.venv_dir.is_symlink())
+        self.assertEqual(Path(os.readlink(str(self.venv_dir))),
+                         fast_path(self.venv_dir, self.fast))
+        # the path of the environment is the same
+        self.assertEqual(self.prefix(), str(self.venv_dir))
+
+        self.assertTrue(demote(self.venv_dir, self.fast))
+        self.assertFalse(demote(self.venv_dir, self.fast))
+        self.assertFalse(self.venv_dir.is_symlink())
+        self.assertEqual(list(self.fast.iterdir()), [])
+        self.assertEqual(self.prefix(), str(self.venv_dir))
+
+    def test_sweep(self):
+        promote(self.venv_dir, self.fast)
+        self.assertEqual(sweep(self.project.vien_dir, self.fast, idle=3600),
+                         [])
+        old = time.time() - 7200
+        os.utime(str(self.venv_dir), (old, old), follow_symlinks=False)
+        self.assertEqual(sweep(self.project.vien_dir, self.fast, idle=3600),
+                         [self.venv_dir])
+
+    def test_not_moved_while_in_use(self):
+        with in_use(self.venv_dir):
+            self.assertFalse(promote(self.venv_dir, self.fast))
+            self.assertFalse(self.venv_dir.is_symlink())
+        self.assertTrue(promote(self.venv_dir, self.fast))
+        with in_use(self.venv_dir):
+            self.assertFalse(demote(self.venv_dir, self.fast))
+            self.assertEqual(sweep(self.project.vien_dir, self.fast, idle=0),
+                             [])
+        self.assertTrue(demote(self.venv_dir, self.fast))
+
+    def test_detached_sweep(self):
+        promote(self.venv_dir, self.fast)
+        os.environ[IDLE_DAYS_ENV] = "0"
+        try:
+            self.assertTrue(start_sweep_if_due(self.project.vien_dir,
+                                               self.fast))
+            # at most once in an interval
+            self.assertFalse(start_sweep_if_due(self.project.vien_dir,
+                                                self.fast))
+        finally:
+            del os.environ[IDLE_DAYS_ENV]
+        deadline = time.monotonic() + 60
+        while self.venv_dir.is_symlink() and time.monotonic() < deadline:
+            time.sleep(0.1)
+        self.assertFalse(self.venv_dir.is_symlink())
+        self.assertEqual(self.prefix(), str(self.venv_dir))
+
+    def test_foreign_symlink(self):
+        other = self.project.temp_dir / "elsewhere"
+        self.venv_dir.rename(other)
+        self.venv_dir.symlink_to(other)
+        with self.assertRaises(TierError):
+            demote(self.venv_dir, self.fast)
+
+    def test_commands(self):
+        os.environ["VIEN_FAST_DIR"] = str(self.fast)
+        try:
+            with self.assertRaises(SystemExit):
+                main_entry_point(["call", "main.py"])
+            self.assertTrue(self.venv_dir.is_symlink())
+            main_entry_point(["tier", "demote"])
+            self.assertFalse(self.venv_dir.is_symlink())
+            main_entry_point(["tier", "promote"])
+            main_entry_point(["delete"])
+            self.assertFalse(self.venv_dir.exists())
+            self.assertFalse(self.venv_dir.is_symlink())
+            self.assertFalse(lock_file(self.venv_dir).exists())
+            self.assertFalse(use_lock_file(self.venv_dir).exists())
+            self.assertEqual(list(self.fast.glob("*_venv-*")), [])
+        finally:
+            del os.environ["VIEN_FAST_DIR"]
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,67 @@
+# SPDX-FileCopyrightText: (c) 2022 Artëm IG <github.com/rtmigo>
+# SPDX-License-Identifier: BSD-3-Clause
+
+import json
+import os
+import unittest
+from pathlib import Path
+from tempfile import TemporaryDirectory
+
+from vien import _trace, main_entry_point
+from vien._trace import Tracer, NullTracer, tracer_from_env, TRACE_ENV
+
+
+class TestTracer(unittest.TestCase):
+    def test_lines(self):
+        t = Tracer("stderr")
+        t.phase("a")
+        t.phase("b")
+        records = [json.loads(line) for line in t.lines()]
+        self.assertEqual([r["phase"] for r in records], ["a", "b", "total"])
+        self.assertEqual(records[1]["start_ns"],
+                         records[0]["start_ns"] + records[0]["duration_ns"])
+        self.assertEqual(records[-1]["duration_ns"],
+                         sum(r["duration_ns"] for r in records[:-1]))
+
+    def test_from_env(self):
+        old = os.environ.pop(TRACE_ENV, None)
+        try:
+            self.assertIsInstance(tracer_from_env(), NullTracer)
+            os.environ[TRACE_ENV] = "0"
+            self.assertIsInstance(tracer_from_env(), NullTracer)
+            os.environ[TRACE_ENV] = "stderr"
+            self.assertIsInstance(tracer_from_env(), Tracer)
+        finally:
+            os.environ.pop(TRACE_ENV, None)
+            if old is not None:
+                os.environ[TRACE_ENV] = old
+
+    def test_main_entry_point_phases(self):
+        with TemporaryDirectory() as td:
+            trace_file = Path(td) / "trace.jsonl"
+            old_tracer = _trace.tracer
+            _trace.tracer = Tracer(str(trace_file))
+            try:
+                main_entry_point(["path"])
+            finally:
+                _trace.tracer = old_tracer
+            phases = [json.loads(line)["phase"]
+                      for line in trace_file.read_text().splitlines()]
+            self.assertEqual(phases, ["import", "parse_args", "project_dir",
+                                      "finish", "total"])
+
+    def test_unwritable_destination(self):
+        with TemporaryDirectory() as td:
+            old_tracer = _trace.tracer
+            # a directory cannot be appended to
+            _trace.tracer = Tracer(td)
+            try:
+                with self.assertRaises(SystemExit) as cm:
+                    main_entry_point(["no-such-command"])
+            finally:
+                _trace.tracer = old_tracer
+            self.assertEqual(cm.exception.code, 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,121 @@
+# SPDX-FileCopyrightText: (c) 2022 Artëm IG <github.com/rtmigo>
+# SPDX-License-Identifier: BSD-3-Clause
+
+import subprocess
+import sys
+import unittest
+from pathlib import Path
+from unittest import mock
+
+from vien._common import is_posix
+from vien._compile import site_packages_dirs
+from vien._core import venv_dir_to_python_exe
+from vien._main import main_entry_point
+from vien import _upgrade
+from vien._integrity import update_records, verify
+from vien._upgrade import is_pure, _fix_shebang
+from vien.testing import VenvTestCase
+
+from tests.common import make_wheel
+
+
+class TestIsPure(unittest.TestCase):
+    def check(self, text: str) -> bool:
+        from tempfile import TemporaryDirectory
+        with TemporaryDirectory() as temp:
+            file = Path(temp) / "WHEEL"
+            file.write_text("Wheel-Version: 1.0\n" + text)
+            return is_pure(file)
+
+    def test(self):
+        self.assertTrue(self.check(
+            "Root-Is-Purelib: true\nTag: py3-none-any\n"))
+        self.assertTrue(self.check(
+            "Root-Is-Purelib: true\nTag: py2-none-any\nTag: py3-none-any\n"))
+        self.assertFalse(self.check(
+            "Root-Is-Purelib: false\nTag: py3-none-any\n"))
+        self.assertFalse(self.check(
+            "Root-Is-Purelib: true\nTag: cp311-cp311-manylinux_2_17_x86_64\n"))
+        self.assertFalse(self.check(
+            "Root-Is-Purelib: true\nTag: cp311-none-any\n"))
+        self.assertFalse(is_pure(Path("/nonexistent/WHEEL")))
+
+
+@unittest.skipUnless(is_posix, "POSIX only")
+class TestUpgrade(VenvTestCase):
+
+    def test_fix_shebang(self):
+        script = self.project.temp_dir / "script"
+        script.write_text("#!/abc/x_venv/bin/python3.9\nprint(1)\n")
+        script.chmod(0o755)
+        self.assertTrue(_fix_shebang(script))
+        self.assertFalse(_fix_shebang(script))
+        self.assertEqual(script.read_text(),
+                         "#!/abc/x_venv/bin/python\nprint(1)\n")
+        self.assertEqual(script.stat().st_mode & 0o777, 0o755)
+
+    def test_command(self):
+        venv_dir = self.create_venv()
+        wheels = self.project.temp_dir / "wheels"
+        wheels.mkdir()
+        pure = make_wheel(wheels, "vienpure")
+        native = make_wheel(wheels, "viennative", purelib=False)
+        subprocess.check_call(
+            [str(venv_dir_to_python_exe(venv_dir)), "-m", "pip", "install",
+             "--quiet", "--disable-pip-version-check", "--no-index",
+             str(pure), str(native)])
+
+        main_entry_point(["upgrade-python", "python3",
+                          "--find-links", str(wheels)])
+
+        site = site_packages_dirs(venv_dir)[0]
+        self.assertTrue((site / "vienpure.py").exists())
+        self.assertTrue((site / "viennative.py").exists())
+        self.assertEqual(
+            {p.name for p in site.glob("vien*.dist-info")},
+            {"vienpure-1.0.dist-info", "viennative-1.0.dist-info"})
+        self.assertNotIn(".vien-upgrade",
+                         (venv_dir / "pyvenv.cfg").read_text())
+        self.assertEqual(list(venv_dir.parent.glob("*.vien-upgrade")), [])
+        subprocess.check_call([str(venv_dir_to_python_exe(venv_dir)), "-c",
+                               "import vienpure, viennative"])
+
+    def test_scripts_are_verified(self):
+        venv_dir = self.create_venv()
+        wheels = self.project.temp_dir / "wheels"
+        wheels.mkdir()
+        pure = make_wheel(wheels, "vienscript", extra={
+            "vienscript-1.0.dist-info/entry_points.txt":
+                "[console_scripts]\nvien-script = vienscript:main\n"})
+        subprocess.check_call(
+            [str(venv_dir_to_python_exe(venv_dir)), "-m", "pip", "install",
+             "--quiet", "--disable-pip-version-check", "--no-index",
+             str(pure)])
+        # as installed by the versioned interpreter
+        script = venv_dir / "bin" / "vien-script"
+        text = script.read_text()
+        script.write_text(text.replace(
+            "/bin/python\n", "/bin/python%d.%d\n" % sys.version_info[:2],
+            1))
+        update_records(venv_dir, [script])
+
+        result = _upgrade.upgrade(venv_dir, sys.executable, wheels)
+        self.assertIsNone(result.compile_error)
+        self.assertEqual(script.read_text().splitlines()[0],
+                         f"#!{venv_dir}/bin/python")
+        self.assertEqual(verify(venv_dir).problems, [])
+
+    def test_compile_failure_keeps_upgrade(self):
+        venv_dir = self.create_venv()
+        error = subprocess.CalledProcessError(1, ["python"])
+        with mock.patch.object(_upgrade, "compile_trees",
+                               side_effect=error):
+            result = _upgrade.upgrade(venv_dir, sys.executable)
+        self.assertIsNotNone(result.compile_error)
+        self.assertEqual(list(venv_dir.parent.glob("*.vien-upgrade")), [])
+        subprocess.check_call([str(venv_dir_to_python_exe(venv_dir)), "-c",
+                               "pass"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,66 @@
+# SPDX-FileCopyrightText: (c) 2022 Artëm IG <github.com/rtmigo>
+# SPDX-License-Identifier: BSD-3-Clause
+
+import os
+import sys
+import unittest
+from pathlib import Path
+from tempfile import TemporaryDirectory
+
+from vien._main import main_entry_point
+from vien._warm import venv_files, warm, read_file_list, format_result, \
+    WarmResult
+from vien.testing import VenvTestCase
+
+
+class TestWarm(unittest.TestCase):
+
+    def setUp(self):
+        self._temp = TemporaryDirectory()
+        self.temp = Path(self._temp.name)
+        (self.temp / "sub").mkdir()
+        (self.temp / "a.py").write_bytes(b"x" * 10000)
+        (self.temp / "sub" / "empty.py").write_bytes(b"")
+
+    def tearDown(self):
+        self._temp.cleanup()
+
+    @unittest.skipUnless(hasattr(os, "symlink"), "no symlinks")
+    def test_venv_files_are_unique(self):
+        os.symlink(str(self.temp / "a.py"), str(self.temp / "link.py"))
+        os.symlink(str(self.temp / "missing"), str(self.temp / "broken"))
+        files = venv_files(self.temp)
+        self.assertEqual(len(files), 2)
+        self.assertIn(self.temp / "sub" / "empty.py", files)
+
+    def test_warm(self):
+        result = warm(venv_files(self.temp) + [self.temp / "missing"],
+                      jobs=2)
+        self.assertEqual(result.files, 3)
+        self.assertEqual(result.bytes, 10000)
+        if sys.platform.startswith("linux"):
+            self.assertIsNotNone(result.resident_bytes)
+            self.assertLessEqual(result.resident_bytes, 10000)
+
+    def test_read_file_list(self):
+        file = self.temp / "list.txt"
+        file.write_text("# saved\n/a/b.py\n\n/c.so\n")
+        self.assertEqual(read_file_list(file), [Path("/a/b.py"),
+                                                Path("/c.so")])
+
+    def test_format(self):
+        self.assertEqual(
+            format_result(WarmResult(2, 2 * 1024 * 1024, 1024 * 1024)),
+            "Warmed 2 files, 2.0 MiB. 1.0 MiB (50%) were already in memory.")
+        self.assertEqual(format_result(WarmResult(0, 0, None)),
+                         "Warmed 0 files, 0.0 MiB.")
+
+
+class TestWarmCommand(VenvTestCase):
+    def test(self):
+        self.create_venv()
+        main_entry_point(["warm", "-j", "2"])
+
+
+if __name__ == "__main__":
+    unittest.main()
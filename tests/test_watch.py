@@ -0,0 +1,115 @@
+# SPDX-FileCopyrightText: (c) 2022 Artëm IG <github.com/rtmigo>
+# SPDX-License-Identifier: BSD-3-Clause
+
+import os
+import signal
+import struct
+import subprocess
+import sys
+import time
+import unittest
+from pathlib import Path
+from tempfile import TemporaryDirectory
+
+from vien._watch import parse_events, is_ignored, DirWatcher, \
+    DEFAULT_IGNORE, IN_CREATE, IN_ISDIR
+from vien.testing import VenvTestCase
+
+is_linux = sys.platform.startswith("linux")
+
+
+def wait_until(predicate, timeout: float = 10.0) -> bool:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.05)
+    return False
+
+
+class TestParseEvents(unittest.TestCase):
+    def test_two_events(self):
+        buffer = struct.pack("iIII", 1, IN_CREATE, 0, 8) + b"abc.py\0\0" \
+                 + struct.pack("iIII", 2, IN_CREATE | IN_ISDIR, 0, 0)
+        self.assertEqual(parse_events(buffer),
+                         [(1, IN_CREATE, "abc.py"),
+                          (2, IN_CREATE | IN_ISDIR, "")])
+
+
+class TestIgnored(unittest.TestCase):
+    def test_defaults(self):
+        for name in [".git", "__pycache__", "x.pyc", "project_venv",
+                     ".main.py.swp"]:
+            self.assertTrue(is_ignored(name, DEFAULT_IGNORE), name)
+        for name in ["main.py", "pkg", "data.json"]:
+            self.assertFalse(is_ignored(name, DEFAULT_IGNORE), name)
+
+
+@unittest.skipUnless(is_linux, "not Linux")
+class TestDirWatcher(unittest.TestCase):
+
+    def test_change_in_subdir(self):
+        with TemporaryDirectory() as td:
+            root = Path(td)
+            (root / "pkg").mkdir()
+            with DirWatcher(root, DEFAULT_IGNORE) as watcher:
+                (root / "pkg" / "main.py").write_text("x")
+                self.assertEqual(watcher.wait_burst(5, debounce=0.1),
+                                 [root / "pkg" / "main.py"])
+
+    def test_ignored(self):
+        with TemporaryDirectory() as td:
+            root = Path(td)
+            (root / ".git").mkdir()
+            with DirWatcher(root, DEFAULT_IGNORE) as watcher:
+                (root / ".git" / "index").write_text("x")
+                (root / "main.pyc").write_text("x")
+                self.assertEqual(watcher.wait(0.3), [])
+
+    def test_new_dir_is_watched(self):
+        with TemporaryDirectory() as td:
+            root = Path(td)
+            with DirWatcher(root, DEFAULT_IGNORE) as watcher:
+                (root / "new").mkdir()
+                self.assertEqual(watcher.wait(5), [root / "new"])
+                (root / "new" / "file.py").write_text("x")
+                self.assertEqual(watcher.wait(5), [root / "new" / "file.py"])
+
+
+@unittest.skipUnless(is_linux, "not Linux")
+class TestCallWatch(VenvTestCase):
+
+    def test_restarts_on_change(self):
+        self.create_venv()
+        project_dir = self.project.project_dir
+        log = project_dir.parent / "runs.log"
+        main_py = project_dir / "main.py"
+        main_py.write_text(
+            "import time\n"
+            f"with open({str(log)!r}, 'a') as f: f.write('run\\n')\n"
+            "time.sleep(60)\n")
+
+        repo_dir = Path(__file__).parent.parent
+        env = {**os.environ,
+               "PYTHONPATH": os.pathsep.join(
+                   [str(repo_dir), os.environ.get("PYTHONPATH", "")])}
+        process = subprocess.Popen(
+            [sys.executable, "-m", "vien", "call", "--watch", "main.py"],
+            cwd=str(project_dir), env=env, stderr=subprocess.PIPE)
+        try:
+            def runs() -> int:
+                return len(log.read_text().splitlines()) \
+                    if log.exists() else 0
+
+            self.assertTrue(wait_until(lambda: runs() == 1))
+            main_py.write_text(main_py.read_text() + "\n")
+            self.assertTrue(wait_until(lambda: runs() == 2))
+        finally:
+            process.send_signal(signal.SIGINT)
+            _, stderr = process.communicate(timeout=10)
+        self.assertEqual(process.returncode, 130)
+        self.assertIn(b"Restarting", stderr)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,98 @@
+# SPDX-FileCopyrightText: (c) 2022 Artëm IG <github.com/rtmigo>
+# SPDX-License-Identifier: BSD-3-Clause
+
+import subprocess
+import unittest
+from unittest import mock
+
+from vien._common import is_posix
+from vien._compile import site_packages_dirs
+from vien._core import venv_dir_to_python_exe
+from vien._main import main_entry_point
+from vien import _wheels
+from vien._wheels import install, uninstall, WheelError
+from vien.testing import VenvTestCase
+
+from tests.common import make_wheel
+
+
+@unittest.skipUnless(is_posix, "POSIX only")
+class TestWheels(VenvTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.venv_dir = self.create_venv()
+        self.site = site_packages_dirs(self.venv_dir)[0]
+        self.wheels = self.project.temp_dir / "wheels"
+        self.wheels.mkdir()
+
+    def test_install(self):
+        first = make_wheel(self.wheels, "vienone", extra={
+            "vienone-1.0.dist-info/entry_points.txt":
+                "[console_scripts]\nvien-one = vienone_pkg:main\n",
+            "vienone-1.0.data/scripts/vien-one-raw":
+                "#!python\nprint('raw')\n",
+            "vienone_pkg/__init__.py": "def main():\n    print('one')\n"})
+        second = make_wheel(self.wheels, "vientwo")
+        result = install(self.venv_dir, [first, second])
+        self.assertEqual(result.installed, ["vienone==1.0", "vientwo==1.0"])
+
+        bin_dir = self.venv_dir / "bin"
+        self.assertEqual(subprocess.check_output(
+            [str(bin_dir / "vien-one-raw")]).strip(), b"raw")
+        self.assertEqual(subprocess.check_output(
+            [str(bin_dir / "vien-one")]).strip(), b"one")
+        self.assertTrue(any((self.site / "vienone_pkg" / "__pycache__")
+                            .glob("*.pyc")))
+
+        # pip sees the distributions and can uninstall them
+        subprocess.check_call(
+            [str(venv_dir_to_python_exe(self.venv_dir)), "-m", "pip",
+             "uninstall", "--yes", "--quiet", "vientwo"])
+        self.assertFalse((self.site / "vientwo.py").exists())
+
+        # installing again replaces the installed files
+        self.assertTrue(uninstall(self.site, "VienOne"))
+        self.assertFalse((self.site / "vienone_pkg").exists())
+        self.assertFalse((bin_dir / "vien-one").exists())
+        self.assertFalse(uninstall(self.site, "vienone"))
+
+    def test_reinstall_removes_first(self):
+        # both distributions have files in the same directory
+        wheels = [make_wheel(self.wheels, name,
+                             extra={f"vienshared/{name}.py": ""})
+                  for name in ("vienone", "vientwo")]
+        install(self.venv_dir, wheels, compile=False)
+        events = []
+        remove, write = _wheels._remove, _wheels._write
+
+        def logged(name, function):
+            def wrapper(*args):
+                events.append(name)
+                return function(*args)
+            return wrapper
+
+        with mock.patch.object(_wheels, "_remove", logged("remove", remove)), \
+                mock.patch.object(_wheels, "_write", logged("write", write)):
+            install(self.venv_dir, wheels, jobs=2, compile=False)
+        self.assertEqual(events[:2], ["remove", "remove"])
+        self.assertNotIn("remove", events[2:])
+        self.assertTrue((self.site / "vienshared" / "vienone.py").exists())
+        self.assertTrue((self.site / "vienshared" / "vientwo.py").exists())
+
+    def test_unsafe_path(self):
+        wheel = make_wheel(self.wheels, "vienbad",
+                           extra={"../../evil.py": ""})
+        with self.assertRaises(WheelError):
+            install(self.venv_dir, [wheel])
+
+    def test_command(self):
+        make_wheel(self.wheels, "vienone")
+        make_wheel(self.wheels, "vientwo")
+        main_entry_point(["install-wheels", str(self.wheels), "-j", "2"])
+        self.assertTrue((self.site / "vienone.py").exists())
+        self.assertTrue((self.site / "vientwo.py").exists())
+
+
+if __name__ == "__main__":
+    unittest.main()
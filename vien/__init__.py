@@ -1,6 +1,7 @@
 # SPDX-FileCopyrightText: (c) 2021 Artëm IG <github.com/rtmigo>
 # SPDX-License-Identifier: BSD-3-Clause
 
+from . import _trace  # must be the first import: it starts the timer
 from ._common import is_posix
 from ._constants import __version__, __license__, __copyright__
 from ._main import main_entry_point
@@ -0,0 +1,277 @@
+# SPDX-FileCopyrightText: (c) 2022 Artëm IG <github.com/rtmigo>
+# SPDX-License-Identifier: BSD-3-Clause
+
+"""Environment keys and archives for CI caches: `vien key`, `vien save`
+and `vien restore`.
+
+The key is a hash of what the environment is built from: the interpreter
+(its version, ABI, platform and the real path of the executable, since
+the environment links to it) and the contents of the dependency files of
+the project. The paths of the files are taken relative to the project,
+so the same project checked out elsewhere has the same key.
+
+An archive is a directory `<cache-dir>/<key>` with a manifest and several
+gzipped tar parts. The files of the environment are spread over the
+parts by size, and the parts are written and unpacked concurrently by a
+thread pool: zlib and the file writes release the GIL, so the threads
+really run in parallel. The parts are streamed, nothing is kept in
+memory.
+
+The manifest keeps the path of the saved environment. The restore
+unpacks the parts next to the new path, replaces the old path in the
+files that contain it (the scripts, `pyvenv.cfg` and the `.pth` files,
+the same ones as for a clone) and their hashes in the RECORD files, and
+renames the directory into place. So the environment may be restored for
+another project directory or another `$VIENDIR`.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import heapq
+import json
+import os
+import shutil
+import subprocess
+import tarfile
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, List, NamedTuple, Optional, Sequence, Set, Tuple
+
+from vien._clone import _files_with_venv_paths, replace_in_file
+from vien._integrity import update_records
+
+FORMAT = 1
+
+MANIFEST_NAME = "manifest.json"
+
+# the archives are a cache: the speed matters more than the size
+_COMPRESS_LEVEL = 1
+
+# the files found in the project when no files are given
+DEPENDENCY_PATTERNS = ("requirements*.txt", "requirements/*.txt",
+                       "constraints*.txt", "pyproject.toml", "setup.cfg",
+                       "setup.py", "Pipfile.lock", "poetry.lock")
+
+_INTERPRETER_SCRIPT = (
+    "import json, os, platform, sys, sysconfig; "
+    "print(json.dumps({"
+    "'implementation': sys.implementation.name, "
+    "'version': platform.python_version(), "
+    "'abi': sysconfig.get_config_var('SOABI') or '', "
+    "'abiflags': getattr(sys, 'abiflags', ''), "
+    "'platform': sysconfig.get_platform(), "
+    "'executable': os.path.realpath(sys.executable)}))")
+
+
+class ArchiveError(Exception):
+    pass
+
+
+class Saved(NamedTuple):
+    archive: Path
+    files: int
+    # False if the archive of the key existed before
+    created: bool
+
+
+def dependency_files(project_dir: Path) -> List[Path]:
+    """Returns the dependency files found in the project directory."""
+    found: Set[Path] = set()
+    for pattern in DEPENDENCY_PATTERNS:
+        found.update(p for p in project_dir.glob(pattern) if p.is_file())
+    return sorted(found)
+
+
+def interpreter_info(python_exe: str) -> Dict[str, str]:
+    """Returns what the key depends on in the interpreter. The executable
+    of an environment gives the same as the one it was created with."""
+    output = subprocess.check_output([python_exe, "-c", _INTERPRETER_SCRIPT],
+                                     universal_newlines=True)
+    return json.loads(output)
+
+
+def _file_hash(path: Path) -> str:
+    h = hashlib.sha256()
+    with path.open("rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def key(project_dir: Path, python_exe: str,
+        files: Optional[Sequence[Path]] = None) -> str:
+    """Returns the key of the environment built with the interpreter from
+    the dependency files (by default, the ones found in the project)."""
+    if files is None:
+        files = dependency_files(project_dir)
+    h = hashlib.sha256()
+    h.update(f"vien-archive {FORMAT}\n".encode())
+    h.update(json.dumps(interpreter_info(python_exe),
+                        sort_keys=True).encode() + b"\n")
+    named = sorted(
+        (Path(os.path.relpath(str(f.absolute()),
+                              str(project_dir.absolute()))).as_posix(), f)
+        for f in files)
+    for name, file in named:
+        try:
+            digest = _file_hash(file)
+        except OSError as e:
+            raise ArchiveError(f"Cannot read {file}: {e}")
+        h.update(f"{name} {digest}\n".encode())
+    return h.hexdigest()
+
+
+def _check_key(value: str) -> None:
+    if not value or value.startswith(".") or os.sep in value \
+            or "/" in value or (os.altsep and os.altsep in value):
+        raise ArchiveError(f"Invalid key: {value!r}")
+
+
+def _workers(jobs: int) -> int:
+    return jobs if jobs > 0 else (os.cpu_count() or 1)
+
+
+def _tree(root: Path) -> Tuple[List[str], List[Tuple[str, int]]]:
+    """Returns the directories and the files (with the sizes) of the
+    tree, relative to the root."""
+    dirs: List[str] = []
+    files: List[Tuple[str, int]] = []
+    for parent, dir_names, file_names in os.walk(str(root)):
+        rel = os.path.relpath(parent, str(root))
+        for name in dir_names:
+            path = os.path.join(parent, name)
+            if os.path.islink(path):
+                # os.walk does not follow it, but lists it as a directory
+                files.append((os.path.normpath(os.path.join(rel, name)), 0))
+            else:
+                dirs.append(os.path.normpath(os.path.join(rel, name)))
+        for name in file_names:
+            st = os.lstat(os.path.join(parent, name))
+            files.append((os.path.normpath(os.path.join(rel, name)),
+                          st.st_size))
+    return dirs, files
+
+
+def _split(files: List[Tuple[str, int]], parts: int) -> List[List[str]]:
+    """Spreads the files over the parts, so the parts have about the same
+    size."""
+    heap = [(0, i) for i in range(parts)]
+    result: List[List[str]] = [[] for _ in range(parts)]
+    for name, size in sorted(files, key=lambda f: (-f[1], f[0])):
+        total, i = heapq.heappop(heap)
+        result[i].append(name)
+        heapq.heappush(heap, (total + size, i))
+    return [sorted(names) for names in result if names]
+
+
+def _write_part(root: Path, names: List[str], file: Path) -> None:
+    with tarfile.open(str(file), "w:gz",
+                      compresslevel=_COMPRESS_LEVEL) as tar:
+        for name in names:
+            tar.add(str(root / name), arcname=name, recursive=False)
+
+
+def save(venv_dir: Path, cache_dir: Path, env_key: str,
+         jobs: int = 0) -> Saved:
+    """Archives the environment into `cache_dir/env_key`. An archive that
+    already exists is kept as it is."""
+    from vien import _layers
+    _check_key(env_key)
+    if _layers.base_of(venv_dir) is not None:
+        raise ArchiveError("The environment is layered on a base, and "
+                           "cannot be restored without it.")
+    archive = cache_dir / env_key
+    if (archive / MANIFEST_NAME).exists():
+        return Saved(archive=archive, files=0, created=False)
+    # the environment may be a symlink to $VIEN_FAST_DIR
+    real = Path(os.path.realpath(str(venv_dir)))
+    dirs, files = _tree(real)
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    temp = Path(tempfile.mkdtemp(prefix=f".{env_key}.", dir=str(cache_dir)))
+    try:
+        parts = _split(files, min(_workers(jobs), max(1, len(files))))
+        part_names = [f"part-{i}.tar.gz" for i in range(len(parts))]
+        with ThreadPoolExecutor(max_workers=len(parts) or 1) as pool:
+            list(pool.map(lambda i: _write_part(real, parts[i],
+                                                temp / part_names[i]),
+                          range(len(parts))))
+        # the manifest is written last: an archive without it is not
+        # complete
+        with (temp / MANIFEST_NAME).open("w") as f:
+            json.dump({"format": FORMAT, "key": env_key,
+                       "venv_dir": str(venv_dir), "dirs": sorted(dirs),
+                       "parts": part_names, "files": len(files)}, f)
+        try:
+            os.rename(str(temp), str(archive))
+        except OSError:
+            if not (archive / MANIFEST_NAME).exists():
+                raise
+            # saved by a concurrent process
+            return Saved(archive=archive, files=0, created=False)
+    finally:
+        shutil.rmtree(str(temp), ignore_errors=True)
+    return Saved(archive=archive, files=len(files), created=True)
+
+
+def _extract_part(file: Path, target: Path) -> None:
+    with tarfile.open(str(file), "r:gz") as tar:
+        if hasattr(tarfile, "tar_filter"):
+            # the environments link to the interpreter by absolute paths,
+            # so not the "data" filter
+            tar.extractall(str(target), filter="tar")
+        else:
+            tar.extractall(str(target))
+
+
+def manifest(cache_dir: Path, env_key: str) -> Optional[dict]:
+    """Returns the manifest of the archive, or None if there is no
+    archive for the key."""
+    _check_key(env_key)
+    try:
+        with (cache_dir / env_key / MANIFEST_NAME).open() as f:
+            data = json.load(f)
+    except FileNotFoundError:
+        return None
+    if data.get("format") != FORMAT:
+        return None
+    return data
+
+
+def restore(venv_dir: Path, cache_dir: Path, env_key: str,
+            jobs: int = 0) -> dict:
+    """Unpacks the archive of the key as the environment `venv_dir`, that
+    must not exist. Returns the manifest."""
+    data = manifest(cache_dir, env_key)
+    if data is None:
+        raise ArchiveError(f"There is no saved environment for the key "
+                           f"{env_key} in {cache_dir}")
+    if os.path.lexists(str(venv_dir)):
+        raise ArchiveError(f"{venv_dir} already exists.")
+    archive = cache_dir / env_key
+    temp = venv_dir.with_name(venv_dir.name + ".vien-restore")
+    if temp.exists():
+        shutil.rmtree(str(temp))
+    temp.mkdir(parents=True)
+    try:
+        # the parts are unpacked concurrently into the same directories
+        for d in data["dirs"]:
+            (temp / d).mkdir(parents=True, exist_ok=True)
+        with ThreadPoolExecutor(
+                max_workers=min(_workers(jobs),
+                                len(data["parts"])) or 1) as pool:
+            list(pool.map(lambda name: _extract_part(archive / name, temp),
+                          data["parts"]))
+        old = str(data["venv_dir"]).encode()
+        new = str(venv_dir).encode()
+        if old != new:
+            update_records(temp, [path
+                                  for path in _files_with_venv_paths(temp)
+                                  if path.exists()
+                                  and replace_in_file(path, old, new)])
+        os.rename(str(temp), str(venv_dir))
+    except BaseException:
+        shutil.rmtree(str(temp), ignore_errors=True)
+        raise
+    return data
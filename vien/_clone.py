@@ -0,0 +1,115 @@
+# SPDX-FileCopyrightText: (c) 2022 Artëm IG <github.com/rtmigo>
+# SPDX-License-Identifier: BSD-3-Clause
+
+from __future__ import annotations
+
+import os
+import shutil
+import sys
+from pathlib import Path
+from typing import Iterator
+
+# from linux/fs.h
+_FICLONE = 0x40049409
+
+
+def reflink(src: str, dst: str) -> bool:
+    """Creates `dst` as a copy-on-write clone of `src` (Btrfs, XFS and the
+    like). Returns False if the filesystem or the OS cannot do it."""
+    if not sys.platform.startswith("linux"):
+        return False
+    import fcntl
+    try:
+        with open(src, "rb") as s, open(dst, "wb") as d:
+            fcntl.ioctl(d.fileno(), _FICLONE, s.fileno())
+    except OSError:
+        try:
+            os.unlink(dst)
+        except OSError:
+            pass
+        return False
+    shutil.copystat(src, dst)
+    return True
+
+
+def _link_or_copy(src: str, dst: str, link: bool) -> None:
+    if link:
+        try:
+            os.link(src, dst, follow_symlinks=False)
+            return
+        except OSError:
+            # different filesystems, or the filesystem does not support
+            # hard links
+            pass
+    elif reflink(src, dst):
+        # an independent file, that shares the blocks until written
+        return
+    shutil.copy2(src, dst, follow_symlinks=False)
+
+
+def clone_tree(src: Path, dst: Path, link: bool = True) -> None:
+    """Recreates the `src` directory tree at `dst`. Regular files become
+    hard links to the original files (or copies, if linking is not possible
+    or `link` is False; reflinks where the filesystem supports them).
+    Symlinks are copied as symlinks."""
+    os.mkdir(str(dst))
+    shutil.copystat(str(src), str(dst))
+    for entry in os.scandir(str(src)):
+        target = os.path.join(str(dst), entry.name)
+        if entry.is_symlink():
+            os.symlink(os.readlink(entry.path), target)
+        elif entry.is_dir():
+            clone_tree(Path(entry.path), Path(target), link=link)
+        else:
+            _link_or_copy(entry.path, target, link=link)
+
+
+def _files_with_venv_paths(venv_dir: Path) -> Iterator[Path]:
+    # the absolute path of a virtual environment is written to the activate
+    # scripts, to the shebang lines of the scripts in bin, to the
+    # 'command' line of pyvenv.cfg, and maybe to the .pth files
+    from vien._compile import site_packages_dirs
+    yield venv_dir / "pyvenv.cfg"
+    for site in site_packages_dirs(venv_dir):
+        yield from site.glob("*.pth")
+    for bin_name in ("bin", "Scripts"):
+        bin_dir = venv_dir / bin_name
+        if bin_dir.is_dir():
+            for entry in os.scandir(str(bin_dir)):
+                if entry.is_file(follow_symlinks=False):
+                    yield Path(entry.path)
+
+
+def replace_in_file(path: Path, old: bytes, new: bytes) -> bool:
+    """Replaces the bytes in the file. The file is rewritten by creating
+    a new file and renaming it, so if the old file was a hard link, the
+    other links are not affected. Returns False if the file did not contain
+    the `old` bytes."""
+    data = path.read_bytes()
+    if old not in data:
+        return False
+    temp = path.with_name(path.name + ".vien-tmp")
+    temp.write_bytes(data.replace(old, new))
+    shutil.copymode(str(path), str(temp))
+    os.replace(str(temp), str(path))
+    return True
+
+
+def relocate_venv(venv_dir: Path, old_venv_dir: Path) -> None:
+    """Fixes the absolute paths in a virtual environment that was moved
+    or copied from `old_venv_dir` to `venv_dir`."""
+    from vien._integrity import update_records
+    old = str(old_venv_dir).encode()
+    new = str(venv_dir).encode()
+    update_records(venv_dir, [path
+                              for path in _files_with_venv_paths(venv_dir)
+                              if path.exists()
+                              and replace_in_file(path, old, new)])
+
+
+def clone_venv(src: Path, dst: Path, link: bool = True) -> None:
+    """Creates a working copy of the `src` virtual environment at `dst`.
+    The files are hard-linked when possible, except those that contain
+    the absolute path of the environment."""
+    clone_tree(src, dst, link=link)
+    relocate_venv(dst, src)
@@ -0,0 +1,100 @@
+# SPDX-FileCopyrightText: (c) 2022 Artëm IG <github.com/rtmigo>
+# SPDX-License-Identifier: BSD-3-Clause
+
+"""Byte-compiling the virtual environment and the project in advance, so
+the first run after `create` or `pip install` does not pay for it (and
+the runs on read-only hosts never do)."""
+
+from __future__ import annotations
+
+import json
+import os
+import subprocess
+from pathlib import Path
+from typing import List, NamedTuple, Optional, Sequence
+
+from vien._core import venv_dir_to_python_exe
+
+AUTO_COMPILE_ENV = "VIEN_AUTO_COMPILE"
+
+INVALIDATION_MODES = ("timestamp", "checked-hash", "unchecked-hash")
+
+# directory names not compiled in the project tree
+PROJECT_EXCLUDE = (".*", "__pycache__", "*_venv", "node_modules", "build",
+                   "dist")
+
+_WORKER = Path(__file__).with_name("_compile_worker.py")
+
+
+class CompileResult(NamedTuple):
+    compiled: int
+    up_to_date: int
+    failed: int
+
+
+def auto_compile_enabled() -> bool:
+    return os.environ.get(AUTO_COMPILE_ENV, '') not in ('', '0')
+
+
+def site_packages_dirs(venv_dir: Path) -> List[Path]:
+    # lib/python3.X/site-packages on POSIX, Lib/site-packages on Windows
+    return sorted(p for p in list(venv_dir.glob("lib/python*/site-packages"))
+                  + list(venv_dir.glob("Lib/site-packages")) if p.is_dir())
+
+
+def is_install_command(command: Sequence[str]) -> bool:
+    """Whether the `vien run` command (probably) installed packages:
+    `pip install ...` or `python -m pip install ...`."""
+    names = [os.path.basename(arg) for arg in command]
+    return "install" in names \
+        and any(n.startswith("pip") for n in names[:names.index("install")])
+
+
+def compile_trees(venv_dir: Path, roots: Sequence[Path],
+                  exclude: Sequence[str] = (),
+                  optimize: Sequence[int] = (0,),
+                  invalidation: str = "timestamp",
+                  jobs: int = 0,
+                  pycache_prefix: Optional[str] = None) -> CompileResult:
+    """Compiles the .py files in the `roots` with the interpreter of the
+    environment. The files with up-to-date .pyc are skipped."""
+    if invalidation not in INVALIDATION_MODES:
+        raise ValueError(invalidation)
+    config = {"roots": [str(r) for r in roots], "exclude": list(exclude),
+              "optimize": sorted(set(optimize)),
+              "invalidation": invalidation, "jobs": jobs,
+              "pycache_prefix": pycache_prefix}
+    # -I: neither the PYTHONPATH nor the working directory may affect
+    # the worker
+    output = subprocess.check_output(
+        [str(venv_dir_to_python_exe(venv_dir)), "-I", str(_WORKER),
+         json.dumps(config)])
+    return CompileResult(**json.loads(output))
+
+
+def compile_venv_and_project(venv_dir: Path, project_dir: Path,
+                             venv: bool = True, project: bool = True,
+                             **kwargs) -> CompileResult:
+    # the children will look for the .pyc files in the same place
+    from vien._pycache import child_prefix
+    kwargs.setdefault("pycache_prefix", child_prefix(venv_dir))
+    result = CompileResult(0, 0, 0)
+    if venv:
+        result = _add(result, compile_trees(
+            venv_dir, site_packages_dirs(venv_dir), **kwargs))
+    if project:
+        result = _add(result, compile_trees(
+            venv_dir, [project_dir], exclude=PROJECT_EXCLUDE, **kwargs))
+    return result
+
+
+def _add(a: CompileResult, b: CompileResult) -> CompileResult:
+    return CompileResult(*(x + y for x, y in zip(a, b)))
+
+
+def format_result(result: CompileResult) -> str:
+    text = f"Compiled {result.compiled} files, " \
+           f"{result.up_to_date} were up to date."
+    if result.failed:
+        text += f" Failed to compile {result.failed} files."
+    return text
@@ -0,0 +1,147 @@
+# SPDX-FileCopyrightText: (c) 2022 Artëm IG <github.com/rtmigo>
+# SPDX-License-Identifier: BSD-3-Clause
+
+"""Byte-compiles directory trees in parallel. Used by `vien compile`.
+
+The .pyc files depend on the Python version, so this script is run by the
+interpreter of the virtual environment, not by vien. It must not import
+vien and must work with any Python 3.7+.
+
+The only argument is a JSON object:
+    {"roots": [...], "exclude": [...], "optimize": [0, 1],
+     "invalidation": "timestamp", "jobs": 0, "pycache_prefix": null}
+
+Prints a JSON object with the numbers of compiled, up-to-date and failed
+files.
+"""
+
+import fnmatch
+import importlib.util
+import json
+import os
+import py_compile
+import struct
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+# the values of the flags field of the .pyc header (PEP 552)
+_FLAGS = {"timestamp": 0, "unchecked-hash": 0b01, "checked-hash": 0b11}
+
+_MODES = {"timestamp": py_compile.PycInvalidationMode.TIMESTAMP,
+          "unchecked-hash": py_compile.PycInvalidationMode.UNCHECKED_HASH,
+          "checked-hash": py_compile.PycInvalidationMode.CHECKED_HASH}
+
+
+def iter_sources(root, exclude):
+    if os.path.isfile(root):
+        if root.endswith(".py"):
+            yield root
+        return
+    for dir_path, dir_names, file_names in os.walk(root):
+        dir_names[:] = [d for d in dir_names
+                        if not any(fnmatch.fnmatchcase(d, p)
+                                   for p in exclude)]
+        for name in file_names:
+            if name.endswith(".py"):
+                yield os.path.join(dir_path, name)
+
+
+def cache_file(source, level):
+    return importlib.util.cache_from_source(
+        source, optimization=level if level else "")
+
+
+def is_up_to_date(source, cfile, invalidation):
+    """Checks the .pyc header without compiling anything."""
+    try:
+        with open(cfile, "rb") as f:
+            header = f.read(16)
+    except OSError:
+        return False
+    if len(header) < 16 or header[:4] != importlib.util.MAGIC_NUMBER:
+        return False
+    flags = struct.unpack("<I", header[4:8])[0]
+    if flags != _FLAGS[invalidation]:
+        return False
+    if invalidation == "timestamp":
+        st = os.stat(source)
+        return header[8:16] == struct.pack("<II",
+                                           int(st.st_mtime) & 0xFFFFFFFF,
+                                           st.st_size & 0xFFFFFFFF)
+    with open(source, "rb") as f:
+        return header[8:16] == importlib.util.source_hash(f.read())
+
+
+def process(sources, optimize, invalidation):
+    """Returns (compiled, up to date, failed) counts."""
+    compiled = up_to_date = failed = 0
+    for source in sources:
+        for level in optimize:
+            cfile = cache_file(source, level)
+            try:
+                if is_up_to_date(source, cfile, invalidation):
+                    up_to_date += 1
+                    continue
+                py_compile.compile(source, cfile, doraise=True,
+                                   optimize=level,
+                                   invalidation_mode=_MODES[invalidation])
+                compiled += 1
+            except (py_compile.PyCompileError, OSError, ValueError):
+                # syntax errors, unreadable or read-only files
+                failed += 1
+    return compiled, up_to_date, failed
+
+
+def available_cpus():
+    if hasattr(os, "sched_getaffinity"):
+        # in containers, fewer CPUs than os.cpu_count() may be available
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
+
+
+def chunks(items, size):
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+
+def set_pycache_prefix(prefix):
+    if prefix:
+        # the same as PYTHONPYCACHEPREFIX for the children (Python 3.8+)
+        sys.pycache_prefix = prefix
+
+
+def main():
+    config = json.loads(sys.argv[1])
+    prefix = config.get("pycache_prefix")
+    set_pycache_prefix(prefix)
+    sources = []
+    for root in config["roots"]:
+        sources.extend(iter_sources(root, config["exclude"]))
+    optimize = config["optimize"]
+    invalidation = config["invalidation"]
+    jobs = config["jobs"] or available_cpus()
+
+    totals = [0, 0, 0]
+    if jobs == 1 or len(sources) < 100:
+        # starting the processes would take longer than the work
+        totals = list(process(sources, optimize, invalidation))
+    else:
+        # the processes started by "spawn" (the default on macOS) do not
+        # inherit the prefix
+        with ProcessPoolExecutor(max_workers=jobs,
+                                 initializer=set_pycache_prefix,
+                                 initargs=(prefix,)) as executor:
+            # many small chunks keep all the workers busy until the end
+            size = max(1, min(64, len(sources) // (jobs * 4)))
+            futures = [executor.submit(process, chunk, optimize, invalidation)
+                       for chunk in chunks(sources, size)]
+            for future in futures:
+                for i, n in enumerate(future.result()):
+                    totals[i] += n
+
+    print(json.dumps({"compiled": totals[0], "up_to_date": totals[1],
+                      "failed": totals[2]}))
+
+
+if __name__ == "__main__":
+    main()
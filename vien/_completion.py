@@ -0,0 +1,226 @@
+# SPDX-FileCopyrightText: (c) 2022 Artëm IG <github.com/rtmigo>
+# SPDX-License-Identifier: BSD-3-Clause
+
+"""Bash completion that does not start Python.
+
+The completion function reads `$VIENDIR/completion.index`, a small
+tab-separated file with the commands, the known project directories and
+the interpreters found in PATH. vien rewrites the index when it creates or
+deletes an environment. Everything else (files, directories, scripts of the
+environment) is completed by bash itself.
+"""
+
+from __future__ import annotations
+
+import os
+import re
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+INDEX_NAME = "completion.index"
+_HEADER = "# vien completion index 1\n"
+
+_PYTHON_NAME = re.compile(r"^python(\d+(\.\d+)?)?$")
+
+
+def index_file(vien_dir: Path) -> Path:
+    return vien_dir / INDEX_NAME
+
+
+def read_index(vien_dir: Path) -> List[Tuple[str, str]]:
+    try:
+        text = index_file(vien_dir).read_text()
+    except (OSError, UnicodeDecodeError):
+        return []
+    result = []
+    for line in text.splitlines():
+        kind, sep, value = line.partition("\t")
+        if sep and not kind.startswith("#"):
+            result.append((kind, value))
+    return result
+
+
+def find_interpreters(path_var: Optional[str] = None) -> List[str]:
+    """Returns the names like 'python3.8' of the executables in PATH."""
+    if path_var is None:
+        path_var = os.environ.get("PATH", "")
+    names = set()
+    for directory in path_var.split(os.pathsep):
+        try:
+            entries = list(os.scandir(directory or "."))
+        except OSError:
+            continue
+        for entry in entries:
+            if _PYTHON_NAME.match(entry.name) \
+                    and os.access(entry.path, os.X_OK):
+                names.add(entry.name)
+    # python3.9 before python3.10
+    return sorted(names, key=lambda name: [int(n) for n in
+                                           re.findall(r"\d+", name)])
+
+
+def _known_projects(vien_dir: Path) -> Dict[str, str]:
+    """Returns {venv name: project dir} for the existing environments."""
+    result = {}
+    for kind, value in read_index(vien_dir):
+        if kind == "project":
+            venv_name = os.path.basename(value) + "_venv"
+            if (vien_dir / venv_name).is_dir():
+                result[venv_name] = value
+    return result
+
+
+def update_index(vien_dir: Path, commands: Iterable[str],
+                 created_project: Optional[Path] = None) -> None:
+    """Rewrites the index. The projects of the removed environments are
+    dropped from it."""
+    projects = _known_projects(vien_dir)
+    if created_project is not None:
+        projects[created_project.name + "_venv"] = str(created_project)
+    lines = [f"command\t{c}" for c in commands] \
+        + [f"project\t{p}" for p in sorted(projects.values())] \
+        + [f"python\t{p}" for p in find_interpreters()]
+    index = index_file(vien_dir)
+    vien_dir.mkdir(parents=True, exist_ok=True)
+    temp = index.with_name(index.name + ".vien-tmp")
+    temp.write_text(_HEADER + "".join(line + "\n" for line in lines))
+    os.replace(str(temp), str(index))
+
+
+BASH_SCRIPT = r'''# bash completion for vien. Generated by `vien completion bash`.
+# It reads ${VIENDIR:-~/.vien}/completion.index and never starts Python.
+
+_vien_read_index() {
+    _vien_commands=() _vien_projects=() _vien_pythons=()
+    local index="${VIENDIR:-$HOME/.vien}/completion.index" kind value
+    [ -r "$index" ] || return
+    while IFS=$'\t' read -r kind value; do
+        case $kind in
+            command) _vien_commands+=("$value") ;;
+            project) _vien_projects+=("$value") ;;
+            python) _vien_pythons+=("$value") ;;
+        esac
+    done < "$index"
+}
+
+_vien_add_matching() {
+    # adds the words that start with $cur
+    local word
+    for word in "$@"; do
+        [[ $word == "$cur"* ]] && COMPREPLY+=("$word")
+    done
+}
+
+_vien_add_files() {
+    # adds the directories and the .py files; with $module set, only the
+    # files that can be run with `call -m`
+    local IFS=$'\n' path name abs
+    compopt -o filenames 2>/dev/null
+    for path in $(compgen -f -- "$cur"); do
+        name=${path##*/}
+        if [ -d "$path" ]; then
+            [[ $name == .* || $name == __pycache__ ]] || COMPREPLY+=("$path")
+            continue
+        fi
+        [[ $name == *.py ]] || continue
+        if [ -n "$module" ]; then
+            # the module name is made of the path, so no dots in the name
+            [[ ${name%.py} == *.* ]] && continue
+            if [ -z "$project" ]; then
+                # the project dir is the working dir: the file must be
+                # inside it
+                abs=$path
+                [[ $abs == /* ]] || abs=$PWD/$abs
+                [[ $abs == "$PWD"/* && /$path/ != */../* ]] || continue
+            fi
+        fi
+        COMPREPLY+=("$path")
+    done
+}
+
+_vien() {
+    local cur=${COMP_WORDS[COMP_CWORD]} prev=${COMP_WORDS[COMP_CWORD-1]}
+    local i word command='' command_idx=0 project='' module=''
+    COMPREPLY=()
+    _vien_read_index
+    [ ${#_vien_commands[@]} -eq 0 ] && _vien_commands=(
+        create delete recreate shell run call path)
+
+    for ((i = 1; i < COMP_CWORD; i++)); do
+        word=${COMP_WORDS[i]}
+        case $word in
+            -p | --project-dir) ((i++)); project=${COMP_WORDS[i]} ;;
+            -*) ;;
+            *) command=$word; command_idx=$i; break ;;
+        esac
+    done
+
+    if [ -z "$command" ]; then
+        if [ "$prev" = -p ] || [ "$prev" = --project-dir ]; then
+            _vien_add_matching "${_vien_projects[@]}"
+            local IFS=$'\n'
+            compopt -o filenames 2>/dev/null
+            COMPREPLY+=($(compgen -d -- "$cur"))
+        elif [[ $cur == -* ]]; then
+            _vien_add_matching -p --project-dir --help
+        else
+            _vien_add_matching "${_vien_commands[@]}"
+        fi
+        return
+    fi
+
+    case $command in
+        create | recreate)
+            if [[ $cur == */* ]]; then
+                local IFS=$'\n'
+                compopt -o filenames 2>/dev/null
+                COMPREPLY=($(compgen -f -- "$cur"))
+            else
+                _vien_add_matching "${_vien_pythons[@]}"
+            fi ;;
+        call)
+            # the file is the first .py argument after `call`
+            for ((i = command_idx + 1; i < COMP_CWORD; i++)); do
+                [[ ${COMP_WORDS[i]} == *.py ]] && return
+            done
+            [ "$prev" = -m ] && module=1
+            if [[ $cur == -* ]]; then
+                _vien_add_matching -m --watch
+            else
+                _vien_add_files
+            fi ;;
+        run)
+            if [ "$COMP_CWORD" -eq $((command_idx + 1)) ]; then
+                local IFS=$'\n'
+                COMPREPLY=($(compgen -c -- "$cur"))
+            else
+                local IFS=$'\n'
+                compopt -o filenames 2>/dev/null
+                COMPREPLY=($(compgen -f -- "$cur"))
+            fi ;;
+        shebang)
+            if [ "$COMP_CWORD" -eq $((command_idx + 1)) ]; then
+                _vien_add_matching install check
+            else
+                _vien_add_files
+            fi ;;
+        expose)
+            local project_dir path
+            project_dir=$(cd "${project:-.}" 2>/dev/null && pwd)
+            local bin="${VIENDIR:-$HOME/.vien}/${project_dir##*/}_venv/bin"
+            # the same names as _VENV_OWN of vien/_expose.py
+            local own='^((pip|python)(3(\.[0-9]+)?)?'
+            own+='|(activate|Activate|easy_install).*)$'
+            for path in "$bin"/*; do
+                word=${path##*/}
+                [[ $word =~ $own ]] && continue
+                [ -x "$path" ] && _vien_add_matching "$word"
+            done
+            [[ $cur == -* ]] && _vien_add_matching --remove --force ;;
+        completion)
+            _vien_add_matching bash update ;;
+    esac
+}
+
+complete -F _vien vien
+'''
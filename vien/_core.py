@@ -0,0 +1,245 @@
+# SPDX-FileCopyrightText: (c) 2020-2022 Artëm IG <github.com/rtmigo>
+# SPDX-License-Identifier: BSD-3-Clause
+
+# Locating the virtual environments and preparing the child processes.
+# The functions here do not print anything and do not depend on the
+# command line arguments: they are shared by the CLI and the library API.
+
+from __future__ import annotations
+
+import os
+import shlex
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple, Union
+
+from vien import _settings
+from vien._call_funcs import relative_fn_to_module_name, relative_inner_path
+from vien._cmdexe_escape_args import cmd_escape_arg
+from vien._common import is_posix, is_windows
+from vien._exceptions import PythonNotFoundError, VenvDoesNotExistExit
+from vien._parsed_call import list_left_partition, ParsedCall
+
+verbose = False
+
+
+def get_vien_dir() -> Path:
+    path_from_var = os.environ.get("VIENDIR")
+    if path_from_var:
+        path_from_var = os.path.expandvars(path_from_var)
+        path_from_var = os.path.expanduser(path_from_var)
+        return Path(path_from_var)
+    else:
+        # It looks like storing dot files in the home directory
+        # is the de facto standard for both worlds.
+        #
+        # App    | POSIX     | Windows
+        # -------|-----------|----------------------
+        # VSCode | ~/.vscode | %USERPROFILE%\.vscode
+        # AWS:   | ~/.aws    | %USERPROFILE%\.aws
+        #
+        return Path.home() / ".vien"
+
+
+def get_wheels_dir() -> Path:
+    """The local wheels, that are installed instead of downloading or
+    building them."""
+    return get_vien_dir() / "wheels"
+
+
+def bash_sequence_script(commands: List[str]) -> str:
+    lines = [
+        # shebang not necessary as we specify executable in subprocess.call
+        "set -e",  # fail on first error
+    ]
+
+    lines.extend(commands)
+    return "\n".join(lines)
+
+
+def cmdexe_sequence_script(commands: List[str]) -> str:
+    # todo test independently
+    # This function does not work "officially" yet.
+
+    # https://stackoverflow.com/questions/734598/how-do-i-make-a-batch-file-terminate-upon-encountering-an-error
+
+    # unlike bash, cmd.exe returns exit code zero even if last command returned
+    # non-zero. There is also no evident way to turn on 'set -e' mode, i.e.
+    # exit on the first failure.
+    #
+    # We'll just glue all the commands with &&
+
+    return " && ".join(f'( {c} )' for c in commands)
+
+
+def run_sequence_script(venv_dir: Path, command: List[str]) \
+        -> Tuple[str, Optional[str]]:
+    """Returns the shell script that activates the environment and runs
+    the command, and the shell executable to run it (or None for the default
+    shell)."""
+    if is_posix:
+        activate_file = posix_bash_activate(venv_dir)
+        script = bash_sequence_script(posix_run_sequence(venv_dir, command))
+        # Ubuntu really needs executable='/bin/bash'.
+        # Otherwise the command is executed in /bin/sh, ignoring the hashbang,
+        # but SH fails to execute commands like 'source'
+        executable: Optional[str] = '/bin/bash'
+    elif is_windows:
+        activate_file = windows_cmdexe_activate(venv_dir)
+        script = cmdexe_sequence_script([f'CALL {activate_file}"',
+                                         cmdexe_args_to_str(command)])
+        executable = None
+    else:
+        raise AssertionError("Unexpected OS")
+    if not activate_file.exists():
+        raise FileNotFoundError(activate_file)
+    return script, executable
+
+
+def venv_dir_to_python_exe(venv_dir: Path) -> Path:
+    # this method is being tested indirectly each time the venv is created:
+    # vien prints the path to executable after running this function
+
+    if is_posix:
+        parent = venv_dir / "bin"
+        basenames = "python", "python3"
+    else:
+        parent = venv_dir / "Scripts"
+        basenames = "python.exe", "python3.exe"
+
+    for name in basenames:
+        executable = parent / name
+        if executable.exists():
+            return executable
+
+    raise PythonNotFoundError(venv_dir)
+
+
+def windows_cmdexe_activate(venv_dir: Path) -> Path:
+    # https://docs.python.org/3/library/venv.html
+    assert is_windows
+    return venv_dir / 'Scripts' / 'activate.bat'
+
+
+def posix_bash_activate(venv_dir: Path) -> Path:
+    # https://docs.python.org/3/library/venv.html
+    assert is_posix
+    return venv_dir / 'bin' / 'activate'
+
+
+def bash_args_to_str(args: List[str]) -> str:
+    return ' '.join(shlex.quote(arg) for arg in args)
+
+
+def cmdexe_args_to_str(args: List[str]) -> str:
+    return ' '.join(cmd_escape_arg(arg) for arg in args)
+
+
+def posix_run_sequence(venv_dir: Path, command: List[str]) -> List[str]:
+    activate_file = posix_bash_activate(venv_dir)
+    return [f'source {shlex.quote(str(activate_file))}',
+            bash_args_to_str(command)]
+
+
+class Dirs:
+    def __init__(self, project_dir: Union[str, Path] = '.',
+                 venv_dir: Optional[Path] = None):
+        """By default, the virtual environment is the one in VIENDIR for
+        the project. The `venv_dir` replaces it with another one."""
+        self.project_dir = Path(project_dir).absolute()
+        self.venv_dir = venv_dir if venv_dir is not None \
+            else get_vien_dir() / (self.project_dir.name + "_venv")
+        if verbose:
+            print(f"Proj dir: {self.project_dir}")
+            print(f"Venv dir: {self.venv_dir}")
+
+    def venv_must_exist(self) -> Dirs:
+        if not self.venv_dir.exists():
+            raise VenvDoesNotExistExit(self.venv_dir)
+        return self
+
+
+def _insert_into_pythonpath(insert_me: str) -> str:
+    # https://docs.python.org/3/using/cmdline.html#envvar-PYTHONPATH
+    # "The format is the same as the shell’s PATH: one or more directory
+    # pathnames separated by os.pathsep (e.g. colons on Unix or semicolons
+    # on Windows)"
+    #
+    ####
+    #
+    # $PYTHONPATH and sys.path are not the same.
+    # - $PYTHONPATH is the variable to be used by all Python interpreters
+    #   in the current shell environment
+    # - sys.path is values for the current interpreter
+    #
+    # Passing values from own sys.path to other interpreter would be a mistake.
+    # The current interpreter may be Python 3.7, and the other interpreter is
+    # Python 3.9. Our sys.path leads to 3.7 system libraries, that are
+    # unnecessary and even cause errors if added to $PYTHONPATH of 3.9.
+    #
+    ######
+    # keeping it simple: not parsing the old string, just adding a prefix
+
+    old = os.environ.get("PYTHONPATH", '')
+    return f'{insert_me}{os.pathsep}{old}'
+
+
+def child_env(proj_path: Path, cwd: Optional[Path] = None,
+              venv_dir: Optional[Path] = None) -> Optional[Dict]:
+    """Returns the environment variables for a child process that will run
+    in the `cwd` (by default, the current working directory), or None if
+    the child should inherit our own environment.
+
+    With `venv_dir`, the per-project settings of the environment are
+    applied too. If the bytecode cache cannot be used, the children write
+    the bytecode next to the sources: the function does not print, the
+    command line interface warns about it itself."""
+    if cwd is None:
+        cwd = Path.cwd()
+    result = None
+    if proj_path != cwd:
+        result = {
+            **os.environ,
+            'PYTHONPATH': _insert_into_pythonpath(str(proj_path))
+        }
+    if venv_dir is not None and _settings.get(venv_dir, "pycache"):
+        from vien import _pycache
+        try:
+            prefix = _pycache.child_prefix(venv_dir)
+        except (OSError, ValueError):
+            prefix = None
+        if prefix is not None:
+            result = {**(result if result is not None else os.environ),
+                      'PYTHONPYCACHEPREFIX': prefix}
+    wheels = get_wheels_dir()
+    # pip splits PIP_FIND_LINKS by whitespace, so a path with spaces can
+    # only be passed by --find-links
+    if wheels.is_dir() and not any(c.isspace() for c in str(wheels)):
+        # pip prefers the wheels built by `vien prebuild` to building
+        # the sdists again
+        base = result if result is not None else os.environ
+        links = base.get('PIP_FIND_LINKS', '')
+        if str(wheels) not in links.split():
+            result = {**base,
+                      'PIP_FIND_LINKS': f"{links} {wheels}".strip()}
+    return result
+
+
+def call_module_args(call: ParsedCall, project_dir: Path) -> List[str]:
+    """For the 'call -m file.py' command returns the arguments to Python
+    with the filename replaced by the module name."""
+    assert call.before_filename == "-m"
+    # todo unit test
+    # /abc/project/package/module.py -> package/module.py
+    relative = relative_inner_path(call.filename, project_dir)
+    # package/module.py -> package.module
+    module_name = relative_fn_to_module_name(relative)
+    # replacing the filename in args with the module name.
+    # It is already prefixed with -m
+    args = call.args.copy()
+    args[call.filename_idx] = module_name
+    # args to python are those after 'call' word
+    _, args_to_python = list_left_partition(args, 'call')
+    assert '-m' in args_to_python
+    assert module_name in args_to_python
+    return args_to_python
+
@@ -0,0 +1,111 @@
+# SPDX-FileCopyrightText: (c) 2022 Artëm IG <github.com/rtmigo>
+# SPDX-License-Identifier: BSD-3-Clause
+
+"""Throwaway virtual environments for `vien run --ephemeral`.
+
+The environment is cloned (with hard links) from a pristine one, cached in
+the same directory, so creating it costs milliseconds. The directory is
+`$VIEN_EPHEMERAL_DIR`, by default in `/dev/shm`: nothing is written to the
+disk. The environment is removed when the command finishes, is interrupted
+or vien gets SIGTERM or SIGHUP. The environments of the processes killed
+with SIGKILL are removed by the next ephemeral run.
+"""
+
+from __future__ import annotations
+
+import os
+import shutil
+import signal
+import tempfile
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Iterator, Optional
+
+from vien._pycache import prepare
+from vien._venv_cache import VenvCache
+
+EPHEMERAL_DIR_ENV = "VIEN_EPHEMERAL_DIR"
+
+_SIGNALS = (signal.SIGTERM, signal.SIGHUP)
+
+
+def root_dir() -> Path:
+    from_env = os.environ.get(EPHEMERAL_DIR_ENV)
+    if from_env:
+        return Path(os.path.expanduser(from_env))
+    uid = os.getuid() if hasattr(os, "getuid") else "user"
+    shm = Path("/dev/shm")
+    base = shm if shm.is_dir() else Path(tempfile.gettempdir())
+    return base / f"vien-ephemeral-{uid}"
+
+
+def _is_running(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def remove_abandoned(venvs_dir: Path) -> None:
+    """Removes the environments of the processes that no longer exist."""
+    for entry in venvs_dir.glob("*-*_venv"):
+        try:
+            pid = int(entry.name[:-len("_venv")].rsplit("-", 1)[1])
+        except ValueError:
+            continue
+        if not _is_running(pid):
+            shutil.rmtree(str(entry), ignore_errors=True)
+
+
+@contextmanager
+def signals_as_exit() -> Iterator[None]:
+    """Turns SIGTERM and SIGHUP into SystemExit, so the cleanup code runs
+    (SIGINT raises KeyboardInterrupt anyway)."""
+
+    def handler(signum, frame):
+        raise SystemExit(128 + signum)
+
+    old = {s: signal.signal(s, handler) for s in _SIGNALS}
+    try:
+        yield
+    finally:
+        for s, h in old.items():
+            signal.signal(s, h)
+
+
+@contextmanager
+def _signals_blocked() -> Iterator[None]:
+    if not hasattr(signal, "pthread_sigmask"):
+        yield
+        return
+    old = signal.pthread_sigmask(signal.SIG_BLOCK,
+                                 set(_SIGNALS) | {signal.SIGINT})
+    try:
+        yield
+    finally:
+        signal.pthread_sigmask(signal.SIG_SETMASK, old)
+
+
+@contextmanager
+def ephemeral_venv(project_name: str,
+                   interpreter: Optional[str] = None) -> Iterator[Path]:
+    """Creates a virtual environment that exists only inside the `with`
+    block."""
+    root = root_dir()
+    bases = root / "bases"
+    venvs = root / "venvs"
+    # the directories in /dev/shm could be created by other users
+    prepare(bases)
+    prepare(venvs)
+    remove_abandoned(venvs)
+    venv_dir = venvs / f"{project_name}-{os.getpid()}_venv"
+    try:
+        VenvCache(bases).clone(venv_dir, interpreter)
+        yield venv_dir
+    finally:
+        # a second Ctrl+C must not leave a half-removed environment
+        with _signals_blocked():
+            shutil.rmtree(str(venv_dir), ignore_errors=True)
@@ -57,3 +57,58 @@ class FailedToClearVenvExit(VienExit):
 class CannotFindExecutableExit(VienExit):
     def __init__(self, version: str):
         super().__init__(f"Cannot resolve '{version}' to an executable file.")
+
+
+class PythonNotFoundExit(VienExit):
+    def __init__(self, path: Path):
+        super().__init__(f"Cannot find the Python interpreter in {path}.")
+
+
+class VienError(Exception):
+    """Base class for the errors raised by the library functions (that,
+    unlike the command line interface, must not exit the program)."""
+
+
+class VenvDoesNotExistError(VienError):
+    def __init__(self, path: Path):
+        super().__init__(f'Virtual environment "{path}" does not exist.')
+        self.path = path
+
+
+class PyFileNotFoundError(VienError):
+    def __init__(self, path: Path):
+        super().__init__(f"File {path} not found.")
+        self.path = path
+
+
+class VenvExistsError(VienError):
+    def __init__(self, path: Path):
+        super().__init__(f'Virtual environment "{path}" already exists.')
+        self.path = path
+
+
+class CannotFindExecutableError(VienError):
+    def __init__(self, argument: str):
+        super().__init__(f"Cannot resolve '{argument}' to an executable file.")
+        self.argument = argument
+
+
+class PythonNotFoundError(VienError):
+    def __init__(self, path: Path):
+        super().__init__(f"Cannot find the Python interpreter in {path}.")
+        self.path = path
+
+
+class FailedToCreateVenvError(VienError):
+    def __init__(self, path: Path, output: str = ''):
+        super().__init__(f"Failed to create virtual environment {path}.")
+        self.path = path
+        self.output = output
+
+
+class FailedToClearVenvError(VienError):
+    def __init__(self, path: Path, stdout: str = '', stderr: str = ''):
+        super().__init__(f"Failed to clear virtual environment {path}.")
+        self.path = path
+        self.stdout = stdout
+        self.stderr = stderr
@@ -0,0 +1,139 @@
+# SPDX-FileCopyrightText: (c) 2022 Artëm IG <github.com/rtmigo>
+# SPDX-License-Identifier: BSD-3-Clause
+
+"""Shims for the console scripts of virtual environments.
+
+`vien expose black` writes `$VIENDIR/bin/black`, a tiny `sh` script that
+execs `<venv>/bin/black`. With `$VIENDIR/bin` in PATH, the tool runs from
+anywhere without activating the environment.
+
+Each shim names its environment in a comment, so the shims of
+an environment can be found again: they are removed by `vien delete` and
+written again by `vien recreate`.
+"""
+
+from __future__ import annotations
+
+import os
+import re
+import shlex
+from pathlib import Path
+from typing import Iterator, List, Optional, Sequence
+
+from vien._shebang import write_executable
+
+_FIRST_LINES = "#!/bin/sh\n# Generated by `vien expose`.\n"
+_VENV_PREFIX = "# vien-venv: "
+
+# the files that `python -m venv` and pip put to every environment, but
+# not the tools like pip-compile or python-lsp-server
+_VENV_OWN = re.compile(r"(?:pip|python)(?:3(?:\.\d+)?)?"
+                       r"|(?:activate|Activate|easy_install).*")
+
+
+class ExposeError(Exception):
+    pass
+
+
+def shims_dir(venv_dir: Path) -> Path:
+    # the environments are $VIENDIR/<project>_venv, so the shims are
+    # in $VIENDIR/bin
+    return venv_dir.parent / "bin"
+
+
+def venv_scripts(venv_dir: Path) -> List[str]:
+    """Returns the names of the console scripts installed into
+    the environment."""
+    bin_dir = venv_dir / "bin"
+    if not bin_dir.is_dir():
+        return []
+    return sorted(
+        entry.name for entry in os.scandir(str(bin_dir))
+        if not _VENV_OWN.fullmatch(entry.name)
+        and entry.is_file() and os.access(entry.path, os.X_OK))
+
+
+def shim_text(venv_dir: Path, name: str) -> str:
+    script = shlex.quote(str(venv_dir / "bin" / name))
+    return (_FIRST_LINES
+            + f"{_VENV_PREFIX}{venv_dir}\n"
+            + f"script={script}\n"
+            + '[ -x "$script" ] || { echo "$script not found. Is the package '
+              'installed into the environment?" >&2; exit 127; }\n'
+            + 'exec "$script" "$@"\n')
+
+
+def shim_venv(shim: Path) -> Optional[Path]:
+    """Returns the environment of the shim, or None if the file is not
+    a shim."""
+    try:
+        with shim.open("rb") as f:
+            head = f.read(4096).decode(errors="replace")
+    except OSError:
+        return None
+    if not head.startswith(_FIRST_LINES):
+        return None
+    for line in head.splitlines():
+        if line.startswith(_VENV_PREFIX):
+            return Path(line[len(_VENV_PREFIX):])
+    return None
+
+
+def _shims(venv_dir: Path) -> Iterator[Path]:
+    directory = shims_dir(venv_dir)
+    if not directory.is_dir():
+        return
+    for entry in os.scandir(str(directory)):
+        path = Path(entry.path)
+        if entry.is_file() and shim_venv(path) == venv_dir:
+            yield path
+
+
+def exposed(venv_dir: Path) -> List[str]:
+    """Returns the names of the shims for the environment."""
+    return sorted(p.name for p in _shims(venv_dir))
+
+
+def expose(venv_dir: Path, names: Sequence[str],
+           force: bool = False) -> List[Path]:
+    """Writes the shims and returns their paths. Without `force`, refuses
+    to replace the shims of other environments and the files that are not
+    shims."""
+    available = venv_scripts(venv_dir)
+    for name in names:
+        if name not in available:
+            raise ExposeError(f"There is no script '{name}' in "
+                              f"{venv_dir / 'bin'}.")
+    return write_shims(venv_dir, names, force=force)
+
+
+def write_shims(venv_dir: Path, names: Sequence[str],
+                force: bool = False) -> List[Path]:
+    """Like `expose`, but does not check that the scripts exist."""
+    directory = shims_dir(venv_dir)
+    directory.mkdir(parents=True, exist_ok=True)
+    result = []
+    for name in names:
+        shim = directory / name
+        if shim.exists() and not force:
+            owner = shim_venv(shim)
+            if owner is None:
+                raise ExposeError(f"{shim} exists and is not a shim.")
+            if owner != venv_dir:
+                raise ExposeError(
+                    f"{shim} already runs '{name}' from {owner}.")
+        write_executable(shim, shim_text(venv_dir, name))
+        result.append(shim)
+    return result
+
+
+def remove(venv_dir: Path, names: Optional[Sequence[str]] = None
+           ) -> List[Path]:
+    """Removes the shims of the environment (all of them, if `names` is
+    None) and returns their paths."""
+    result = []
+    for shim in _shims(venv_dir):
+        if names is None or shim.name in names:
+            shim.unlink()
+            result.append(shim)
+    return sorted(result)
@@ -0,0 +1,281 @@
+# SPDX-FileCopyrightText: (c) 2022 Artëm IG <github.com/rtmigo>
+# SPDX-License-Identifier: BSD-3-Clause
+
+"""Optional execution history of the `run`, `call` and `shell` commands.
+
+When the `VIEN_HISTORY` environment variable is set, each command appends
+a one-line JSON record to `$VIENDIR/history/<project>_venv.log`. The
+`vien stats` command reads these logs line by line and aggregates them.
+"""
+
+from __future__ import annotations
+
+import json
+import math
+import os
+import sys
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple
+
+try:
+    import fcntl
+    import resource
+except ImportError:  # Windows
+    fcntl = None  # type: ignore
+    resource = None  # type: ignore
+
+HISTORY_ENV = "VIEN_HISTORY"
+HISTORY_MAX_BYTES_ENV = "VIEN_HISTORY_MAX_BYTES"
+DEFAULT_MAX_BYTES = 4 * 1024 * 1024
+
+
+def history_enabled() -> bool:
+    return os.environ.get(HISTORY_ENV, '') not in ('', '0')
+
+
+def history_file(venv_dir: Path) -> Path:
+    # the venv_dir is always $VIENDIR/<project>_venv, so the logs are
+    # placed next to the environments, but not inside them: they should
+    # survive `vien recreate`
+    return venv_dir.parent / "history" / (venv_dir.name + ".log")
+
+
+def rotated_file(log_file: Path) -> Path:
+    return log_file.with_name(log_file.name + ".1")
+
+
+def _rotation_lock_file(log_file: Path) -> Path:
+    return log_file.with_name(log_file.name + ".lock")
+
+
+def _max_bytes() -> int:
+    try:
+        return int(os.environ.get(HISTORY_MAX_BYTES_ENV, DEFAULT_MAX_BYTES))
+    except ValueError:
+        return DEFAULT_MAX_BYTES
+
+
+def _rotate(log_file: Path, fd: int, max_bytes: int) -> None:
+    """Renames the full log opened as `fd` to `.log.1`.
+
+    Several writers may find the log full at the same time. They rotate
+    it one by one under a lock, and each checks that the log is still the
+    full file it opened: otherwise another writer has already renamed it,
+    and renaming the new log would replace the full rotated one.
+    """
+    lock = os.open(str(_rotation_lock_file(log_file)),
+                   os.O_WRONLY | os.O_CREAT, 0o644)
+    try:
+        if fcntl is not None:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+        try:
+            st = os.stat(str(log_file))
+        except FileNotFoundError:
+            return
+        if st.st_ino == os.fstat(fd).st_ino and st.st_size >= max_bytes:
+            os.replace(str(log_file), str(rotated_file(log_file)))
+    finally:
+        os.close(lock)  # releases the lock
+
+
+def append_record(log_file: Path, record: Dict,
+                  max_bytes: Optional[int] = None) -> None:
+    """Appends the record to the log.
+
+    The whole line is written with a single `write` call to a file opened
+    with O_APPEND, so concurrent writers do not interleave their records.
+    When the log grows larger than `max_bytes`, it is renamed to `.log.1`
+    (replacing the previous rotated file). Only the rotation is locked.
+    """
+    if max_bytes is None:
+        max_bytes = _max_bytes()
+    line = (json.dumps(record, separators=(',', ':')) + "\n").encode()
+    flags = os.O_WRONLY | os.O_APPEND | os.O_CREAT
+    try:
+        fd = os.open(str(log_file), flags, 0o644)
+    except FileNotFoundError:
+        log_file.parent.mkdir(parents=True, exist_ok=True)
+        fd = os.open(str(log_file), flags, 0o644)
+    try:
+        if os.fstat(fd).st_size >= max_bytes:
+            # other processes may still be appending to the file we rename.
+            # It's fine: their records just end up in the rotated file
+            _rotate(log_file, fd, max_bytes)
+            # the opened file is rotated now, by this or another process
+            os.close(fd)
+            fd = os.open(str(log_file), flags, 0o644)
+        os.write(fd, line)
+    finally:
+        os.close(fd)
+
+
+def iter_records(log_file: Path) -> Iterator[Dict]:
+    """Yields records from the rotated and the current log, oldest first.
+    The files are read line by line. Malformed lines are skipped."""
+    for path in (rotated_file(log_file), log_file):
+        try:
+            f = path.open('rb')
+        except FileNotFoundError:
+            continue
+        with f:
+            for line in f:
+                try:
+                    yield json.loads(line)
+                except ValueError:
+                    # a truncated line (the disk was full, or the process
+                    # was killed in the middle of the write)
+                    continue
+
+
+def _children_usage() -> Tuple[float, float, int]:
+    if resource is None:
+        return 0.0, 0.0, 0
+    ru = resource.getrusage(resource.RUSAGE_CHILDREN)
+    maxrss = ru.ru_maxrss
+    if sys.platform == "darwin":
+        maxrss //= 1024  # bytes on macOS, kilobytes on Linux
+    return ru.ru_utime, ru.ru_stime, maxrss
+
+
+@contextmanager
+def recorded(venv_dir: Path, command: str, target: str, args: List[str]):
+    """Measures the child process started inside the `with` block and
+    appends the record when the block exits with `ChildExit`.
+
+    Does nothing unless the history is enabled."""
+    if not history_enabled():
+        yield
+        return
+
+    # importing here to avoid circular imports
+    from vien._exceptions import ChildExit
+
+    started = time.time()
+    t0 = time.perf_counter()
+    utime0, stime0, _ = _children_usage()
+    try:
+        yield
+    except ChildExit as e:
+        wall = time.perf_counter() - t0
+        utime1, stime1, maxrss = _children_usage()
+        record = {
+            "ts": round(started, 3),
+            "cmd": command,
+            "target": target,
+            "args": args,
+            "wall": round(wall, 6),
+            "utime": round(utime1 - utime0, 6),
+            "stime": round(stime1 - stime0, 6),
+            "maxrss": maxrss,
+            "exit": e.code}
+        try:
+            append_record(history_file(venv_dir), record)
+        except OSError:
+            # the history must never break the command itself
+            pass
+        raise
+
+
+class LogHistogram:
+    """Histogram with logarithmic buckets: keeps a bounded number of
+    counters, while percentiles stay within about 1% of the exact values."""
+
+    GROWTH = 1.01
+    MIN_VALUE = 1e-6
+
+    def __init__(self):
+        self.counts: Dict[int, int] = dict()
+        self.total = 0
+
+    def _bucket(self, value: float) -> int:
+        if value <= self.MIN_VALUE:
+            return 0
+        return 1 + int(math.log(value / self.MIN_VALUE, self.GROWTH))
+
+    def _value(self, bucket: int) -> float:
+        if bucket == 0:
+            return self.MIN_VALUE
+        # geometric middle of the bucket
+        return self.MIN_VALUE * self.GROWTH ** (bucket - 0.5)
+
+    def add(self, value: float) -> None:
+        b = self._bucket(value)
+        self.counts[b] = self.counts.get(b, 0) + 1
+        self.total += 1
+
+    def percentile(self, p: float) -> float:
+        if self.total == 0:
+            raise ValueError("The histogram is empty.")
+        rank = max(1, math.ceil(self.total * p / 100.0))
+        seen = 0
+        for bucket in sorted(self.counts):
+            seen += self.counts[bucket]
+            if seen >= rank:
+                return self._value(bucket)
+        raise AssertionError("Not expected to run this line")
+
+
+class CommandStats:
+    __slots__ = ['runs', 'failures', 'cpu', 'maxrss', 'wall']
+
+    def __init__(self):
+        self.runs = 0
+        self.failures = 0
+        self.cpu = 0.0
+        self.maxrss = 0
+        self.wall = LogHistogram()
+
+    def add(self, record: Dict) -> None:
+        self.runs += 1
+        if record.get("exit"):
+            self.failures += 1
+        self.cpu += record.get("utime", 0.0) + record.get("stime", 0.0)
+        self.maxrss = max(self.maxrss, record.get("maxrss", 0))
+        self.wall.add(record.get("wall", 0.0))
+
+
+def record_key(record: Dict) -> str:
+    return f'{record.get("cmd", "?")} {record.get("target", "")}'.rstrip()
+
+
+def aggregate(records: Iterator[Dict]) -> Dict[str, CommandStats]:
+    result: Dict[str, CommandStats] = dict()
+    for record in records:
+        key = record_key(record)
+        stats = result.get(key)
+        if stats is None:
+            stats = result[key] = CommandStats()
+        stats.add(record)
+    return result
+
+
+def _seconds(value: float) -> str:
+    if value < 1:
+        return f"{value * 1000:.1f}ms"
+    return f"{value:.2f}s"
+
+
+def format_stats(stats: Dict[str, CommandStats]) -> List[str]:
+    header = ("COMMAND", "RUNS", "FAIL", "P50", "P95", "P99", "CPU/RUN",
+              "MAXRSS")
+    rows = [header]
+    for key in sorted(stats, key=lambda k: -stats[k].runs):
+        s = stats[key]
+        rows.append((
+            key,
+            str(s.runs),
+            f"{100.0 * s.failures / s.runs:.1f}%",
+            _seconds(s.wall.percentile(50)),
+            _seconds(s.wall.percentile(95)),
+            _seconds(s.wall.percentile(99)),
+            _seconds(s.cpu / s.runs),
+            f"{s.maxrss // 1024}M"))
+    widths = [max(len(row[i]) for row in rows) for i in range(len(header))]
+    lines = list()
+    for row in rows:
+        cells = [row[0].ljust(widths[0])] + \
+                [cell.rjust(w) for cell, w in zip(row[1:], widths[1:])]
+        lines.append("  ".join(cells))
+    return lines
@@ -0,0 +1,299 @@
+# SPDX-FileCopyrightText: (c) 2022 Artëm IG <github.com/rtmigo>
+# SPDX-License-Identifier: BSD-3-Clause
+
+"""Checking the files of the environment for `vien verify` and
+`vien fingerprint`.
+
+The verify compares the files of each installed distribution with the
+hashes of its RECORD. The fingerprint is a hash of the paths and the
+contents of all the files of the environment, except the ones written by
+the interpreter and by vien itself (the bytecode and the module index).
+
+Both hash the files with a thread pool (hashlib releases the GIL), and
+keep the hashes in `.vien-hashes` in the environment, by the size, the
+mtime, the ctime and the inode of each file. A file that was not changed
+is not read again, so checking an unchanged environment only takes a
+`stat` of each file. A file changed within the last seconds is not cached:
+another change may have the same mtime.
+
+The scripts of the environment contain its absolute path. When vien
+rewrites it (a clone, a restore, an upgrade), it also rewrites the hashes
+of these scripts in the RECORD files, so they are verified as any other
+file.
+"""
+
+from __future__ import annotations
+
+import base64
+import csv
+import hashlib
+import io
+import marshal
+import os
+import stat
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, Iterable, List, NamedTuple, Optional, Set, \
+    Tuple
+
+from vien._compile import site_packages_dirs
+
+CACHE_NAME = ".vien-hashes"
+
+FORMAT = 1
+
+# the files written by the interpreter and by vien, that are not a part
+# of the environment contents
+_DERIVED_DIRS = {"__pycache__"}
+_DERIVED_FILES = {CACHE_NAME, "vien-modindex.dat"}
+
+# mtimes closer to the present than this may be shared by a later change
+_RACY_NS = 2 * 10 ** 9
+
+_CHUNK = 1 << 20
+
+
+class IntegrityError(Exception):
+    pass
+
+
+class Problem(NamedTuple):
+    distribution: str
+    path: str  # relative to site-packages, as in the RECORD
+    reason: str  # "missing" or "modified"
+
+
+class VerifyResult(NamedTuple):
+    distributions: int
+    files: int
+    problems: List[Problem]
+
+
+def _sha256(path: str) -> Optional[str]:
+    """Returns the hash in the format of the RECORD files."""
+    h = hashlib.sha256()
+    try:
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(_CHUNK), b""):
+                h.update(chunk)
+    except OSError:
+        return None
+    return "sha256=" + base64.urlsafe_b64encode(h.digest()).decode() \
+        .rstrip("=")
+
+
+def _workers(jobs: int) -> int:
+    return jobs if jobs > 0 else min(32, (os.cpu_count() or 1) + 4)
+
+
+class HashCache:
+    """The sha256 of the files of the environment, by the paths relative
+    to it, computed only for the files that changed since the last
+    time. The hashes are in the format of the RECORD files, so they are
+    compared without decoding."""
+
+    def __init__(self, venv_dir: Path):
+        # the environment may be a symlink to $VIEN_FAST_DIR
+        self.root = os.path.realpath(str(venv_dir))
+        self.file = os.path.join(self.root, CACHE_NAME)
+        # the stat of the file and the hash, by the relative path
+        self._entries: Dict[str, Tuple[tuple, str]] = {}
+        self._dirty = False
+        try:
+            with open(self.file, "rb") as f:
+                # much faster than reading the file object piece by piece
+                data = marshal.loads(f.read())
+            if isinstance(data, tuple) and len(data) == 2 \
+                    and data[0] == FORMAT and isinstance(data[1], dict):
+                self._entries = data[1]
+        except (OSError, ValueError, EOFError, TypeError):
+            pass
+
+    def digests(self, paths: Iterable[str], jobs: int = 0
+                ) -> Dict[str, Optional[str]]:
+        """Returns the sha256 of each file, or None if it is not a
+        readable file."""
+        # this loop is all the work for an unchanged environment
+        prefix = self.root + os.sep
+        entries = self._entries
+        result: Dict[str, Optional[str]] = {}
+        to_hash: Dict[str, tuple] = {}
+        for rel in paths:
+            try:
+                st = os.stat(prefix + rel)
+            except OSError:
+                result[rel] = None
+                continue
+            if not stat.S_ISREG(st.st_mode):
+                result[rel] = None
+                continue
+            stamp = (st.st_size, st.st_mtime_ns, st.st_ctime_ns, st.st_ino)
+            cached = entries.get(rel)
+            if isinstance(cached, tuple) and len(cached) == 2 \
+                    and cached[0] == stamp:
+                result[rel] = cached[1]
+            else:
+                to_hash[rel] = stamp
+        if to_hash:
+            names = sorted(to_hash)
+            with ThreadPoolExecutor(max_workers=_workers(jobs)) as pool:
+                hashed = list(pool.map(lambda rel: _sha256(prefix + rel),
+                                       names))
+            racy = time.time_ns() - _RACY_NS
+            for rel, digest in zip(names, hashed):
+                result[rel] = digest
+                stamp = to_hash[rel]
+                if digest is not None and stamp[1] < racy \
+                        and stamp[2] < racy:
+                    entries[rel] = (stamp, digest)
+                    self._dirty = True
+        return result
+
+    def save(self, keep: Optional[Set[str]] = None) -> None:
+        """Writes the cache. With `keep`, forgets the other files."""
+        if keep is not None and not keep.issuperset(self._entries):
+            self._entries = {rel: entry
+                             for rel, entry in self._entries.items()
+                             if rel in keep}
+            self._dirty = True
+        if not self._dirty:
+            return
+        try:
+            fd, temp = tempfile.mkstemp(prefix=CACHE_NAME + ".",
+                                        dir=self.root)
+        except OSError:
+            return  # only the next run is slower
+        try:
+            with os.fdopen(fd, "wb") as f:
+                marshal.dump((FORMAT, self._entries), f)
+            os.replace(temp, self.file)
+        except OSError:
+            try:
+                os.unlink(temp)
+            except OSError:
+                pass
+        self._dirty = False
+
+
+def _check_unpacked(venv_dir: Path) -> None:
+    from vien import _pack
+    if _pack.is_packed(venv_dir):
+        raise IntegrityError("The environment is packed: "
+                             "run 'vien unpack' first.")
+
+
+def update_records(venv_dir: Path, changed: Iterable[Path]) -> None:
+    """Rewrites the hashes and the sizes of the changed files in the
+    RECORD files of the environment. Called after rewriting its path in the
+    scripts."""
+    changed_paths = {os.path.normpath(str(path)) for path in changed}
+    if not changed_paths:
+        return
+    for site in site_packages_dirs(venv_dir):
+        for record in sorted(site.glob("*.dist-info/RECORD")):
+            with record.open(newline="") as f:
+                text = f.read()
+            rows = list(csv.reader(io.StringIO(text)))
+            updated = False
+            for row in rows:
+                if len(row) < 3 or not row[1].startswith("sha256="):
+                    continue
+                path = os.path.normpath(os.path.join(str(site), row[0]))
+                if path not in changed_paths:
+                    continue
+                digest = _sha256(path)
+                if digest is not None:
+                    row[1] = digest
+                    row[2] = str(os.path.getsize(path))
+                    updated = True
+            if not updated:
+                continue
+            out = io.StringIO()
+            csv.writer(out, lineterminator="\r\n" if "\r\n" in text
+                       else "\n").writerows(rows)
+            # written by renaming: the RECORD may be a hard link shared
+            # with the environment it was cloned from
+            temp = record.with_name(record.name + ".vien-tmp")
+            with temp.open("w", newline="") as f:
+                f.write(out.getvalue())
+            os.replace(str(temp), str(record))
+
+
+def verify(venv_dir: Path, jobs: int = 0) -> VerifyResult:
+    """Checks the files of the installed distributions against the
+    hashes of their RECORD files."""
+    _check_unpacked(venv_dir)
+    cache = HashCache(venv_dir)
+    root = cache.root
+    # (distribution, path in the RECORD, path relative to the environment,
+    # the expected hash)
+    expected = []
+    dist_count = 0
+    for site in site_packages_dirs(venv_dir):
+        site_rel = os.path.relpath(os.path.realpath(str(site)), root)
+        for dist_info in sorted(site.glob("*.dist-info")):
+            try:
+                with (dist_info / "RECORD").open(newline="") as f:
+                    rows = [row for row in csv.reader(f) if row]
+            except FileNotFoundError:
+                continue
+            dist_count += 1
+            name = dist_info.name[:-len(".dist-info")]
+            prefix = site_rel + os.sep
+            for row in rows:
+                if len(row) < 2 or not row[1].startswith("sha256="):
+                    continue  # the RECORD itself, the bytecode
+                path = row[0]
+                if os.sep == "/" and ".." not in path \
+                        and not path.startswith("/"):
+                    rel = prefix + path
+                else:
+                    rel = os.path.normpath(os.path.join(site_rel, path))
+                    if os.path.isabs(rel) or rel == os.pardir \
+                            or rel.startswith(os.pardir + os.sep):
+                        continue  # outside the environment
+                expected.append((name, path, rel, row[1]))
+    actual = cache.digests({rel for _, _, rel, _ in expected}, jobs=jobs)
+    cache.save()
+    problems = [Problem(name, record_path,
+                        "missing" if actual[rel] is None else "modified")
+                for name, record_path, rel, digest in expected
+                if actual[rel] != digest]
+    return VerifyResult(distributions=dist_count, files=len(expected),
+                        problems=problems)
+
+
+def _walk(root: str, rel: str, files: List[str], links: List[str]) -> None:
+    prefix = rel + os.sep if rel else ""
+    with os.scandir(root + os.sep + rel) as entries:
+        for entry in entries:
+            if entry.is_symlink():
+                links.append(prefix + entry.name)
+            elif entry.is_dir():
+                if entry.name not in _DERIVED_DIRS:
+                    _walk(root, prefix + entry.name, files, links)
+            elif rel or entry.name not in _DERIVED_FILES:
+                files.append(prefix + entry.name)
+
+
+def fingerprint(venv_dir: Path, jobs: int = 0) -> str:
+    """Returns the hex sha256 of the paths and the contents of the files
+    of the environment."""
+    cache = HashCache(venv_dir)
+    files: List[str] = []
+    links: List[str] = []
+    _walk(cache.root, "", files, links)
+    digests = cache.digests(files, jobs=jobs)
+    cache.save(keep=set(files))
+    # the same on Windows
+    posix = (lambda rel: rel) if os.sep == "/" \
+        else (lambda rel: rel.replace(os.sep, "/"))
+    lines = [f"f {posix(rel)} {digests[rel]}" for rel in files]
+    lines += [f"l {posix(rel)} {os.readlink(cache.root + os.sep + rel)}"
+              for rel in links]
+    lines.sort()
+    h = hashlib.sha256()
+    h.update("\n".join(lines).encode("utf-8", "surrogateescape"))
+    return h.hexdigest()
@@ -0,0 +1,104 @@
+# SPDX-FileCopyrightText: (c) 2022 Artëm IG <github.com/rtmigo>
+# SPDX-License-Identifier: BSD-3-Clause
+
+"""Environments layered on top of other environments.
+
+`vien create --base NAME` creates an environment without its own copy of
+the packages of the base: a .pth file in its site-packages adds the
+site-packages of the base to `sys.path`, after its own. So the project
+environment holds only the packages installed into it, and the packages
+updated in the base are seen by all the environments based on it.
+
+The base is added with `site.addsitedir`, so its own .pth files are
+processed too: a base may be packed or layered on another base.
+
+Pip refuses to uninstall the packages outside the environment, so the
+base is never changed by installing into the project environment. A
+package of another version is installed into the project environment and
+shadows the one of the base.
+"""
+
+from __future__ import annotations
+
+import os
+from pathlib import Path
+from typing import List, Optional
+
+from vien._common import is_posix
+from vien._compile import site_packages_dirs
+from vien._core import get_vien_dir
+
+CHAIN_PTH_NAME = "vien-chain.pth"
+
+_BASE_PREFIX = "# base: "
+
+_PIP_LAUNCHER = """#!{python}
+import sys
+from pip._internal.cli.main import main
+if __name__ == "__main__":
+    sys.exit(main())
+"""
+
+
+def base_venv_dir(name: str) -> Path:
+    """Returns the environment of the project `name` in VIENDIR, or the
+    environment at the path `name`."""
+    if os.sep in name or (os.altsep and os.altsep in name) \
+            or name.startswith("."):
+        return Path(name).expanduser().absolute()
+    return get_vien_dir() / f"{name}_venv"
+
+
+def chain_site_packages(venv_dir: Path, base_venv: Path) -> None:
+    """Makes the packages of the `base_venv` importable in the `venv_dir`,
+    after its own packages."""
+    lines = [_BASE_PREFIX + str(base_venv)]
+    lines += [f"import site; site.addsitedir({str(d)!r})"
+              for d in site_packages_dirs(base_venv)]
+    site = site_packages_dirs(venv_dir)[0]
+    (site / CHAIN_PTH_NAME).write_text("\n".join(lines) + "\n")
+
+
+def base_of(venv_dir: Path) -> Optional[Path]:
+    """Returns the base of the layered environment, or None."""
+    for site in site_packages_dirs(venv_dir):
+        try:
+            first = (site / CHAIN_PTH_NAME).read_text().split("\n", 1)[0]
+        except FileNotFoundError:
+            continue
+        if first.startswith(_BASE_PREFIX):
+            return Path(first[len(_BASE_PREFIX):])
+    return None
+
+
+def write_pip_launchers(venv_dir: Path) -> None:
+    """Creates the `pip` scripts that install into the `venv_dir` with the
+    pip of the base. The scripts of the base would install into the base."""
+    if not is_posix:
+        return  # `python -m pip` works anyway
+    bin_dir = venv_dir / "bin"
+    python = bin_dir / "python"
+    names = ["pip", "pip3"]
+    # lib/python3.X/site-packages
+    names += ["pip" + d.parent.name[len("python"):]
+              for d in site_packages_dirs(venv_dir)
+              if d.parent.name.startswith("python3.")]
+    for name in names:
+        script = bin_dir / name
+        script.write_text(_PIP_LAUNCHER.format(python=python))
+        script.chmod(0o755)
+
+
+def layer(venv_dir: Path, base_venv: Path) -> None:
+    """Turns the new environment without pip, created by the interpreter
+    of the `base_venv`, into the layer on top of it."""
+    chain_site_packages(venv_dir, base_venv)
+    if any((d / "pip").is_dir() for d in site_packages_dirs(base_venv)):
+        write_pip_launchers(venv_dir)
+
+
+def children(vien_dir: Path, base_venv: Path) -> List[Path]:
+    """Returns the environments in VIENDIR layered on top of the
+    `base_venv`."""
+    return [entry for entry in sorted(vien_dir.glob("*_venv"))
+            if base_of(entry) == base_venv]
@@ -5,191 +5,141 @@ from __future__ import annotations
 
 import os
 import shlex
-import shutil
 import subprocess
 import sys
+from contextlib import contextmanager
 from pathlib import Path
 from typing import *
 
-from vien import is_posix
+from vien import _history, _settings, _trace, api
 from vien._bash_runner import start_bash_shell
-from vien._call_funcs import relative_fn_to_module_name, relative_inner_path
-from vien._cmdexe_escape_args import cmd_escape_arg
 from vien._colors import Colors
-from vien._common import need_posix, is_windows, need_windows
-from vien._exceptions import ChildExit, VenvExistsExit, VenvDoesNotExistExit, \
-    PyFileNotFoundExit, PyFileArgNotFoundExit, FailedToCreateVenvExit, \
-    FailedToClearVenvExit, CannotFindExecutableExit
+from vien._common import is_posix
+# some of the functions are imported from _core only for compatibility
+from vien._core import Dirs, child_env, get_vien_dir, get_wheels_dir, \
+    venv_dir_to_python_exe, _insert_into_pythonpath  # noqa: F401
+from vien._exceptions import VienExit, ChildExit, VenvExistsExit, \
+    VenvDoesNotExistExit, PyFileNotFoundExit, PyFileArgNotFoundExit, \
+    FailedToCreateVenvExit, FailedToClearVenvExit, CannotFindExecutableExit, \
+    VenvExistsError, VenvDoesNotExistError, PyFileNotFoundError, \
+    CannotFindExecutableError, FailedToCreateVenvError, \
+    FailedToClearVenvError, PythonNotFoundError, PythonNotFoundExit
 from vien._parsed_args import Commands, ParsedArgs
-from vien._parsed_call import list_left_partition
-
-verbose = False
 
 
 def exe_name() -> str:
     return os.path.basename(sys.argv[0])
 
 
-def get_vien_dir() -> Path:
-    path_from_var = os.environ.get("VIENDIR")
-    if path_from_var:
-        path_from_var = os.path.expandvars(path_from_var)
-        path_from_var = os.path.expanduser(path_from_var)
-        return Path(path_from_var)
-    else:
-        # It looks like storing dot files in the home directory
-        # is the de facto standard for both worlds.
-        #
-        # App    | POSIX     | Windows
-        # -------|-----------|----------------------
-        # VSCode | ~/.vscode | %USERPROFILE%\.vscode
-        # AWS:   | ~/.aws    | %USERPROFILE%\.aws
-        #
-        return Path.home() / ".vien"
-
-
-def run_bash_sequence(commands: List[str], env: Optional[Dict] = None) -> int:
-    need_posix()
-
-    # command || exit /b 666
-
-    lines = [
-        # shebang not necessary as we specify executable in subprocess.call
-        "set -e",  # fail on first error
-    ]
-
-    lines.extend(commands)
-
-    # Ubuntu really needs executable='/bin/bash'.
-    # Otherwise the command is executed in /bin/sh, ignoring the hashbang,
-    # but SH fails to execute commands like 'source'
-
-    return subprocess.call("\n".join(lines),
-                           shell=True,
-                           executable='/bin/bash',
-                           env=env)
-
-
-def run_cmdexe_sequence(commands: List[str], env: Optional[Dict] = None) -> int:
-    # todo test independently
-    # This function does not work "officially" yet.
-
-    need_windows()
-
-    # raise NotImplemented
-
-    # https://stackoverflow.com/questions/734598/how-do-i-make-a-batch-file-terminate-upon-encountering-an-error
-
-    # unlike bash, cmd.exe returns exit code zero even if last command returned
-    # non-zero. There is also no evident way to turn on 'set -e' mode, i.e.
-    # exit on the first failure.
-    #
-    # We'll just glue all the commands with &&
-
-    glued = " && ".join(f'( {c} )' for c in commands)
-
-    # print(f"CMD running {glued}")
-
-    return subprocess.call(glued,
-                           shell=True,
-                           # executable='/bin/bash',
-                           env=env)
-
-
-def venv_dir_to_python_exe(venv_dir: Path) -> Path:
-    # this method is being tested indirectly each time the venv is created:
-    # vien prints the path to executable after running this function
-
-    if is_posix:
-        parent = venv_dir / "bin"
-        basenames = "python", "python3"
-    else:
-        parent = venv_dir / "Scripts"
-        basenames = "python.exe", "python3.exe"
-
-    for name in basenames:
-        executable = parent / name
-        if executable.exists():
-            return executable
-
-    raise Exception(f"Cannot find the Python interpreter in {venv_dir}.")
+def _update_completion_index(created_project: Optional[Path] = None):
+    from vien import _completion  # not needed by most of the commands
+    try:
+        _completion.update_index(get_vien_dir(),
+                                 commands=[c.value for c in Commands],
+                                 created_project=created_project)
+    except OSError:
+        # the completion is not worth failing the command
+        pass
 
 
-def windows_cmdexe_activate(venv_dir: Path) -> Path:
-    # https://docs.python.org/3/library/venv.html
-    assert is_windows
-    return venv_dir / 'Scripts' / 'activate.bat'
-
-
-def posix_bash_activate(venv_dir: Path) -> Path:
-    # https://docs.python.org/3/library/venv.html
-    assert is_posix
-    return venv_dir / 'bin' / 'activate'
-
-
-def arg_to_python_interpreter(argument: Optional[str]) -> str:
-    if argument is None:
-        return sys.executable
-    exe = shutil.which(argument)
-    if not exe:
-        raise CannotFindExecutableExit(argument)
-    return exe
-
-
-def main_create(dirs: Dirs, interpreter: Optional[str]):
+def main_create(dirs: Dirs, interpreter: Optional[str],
+                base: Optional[Path] = None):
     if dirs.venv_dir.exists():
         raise VenvExistsExit(dirs.venv_dir)
-
-    exe = arg_to_python_interpreter(interpreter)
+    if base is not None:
+        if interpreter is not None:
+            raise VienExit("The interpreter of the environment with --base "
+                           "is the one of the base.")
+        if not base.exists():
+            raise VienExit(f'Base environment "{base}" does not exist.')
 
     print(f"Creating {dirs.venv_dir}")
 
-    result = subprocess.run([exe, "-m", "venv", str(dirs.venv_dir)])
-    if result.returncode == 0:
+    try:
+        created = api.create(dirs.project_dir, interpreter, base=base)
+    except FailedToCreateVenvError as e:
+        print(e.output, end='')
+        raise
+
+    _update_completion_index(created_project=created.project_dir)
+
+    print()
+    print("PROJECT DIR (unmodified)")
+    print(f"  {created.project_dir}")
+    print()
+    #  (for projects named '{os.path.basename(dirs.project_dir)}')
+    print(f"VIRTUAL ENVIRONMENT (created)")
+    print(f"  {created.venv_dir}")
+    print()
+    print("PYTHON EXECUTABLE (virtual)")
+    print(f"  {created.python_exe}")
+    if base is not None:
         print()
-        print("PROJECT DIR (unmodified)")
-        print(f"  {dirs.project_dir}")
-        print()
-        #  (for projects named '{os.path.basename(dirs.project_dir)}')
-        print(f"VIRTUAL ENVIRONMENT (created)")
-        print(f"  {dirs.venv_dir}")
-        print()
-        print("PYTHON EXECUTABLE (virtual)")
-        print(f"  {venv_dir_to_python_exe(dirs.venv_dir)}")
-    else:
-        raise FailedToCreateVenvExit(dirs.venv_dir)
+        print("BASE ENVIRONMENT (packages inherited)")
+        print(f"  {base}")
+
+    _auto_compile(dirs)
+
+
+def _auto_compile(dirs: Dirs):
+    """Compiles the environment and the project, if $VIEN_AUTO_COMPILE
+    is set."""
+    from vien import _compile
+    if not _compile.auto_compile_enabled():
+        return
+    try:
+        result = _compile.compile_venv_and_project(dirs.venv_dir,
+                                                   dirs.project_dir)
+    except (subprocess.CalledProcessError, OSError) as e:
+        # the command itself succeeded, so we only report it
+        print(f"Failed to compile: {e}", file=sys.stderr)
+        return
+    print(_compile.format_result(result), file=sys.stderr)
 
 
 def main_delete(venv_dir: Path):
-    if "_venv" not in venv_dir.name:
-        raise ValueError(venv_dir)
     if not venv_dir.exists():
         raise VenvDoesNotExistExit(venv_dir)
 
-    # todo try to use the same executable that created the environment
-    # If we use sys.executable, we may clear the venv in some incompatible way.
-    # But we can't just use executable from the venv when clearing it:
-    # Windows will fail with [WinError 5] Access is denied: '...python.exe'
-
-    # todo check we are not running the same executable we about to delete
-    # python_exe = venv_dir_to_python_exe(venv_dir)
-    print(f"Clearing {venv_dir}")
-
-    result = subprocess.run(
-        [sys.executable, "-m", "venv", "--clear", str(venv_dir)],
-        capture_output=True, encoding=sys.stdout.encoding)
-    if result.returncode != 0:
-        print(f"stdout: {result.stdout}")
-        print(f"stderr: {result.stderr}")
-        raise FailedToClearVenvExit(venv_dir)
+    from vien import _layers
+    dependent = _layers.children(venv_dir.parent, venv_dir)
+    if dependent:
+        print("The environments based on it will not see its packages "
+              "until it is created again:", file=sys.stderr)
+        for child in dependent:
+            print(f"  {child}", file=sys.stderr)
+
     print(f"Deleting {venv_dir}")
-    shutil.rmtree(str(venv_dir))
+    try:
+        api.delete_venv_dir(venv_dir)
+    except FailedToClearVenvError as e:
+        print(f"stdout: {e.stdout}")
+        print(f"stderr: {e.stderr}")
+        raise
+    _update_completion_index()
+    if is_posix:
+        from vien import _expose
+        for shim in _expose.remove(venv_dir):
+            print(f"Removed {shim}")
 
 
-def main_recreate(dirs: Dirs, interpreter: Optional[str]):
+def main_recreate(dirs: Dirs, interpreter: Optional[str],
+                  base: Optional[Path] = None):
+    shims: List[str] = []
+    if is_posix:
+        from vien import _expose
+        shims = _expose.exposed(dirs.venv_dir)
     if dirs.venv_dir.exists():
+        if base is None and interpreter is None:
+            # a layered environment keeps its base
+            from vien import _layers
+            base = _layers.base_of(dirs.venv_dir)
         main_delete(dirs.venv_dir)
-    main_create(dirs, interpreter=interpreter)
+    main_create(dirs, interpreter=interpreter, base=base)
+    if shims:
+        # the scripts will appear when the packages are installed again
+        for shim in _expose.write_shims(dirs.venv_dir, shims):
+            print(f"Restored {shim}")
 
 
 def guess_bash_ps1():
@@ -274,99 +224,610 @@ def main_shell(dirs: Dirs, input: Optional[str], input_delay: Optional[float]):
     # Popen closes the stdin. So it will not wait for "exit". But it serves
     # the task well
 
-    cp = start_bash_shell(init_commands=[
-        f'source {shlex.quote(str(activate_path))}',
-        f"PS1={_quoted(new_ps1)}"],
-        input=input,
-        input_delay=input_delay,
-        env=child_env(dirs.project_dir)
-    )
-
+    with _using_fast_tier(dirs):
+        _refresh_modindex(dirs)
+        _check_pycache(dirs)
+        cp = start_bash_shell(init_commands=[
+            f'source {shlex.quote(str(activate_path))}',
+            f"PS1={_quoted(new_ps1)}"],
+            input=input,
+            input_delay=input_delay,
+            env=child_env(dirs.project_dir, venv_dir=dirs.venv_dir)
+        )
+        _trim_pycache(dirs)
     # the vien will return the same exit code as the shell returned
     raise ChildExit(cp.returncode)
 
 
-def bash_args_to_str(args: List[str]) -> str:
-    return ' '.join(shlex.quote(arg) for arg in args)
+def _trim_pycache(dirs: Dirs):
+    """Keeps the bytecode cache of the children (if any) within the size
+    limit."""
+    if _settings.get(dirs.venv_dir, "pycache") is None:
+        return
+    from vien import _pycache
+    try:
+        directory = _pycache.cache_dir(dirs.venv_dir)
+        if directory is not None:
+            _pycache.trim_if_due(directory)
+    except (OSError, ValueError):
+        # the trimming is not worth failing the command
+        pass
+
+
+@contextmanager
+def _using_fast_tier(dirs: Dirs):
+    """Moves the environment to $VIEN_FAST_DIR before starting a child, or
+    records the use if it is already there. Keeps the environment from
+    being moved while the child runs, and starts moving the idle ones back
+    after it."""
+    from vien import _tier
+    try:
+        fast = _tier.fast_dir()
+    except _tier.TierError as e:
+        print(f"Failed to move the environment: {e}", file=sys.stderr)
+        fast = None
+    if fast is None or not dirs.venv_dir.exists():
+        yield
+        return
+    try:
+        if _tier.is_promoted(dirs.venv_dir):
+            _tier.touch(dirs.venv_dir)
+        elif _tier.promote(dirs.venv_dir, fast):
+            print(f"Moved {dirs.venv_dir} to {fast}", file=sys.stderr)
+    except (_tier.TierError, OSError) as e:
+        # the environment works where it is
+        print(f"Failed to move the environment: {e}", file=sys.stderr)
+    with _tier.in_use(dirs.venv_dir):
+        yield
+    try:
+        _tier.start_sweep_if_due(get_vien_dir(), fast)
+    except OSError as e:
+        print(f"Failed to move the idle environments: {e}", file=sys.stderr)
+
+
+def _check_pycache(dirs: Dirs):
+    """Warns if the bytecode cache of the project cannot be used. The
+    children run without it then: the library functions do not print."""
+    if not _settings.get(dirs.venv_dir, "pycache"):
+        return
+    from vien import _pycache
+    try:
+        _pycache.child_prefix(dirs.venv_dir)
+    except (OSError, ValueError) as e:
+        # the children write the bytecode next to the sources then
+        print(f"Not using the bytecode cache: {e}", file=sys.stderr)
+
+
+def _refresh_modindex(dirs: Dirs):
+    """Rebuilds the module index of the environment before starting a
+    child, if the project uses the index and it is stale."""
+    if _settings.get(dirs.venv_dir, "modindex") != "on" \
+            or not dirs.venv_dir.exists():
+        return
+    from vien import _modindex
+    try:
+        _modindex.refresh(dirs.venv_dir, dirs.project_dir)
+    except (subprocess.CalledProcessError, OSError) as e:
+        # the finder ignores a stale index, so the child will work anyway
+        print(f"Failed to index the modules: {e}", file=sys.stderr)
+
 
+def main_run(dirs: Dirs, command: List[str]):
+    with _using_fast_tier(dirs):
+        _refresh_modindex(dirs)
+        _check_pycache(dirs)
+        result = api.run(dirs.project_dir, command)
+        _trim_pycache(dirs)
+    if result.returncode == 0:
+        from vien._compile import is_install_command
+        if is_install_command(command):
+            _auto_compile(dirs)
+    raise ChildExit(result.returncode)
+
+
+def main_run_ephemeral(parsed: ParsedArgs, dirs: Dirs):
+    from vien import _ephemeral
+
+    try:
+        interpreter = api.resolve_interpreter(parsed.run_python)
+    except CannotFindExecutableError:
+        # without --python, the current interpreter is always found
+        assert parsed.run_python is not None
+        raise CannotFindExecutableExit(parsed.run_python)
+    try:
+        with _ephemeral.signals_as_exit(), \
+                _ephemeral.ephemeral_venv(dirs.project_dir.name,
+                                          interpreter) as venv_dir:
+            result = api.run_in(Dirs(dirs.project_dir, venv_dir=venv_dir),
+                                parsed.run_args)
+    except KeyboardInterrupt:
+        raise ChildExit(130)
+    except (subprocess.CalledProcessError, OSError) as e:
+        raise VienExit(f"Failed to run in an ephemeral environment: {e}")
+    raise ChildExit(result.returncode)
+
+
+def main_run_with(parsed: ParsedArgs, dirs: Dirs):
+    from vien import _overlay
 
-def cmdexe_args_to_str(args: List[str]) -> str:
-    return ' '.join(cmd_escape_arg(arg) for arg in args)
+    dirs.venv_must_exist()
+    try:
+        overlay = _overlay.get(get_vien_dir(), dirs.venv_dir,
+                               parsed.run_with)
+    except (subprocess.CalledProcessError, OSError) as e:
+        raise VienExit(f"Failed to install {' '.join(parsed.run_with)}: {e}")
+    _check_pycache(dirs)
+    env = _overlay.child_env(overlay, dirs.venv_dir,
+                             api.child_process_env(dirs, None, None))
+    result = api.run_in(Dirs(dirs.project_dir, venv_dir=overlay),
+                        parsed.run_args, env=env)
+    _overlay.evict(get_vien_dir())
+    raise ChildExit(result.returncode)
 
 
-def main_run(dirs: Dirs, command: List[str]):
+def main_call(parsed: ParsedArgs, dirs: Dirs):
+    assert parsed.call is not None
+    with _using_fast_tier(dirs):
+        _refresh_modindex(dirs)
+        _check_pycache(dirs)
+        result = api.call(dirs.project_dir, parsed.args_to_python)
+        _trim_pycache(dirs)
+    raise ChildExit(result.returncode)
+
+
+def main_call_watch(parsed: ParsedArgs, dirs: Dirs):
+    from vien import _watch  # not needed by the other commands
+
+    # resolving everything once for the whole session
     dirs.venv_must_exist()
+    with _using_fast_tier(dirs):
+        _refresh_modindex(dirs)
+        _check_pycache(dirs)
+        args = [str(venv_dir_to_python_exe(dirs.venv_dir))] \
+            + api.python_args(dirs, parsed.args_to_python)
+        env = api.child_process_env(dirs, cwd=None, env=None)
+        try:
+            _watch.watch_call(args, dirs.project_dir, env=env)
+        except _watch.WatchNotSupported as e:
+            raise VienExit(str(e))
+        except KeyboardInterrupt:
+            raise ChildExit(130)
+
+
+def main_shebang(parsed: ParsedArgs, dirs: Dirs):
+    from vien import _shebang  # not needed by the other commands
+
+    if parsed.shebang_command == "install":
+        dirs.venv_must_exist()
+        source = Path(os.path.abspath(parsed.shebang_file))
+        if not source.exists():
+            raise PyFileNotFoundExit(source)
+        launcher = Path(os.path.abspath(parsed.shebang_output)) \
+            if parsed.shebang_output is not None \
+            else _shebang.default_launcher_path(source)
+        if launcher == source:
+            raise VienExit("The launcher must not replace the .py file.")
+        if launcher.is_dir():
+            # like a package directory next to the module of the same name
+            raise VienExit(f"{launcher} is a directory. Set the path of "
+                           f"the launcher with -o.")
+        try:
+            _shebang.install(source, dirs.project_dir, dirs.venv_dir,
+                             venv_dir_to_python_exe(dirs.venv_dir),
+                             launcher)
+        except ValueError as e:
+            # the file is not inside the project, or its name is not
+            # a module name
+            raise VienExit(f"Cannot run {source} as a module of "
+                           f"{dirs.project_dir}: {e}")
+        print(launcher)
+    elif parsed.shebang_command == "check":
+        launchers = [Path(p) for p in parsed.shebang_launchers] \
+            or list(_shebang.find_launchers(dirs.project_dir))
+        problems = _shebang.check(launchers)
+        for line in problems:
+            print(line)
+        if problems:
+            raise VienExit("Run 'vien shebang install' for the stale "
+                           "launchers again.")
+        print(f"{len(launchers)} launcher(s) are up to date.")
+    else:
+        raise ValueError
 
-    sequence: List[str] = list()
 
-    if is_posix:
-        activate_file = posix_bash_activate(dirs.venv_dir)
-        sequence.append(f'source {shlex.quote(str(activate_file))}')
-        sequence.append(bash_args_to_str(command))
-        run_func = run_bash_sequence
-    elif is_windows:
-        activate_file = windows_cmdexe_activate(dirs.venv_dir)
-        sequence.append(f'CALL {activate_file}"')
-        sequence.append(cmdexe_args_to_str(command))
-        run_func = run_cmdexe_sequence
+def main_expose(parsed: ParsedArgs, dirs: Dirs):
+    from vien import _expose  # not needed by the other commands
+
+    dirs.venv_must_exist()
+    if parsed.expose_remove:
+        removed = _expose.remove(dirs.venv_dir, parsed.expose_scripts or None)
+        for shim in removed:
+            print(f"Removed {shim}")
+        return
+
+    names = parsed.expose_scripts or _expose.venv_scripts(dirs.venv_dir)
+    if not names:
+        raise VienExit(f"There are no scripts in {dirs.venv_dir / 'bin'} "
+                       f"to expose.")
+    try:
+        shims = _expose.expose(dirs.venv_dir, names,
+                               force=parsed.expose_force)
+    except _expose.ExposeError as e:
+        raise VienExit(str(e))
+    for shim in shims:
+        print(shim)
+    directory = _expose.shims_dir(dirs.venv_dir)
+    if str(directory) not in os.environ.get("PATH", "").split(os.pathsep):
+        print(f"Add {directory} to PATH to run the scripts.")
+
+
+def main_completion(parsed: ParsedArgs):
+    from vien import _completion
+
+    if parsed.completion_command == "bash":
+        print(_completion.BASH_SCRIPT, end='')
+    elif parsed.completion_command == "update":
+        _update_completion_index()
     else:
-        raise AssertionError("Unexpected OS")
-    #    activate_file = (dirs.venv_dir / 'bin' / 'activate').absolute()
-    if not activate_file.exists():
-        raise FileNotFoundError(activate_file)
-
-    exit_code = run_func(sequence, env=child_env(dirs.project_dir))
-    raise ChildExit(exit_code)
-
-
-class Dirs:
-    def __init__(self, project_dir: Union[str, Path] = '.'):
-        self.project_dir = Path(project_dir).absolute()
-        self.venv_dir = get_vien_dir() / (self.project_dir.name + "_venv")
-        if verbose:
-            print(f"Proj dir: {self.project_dir}")
-            print(f"Venv dir: {self.venv_dir}")
-
-    def venv_must_exist(self) -> Dirs:
-        if not self.venv_dir.exists():
-            raise VenvDoesNotExistExit(self.venv_dir)
-        return self
-
-
-def _insert_into_pythonpath(insert_me: str) -> str:
-    # https://docs.python.org/3/using/cmdline.html#envvar-PYTHONPATH
-    # "The format is the same as the shell’s PATH: one or more directory
-    # pathnames separated by os.pathsep (e.g. colons on Unix or semicolons
-    # on Windows)"
-    #
-    ####
-    #
-    # $PYTHONPATH and sys.path are not the same.
-    # - $PYTHONPATH is the variable to be used by all Python interpreters
-    #   in the current shell environment
-    # - sys.path is values for the current interpreter
-    #
-    # Passing values from own sys.path to other interpreter would be a mistake.
-    # The current interpreter may be Python 3.7, and the other interpreter is
-    # Python 3.9. Our sys.path leads to 3.7 system libraries, that are
-    # unnecessary and even cause errors if added to $PYTHONPATH of 3.9.
-    #
-    ######
-    # keeping it simple: not parsing the old string, just adding a prefix
+        raise ValueError
 
-    old = os.environ.get("PYTHONPATH", '')
-    return f'{insert_me}{os.pathsep}{old}'
 
+def main_compile(parsed: ParsedArgs, dirs: Dirs):
+    from vien import _compile
 
-def child_env(proj_path: Path) -> Optional[Dict]:
-    env: Optional[Dict]
-    if proj_path != Path.cwd():
-        return {
-            **os.environ,
-            'PYTHONPATH': _insert_into_pythonpath(str(proj_path))
-        }
+    dirs.venv_must_exist()
+    try:
+        result = _compile.compile_venv_and_project(
+            dirs.venv_dir, dirs.project_dir,
+            venv=parsed.compile_only != "project",
+            project=parsed.compile_only != "venv",
+            optimize=parsed.compile_optimize,
+            invalidation=parsed.compile_invalidation_mode,
+            jobs=parsed.compile_jobs)
+    except (subprocess.CalledProcessError, OSError) as e:
+        raise VienExit(f"Failed to compile: {e}")
+    print(_compile.format_result(result))
+    if result.failed:
+        raise ChildExit(1)
+
+
+def main_config(parsed: ParsedArgs, dirs: Dirs):
+    key, value = parsed.config_key, parsed.config_value
+    if key is None:
+        settings = _settings.load(dirs.venv_dir)
+        for known, description in _settings.KNOWN.items():
+            print(f"{known} = {settings.get(known, '')}")
+            print(f"  {description}")
+        return
+    if key not in _settings.KNOWN:
+        raise VienExit(f"Unknown setting '{key}'. The settings are: "
+                       f"{', '.join(_settings.KNOWN)}.")
+    if parsed.config_unset:
+        _settings.set_value(dirs.venv_dir, key, None)
+    elif value is None:
+        print(_settings.get(dirs.venv_dir, key) or '')
+        return
     else:
-        return None
+        if key == "pycache":
+            from vien import _pycache
+            try:
+                _pycache.check_setting(value)
+            except (ValueError, OSError) as e:
+                raise VienExit(f"Cannot keep the bytecode in {value}: {e}")
+        if key == "modindex" and value not in ("on", "off"):
+            raise VienExit("The value must be 'on' or 'off'.")
+        _settings.set_value(dirs.venv_dir, key, value)
+    print(f"Saved to {_settings.settings_file(dirs.venv_dir)}")
+    if key == "modindex":
+        _apply_modindex(dirs)
+
+
+def _apply_modindex(dirs: Dirs):
+    from vien import _modindex
+    if not dirs.venv_dir.exists():
+        return  # will be built by the first 'call' or 'run'
+    if _settings.get(dirs.venv_dir, "modindex") == "on":
+        try:
+            _modindex.refresh(dirs.venv_dir, dirs.project_dir)
+        except (subprocess.CalledProcessError, OSError) as e:
+            raise VienExit(f"Failed to index the modules: {e}")
+        print(f"Indexed {_modindex.module_count(dirs.venv_dir)} "
+              f"top-level modules.")
+    else:
+        _modindex.remove(dirs.venv_dir)
+
+
+def main_cache(parsed: ParsedArgs, dirs: Dirs):
+    from vien import _pycache
+
+    assert parsed.cache_command == "clear"
+    directory = _pycache.cache_dir(dirs.venv_dir)
+    if parsed.cache_all:
+        # the caches of all the projects in all the possible places
+        setting = _settings.get(dirs.venv_dir, "pycache")
+        bases = {_pycache.base_dir(s) for s in ["local", "shm"]
+                 + ([setting] if setting else [])}
+        for base in sorted(b for b in bases if b is not None):
+            for removed in _pycache.clear_all(base):
+                print(f"Removed {removed}")
+    elif directory is None:
+        print(f"The project does not use a bytecode cache. "
+              f"See 'vien config pycache'.")
+    elif _pycache.clear(directory):
+        print(f"Removed {directory}")
+
+
+def main_pack(parsed: ParsedArgs, dirs: Dirs):
+    from vien import _pack
+
+    dirs.venv_must_exist()
+    try:
+        results = _pack.pack(dirs.venv_dir, parsed.pack_exclude)
+    except (subprocess.CalledProcessError, OSError) as e:
+        raise VienExit(f"Failed to pack: {e}")
+    packed = sorted(n for r in results for n in r["packed"])
+    files = sum(r["files"] for r in results)
+    print(f"Packed {len(packed)} distributions ({files} files).")
+    kept = {n: reason for r in results for n, reason in r["kept"].items()}
+    for name in sorted(kept):
+        print(f"  left on disk: {name} ({kept[name]})")
+    if packed:
+        print("Run 'vien unpack' before upgrading or removing them.")
+
+
+def main_unpack(dirs: Dirs):
+    from vien import _pack
+
+    dirs.venv_must_exist()
+    try:
+        results = _pack.unpack(dirs.venv_dir)
+    except (subprocess.CalledProcessError, OSError) as e:
+        raise VienExit(f"Failed to unpack: {e}")
+    unpacked = sum(len(r["unpacked"]) for r in results)
+    files = sum(r["files"] for r in results)
+    if unpacked:
+        print(f"Unpacked {unpacked} distributions ({files} files).")
+    else:
+        print("The environment is not packed.")
+
+
+def main_warm(parsed: ParsedArgs, dirs: Dirs):
+    from vien import _warm
+
+    if parsed.warm_files is not None:
+        try:
+            files = _warm.read_file_list(Path(parsed.warm_files))
+        except OSError as e:
+            raise VienExit(f"Failed to read the file list: {e}")
+    else:
+        dirs.venv_must_exist()
+        files = _warm.venv_files(dirs.venv_dir)
+    print(_warm.format_result(_warm.warm(files, jobs=parsed.warm_jobs)))
+
+
+def main_tier(parsed: ParsedArgs, dirs: Dirs):
+    from vien import _tier
+
+    try:
+        fast = _tier.fast_dir()
+        if fast is None:
+            raise VienExit(f"${_tier.FAST_DIR_ENV} is not set.")
+        command = parsed.tier_command
+        if command == "sweep":
+            for venv_dir in _tier.sweep(get_vien_dir(), fast):
+                print(f"Moved back {venv_dir}")
+            return
+        dirs.venv_must_exist()
+        # waits for the programs that use the environment
+        if command == "promote":
+            _tier.promote(dirs.venv_dir, fast, wait=True)
+        elif command == "demote":
+            _tier.demote(dirs.venv_dir, fast, wait=True)
+        if _tier.is_promoted(dirs.venv_dir):
+            print(f"{dirs.venv_dir} -> {os.readlink(str(dirs.venv_dir))}")
+        else:
+            print(f"{dirs.venv_dir} (not moved)")
+    except (_tier.TierError, OSError) as e:
+        raise VienExit(str(e))
+
+
+def main_snapshot(parsed: ParsedArgs, dirs: Dirs):
+    from vien import _snapshot
+
+    if parsed.snapshot_list:
+        for snapshot in _snapshot.snapshots(dirs.venv_dir):
+            print(snapshot.name)
+        return
+    dirs.venv_must_exist()
+    try:
+        snapshot = _snapshot.take(dirs.venv_dir, parsed.snapshot_name)
+    except (_snapshot.SnapshotError, OSError) as e:
+        raise VienExit(f"Failed to take the snapshot: {e}")
+    print(f"Saved {snapshot}")
+
+
+def main_rollback(parsed: ParsedArgs, dirs: Dirs):
+    from vien import _snapshot
+
+    try:
+        snapshot = _snapshot.rollback(dirs.venv_dir, parsed.snapshot_name)
+    except (_snapshot.SnapshotError, OSError) as e:
+        raise VienExit(f"Failed to roll back: {e}")
+    print(f"Restored {dirs.venv_dir} from {snapshot.name}")
+
+
+def main_upgrade_python(parsed: ParsedArgs, dirs: Dirs):
+    from vien import _upgrade
+
+    dirs.venv_must_exist()
+    try:
+        interpreter = api.resolve_interpreter(parsed.upgrade_python)
+    except CannotFindExecutableError:
+        raise CannotFindExecutableExit(parsed.upgrade_python)
+    find_links = parsed.upgrade_find_links
+    print(f"Upgrading {dirs.venv_dir}")
+    try:
+        result = _upgrade.upgrade(
+            dirs.venv_dir, interpreter,
+            Path(find_links).absolute() if find_links is not None else None)
+    except (_upgrade.UpgradeError, subprocess.CalledProcessError,
+            OSError) as e:
+        raise VienExit(f"Failed to upgrade the environment: {e}")
+    for title, names in [("CARRIED OVER", result.carried),
+                         ("REINSTALLED", result.reinstalled),
+                         ("NOT CARRIED OVER (no .dist-info)", result.lost)]:
+        if names:
+            print()
+            print(f"{title} ({len(names)})")
+            for name in names:
+                print(f"  {name}")
+    print()
+    print("PYTHON EXECUTABLE (virtual)")
+    print(f"  {result.python_exe}")
+    if result.compile_error is not None:
+        print(f"Upgraded, but failed to byte-compile the distributions: "
+              f"{result.compile_error}. Run 'vien compile' to retry.",
+              file=sys.stderr)
+
+
+def main_install_wheels(parsed: ParsedArgs, dirs: Dirs):
+    from vien import _wheels
+
+    dirs.venv_must_exist()
+    wheels = _wheels.wheel_files(Path(w) for w in parsed.wheels)
+    if not wheels:
+        raise VienExit("No wheels to install.")
+    try:
+        result = _wheels.install(dirs.venv_dir, wheels,
+                                 jobs=parsed.wheels_jobs,
+                                 compile=parsed.wheels_compile)
+    except (_wheels.WheelError, subprocess.CalledProcessError, OSError) as e:
+        raise VienExit(f"Failed to install the wheels: {e}")
+    print(f"Installed {len(result.installed)} distributions "
+          f"({result.files} files).")
+
+
+def main_prebuild(parsed: ParsedArgs, dirs: Dirs):
+    from vien import _prebuild
+
+    dirs.venv_must_exist()
+    requirements = None
+    if parsed.prebuild_requirements:
+        requirements = []
+        for file in parsed.prebuild_requirements:
+            try:
+                text = Path(file).read_text()
+            except OSError as e:
+                raise VienExit(f"Failed to read {file}: {e}")
+            requirements.extend(_prebuild.parse_requirements(text))
+    try:
+        result = _prebuild.prebuild(dirs.venv_dir,
+                                    Path(parsed.prebuild_sources).absolute(),
+                                    get_wheels_dir(), requirements,
+                                    jobs=parsed.prebuild_jobs)
+    except (_prebuild.PrebuildError, subprocess.CalledProcessError,
+            OSError) as e:
+        raise VienExit(f"Failed to build the wheels: {e}")
+    for name in result.built:
+        print(f"Built {name}")
+    print(f"Built {len(result.built)} wheels, {len(result.cached)} were "
+          f"built before. Saved to {get_wheels_dir()}")
+    for name, error in result.failed:
+        print(f"Failed to build {name}:\n{error}", file=sys.stderr)
+    if result.failed:
+        raise VienExit(f"Failed to build {len(result.failed)} wheels.")
+
+
+def _env_key(parsed: ParsedArgs, dirs: Dirs,
+             python: Optional[str] = None) -> str:
+    from vien import _archive
+
+    if python is None:
+        if parsed.archive_python is not None:
+            try:
+                python = api.resolve_interpreter(parsed.archive_python)
+            except CannotFindExecutableError:
+                raise CannotFindExecutableExit(parsed.archive_python)
+        elif dirs.venv_dir.exists():
+            python = str(venv_dir_to_python_exe(dirs.venv_dir))
+        else:
+            # the same as for `vien create` without the interpreter
+            python = api.resolve_interpreter(None)
+    files = None
+    if parsed.archive_files is not None:
+        files = [Path(f).absolute() for f in parsed.archive_files]
+    try:
+        return _archive.key(dirs.project_dir, python, files)
+    except (_archive.ArchiveError, subprocess.CalledProcessError,
+            OSError) as e:
+        raise VienExit(f"Failed to compute the key: {e}")
+
+
+def main_key(parsed: ParsedArgs, dirs: Dirs):
+    print(_env_key(parsed, dirs))
+
+
+def main_save(parsed: ParsedArgs, dirs: Dirs):
+    from vien import _archive
+
+    dirs.venv_must_exist()
+    env_key = _env_key(parsed, dirs,
+                       str(venv_dir_to_python_exe(dirs.venv_dir)))
+    try:
+        saved = _archive.save(dirs.venv_dir,
+                              Path(parsed.archive_cache_dir).absolute(),
+                              env_key, jobs=parsed.archive_jobs)
+    except (_archive.ArchiveError, OSError) as e:
+        raise VienExit(f"Failed to save the environment: {e}")
+    if saved.created:
+        print(f"Saved {saved.files} files to {saved.archive}")
+    else:
+        print(f"Already saved to {saved.archive}")
+
+
+def main_restore(parsed: ParsedArgs, dirs: Dirs):
+    from vien import _archive
+
+    if dirs.venv_dir.exists():
+        raise VenvExistsExit(dirs.venv_dir)
+    env_key = _env_key(parsed, dirs)
+    try:
+        _archive.restore(dirs.venv_dir,
+                         Path(parsed.archive_cache_dir).absolute(),
+                         env_key, jobs=parsed.archive_jobs)
+    except (_archive.ArchiveError, OSError) as e:
+        raise VienExit(f"Failed to restore the environment: {e}")
+    print(f"Restored {dirs.venv_dir}")
+
+
+def main_verify(parsed: ParsedArgs, dirs: Dirs):
+    from vien import _integrity
+
+    dirs.venv_must_exist()
+    try:
+        result = _integrity.verify(dirs.venv_dir,
+                                   jobs=parsed.integrity_jobs)
+    except (_integrity.IntegrityError, OSError) as e:
+        raise VienExit(f"Failed to verify the environment: {e}")
+    for problem in result.problems:
+        print(f"{problem.reason.upper()} {problem.distribution}: "
+              f"{problem.path}")
+    if result.problems:
+        raise VienExit(f"{len(result.problems)} of {result.files} files "
+                       f"do not match their RECORD.")
+    print(f"Verified {result.files} files of {result.distributions} "
+          f"distributions.")
+
+
+def main_fingerprint(parsed: ParsedArgs, dirs: Dirs):
+    from vien import _integrity
+
+    dirs.venv_must_exist()
+    try:
+        print(_integrity.fingerprint(dirs.venv_dir,
+                                     jobs=parsed.integrity_jobs))
+    except OSError as e:
+        raise VienExit(f"Failed to fingerprint the environment: {e}")
 
 
 def replace_arg(args: List[str], old: str, new: List[str]) -> List[str]:
@@ -388,39 +849,28 @@ def replace_arg(args: List[str], old: str, new: List[str]) -> List[str]:
     return result
 
 
-def main_call(parsed: ParsedArgs, dirs: Dirs):
-    dirs.venv_must_exist()
-
-    assert parsed.call is not None
-
-    if not os.path.exists(parsed.call.filename):
-        raise PyFileNotFoundExit(Path(parsed.call.filename))
-
-    if parsed.call.before_filename == "-m":
-        # todo unit test
-        # /abc/project/package/module.py -> package/module.py
-        relative = relative_inner_path(parsed.call.filename, dirs.project_dir)
-        # package/module.py -> package.module
-        module_name = relative_fn_to_module_name(relative)
-        # replacing the filename in args with the module name.
-        # It is already prefixed with -m
-        args = parsed.call.args.copy()
-        args[parsed.call.filename_idx] = module_name
-        # args to python are those after 'call' word
-        _, args_to_python = list_left_partition(args, 'call')
-        assert '-m' in args_to_python
-        assert module_name in args_to_python
-    else:
-        args_to_python = parsed.args_to_python
-
-    python_exe = venv_dir_to_python_exe(dirs.venv_dir)
-
-    assert len(args_to_python) > 0
-    args = [str(python_exe)] + args_to_python
-
-    cp = subprocess.run(args, env=child_env(dirs.project_dir))
-
-    raise ChildExit(cp.returncode)
+@contextmanager
+def _errors_to_exits():
+    """Converts the errors of the library API to the exceptions that
+    print the message and exit the program."""
+    try:
+        yield
+    except VenvExistsError as e:
+        raise VenvExistsExit(e.path)
+    except VenvDoesNotExistError as e:
+        raise VenvDoesNotExistExit(e.path)
+    except PyFileNotFoundError as e:
+        raise PyFileNotFoundExit(e.path)
+    except CannotFindExecutableError as e:
+        raise CannotFindExecutableExit(e.argument)
+    except FailedToCreateVenvError as e:
+        raise FailedToCreateVenvExit(e.path)
+    except FailedToClearVenvError as e:
+        raise FailedToClearVenvExit(e.path)
+    except PythonNotFoundError as e:
+        raise PythonNotFoundExit(e.path)
+    except _settings.SettingsError as e:
+        raise VienExit(f"{e} Fix or remove it.")
 
 
 def normalize_path(reference: Path, path: Path) -> Path:
@@ -451,28 +901,125 @@ def get_project_dir(parsed: ParsedArgs) -> Path:
     return project_dir
 
 
+def main_stats(dirs: Dirs):
+    log_file = _history.history_file(dirs.venv_dir)
+    stats = _history.aggregate(_history.iter_records(log_file))
+    if not stats:
+        print(f"No history recorded for {dirs.venv_dir}.")
+        print(f"Set {_history.HISTORY_ENV}=1 to record the run, call and "
+              f"shell commands.")
+        return
+    for line in _history.format_stats(stats):
+        print(line)
+
+
+def _base_dir(parsed: ParsedArgs) -> Optional[Path]:
+    if parsed.base is None:
+        return None
+    from vien import _layers
+    return _layers.base_venv_dir(parsed.base)
+
+
 def main_entry_point(args: Optional[List[str]] = None):
+    _trace.tracer.phase("import")
+    try:
+        with _errors_to_exits():
+            _main_entry_point(args)
+    finally:
+        # the rest of the command, whatever it was
+        _trace.tracer.phase("finish")
+        _trace.tracer.flush()
+
+
+def _main_entry_point(args: Optional[List[str]]):
     parsed = ParsedArgs(args)
+    _trace.tracer.phase("parse_args")
 
     dirs = Dirs(project_dir=get_project_dir(parsed))
+    _trace.tracer.phase("project_dir")
 
     if parsed.command == Commands.create:
-        main_create(dirs, parsed.python_executable)
+        main_create(dirs, parsed.python_executable, _base_dir(parsed))
     elif parsed.command == Commands.recreate:
         main_recreate(dirs,
-                      parsed.python_executable)  # todo .existing()?
+                      parsed.python_executable,
+                      _base_dir(parsed))  # todo .existing()?
     elif parsed.command == Commands.delete:  # todo move 'existing' check from func?
         main_delete(dirs.venv_dir)
     elif parsed.command == Commands.path:
         print(dirs.venv_dir)  # does not need to be existing
+    elif parsed.command == Commands.run and parsed.run_ephemeral:
+        # the environment is not in VIENDIR, so it has no history
+        if parsed.run_with:
+            raise VienExit("The --with option cannot be used "
+                           "with --ephemeral.")
+        main_run_ephemeral(parsed, dirs)
+    elif parsed.command == Commands.run and parsed.run_with:
+        if parsed.run_python is not None:
+            raise VienExit("The --python option requires --ephemeral.")
+        # the overlay is not the project environment, so it has no history
+        main_run_with(parsed, dirs)
     elif parsed.command == Commands.run:
+        if parsed.run_python is not None:
+            raise VienExit("The --python option requires --ephemeral.")
         # todo allow running commands from strings
-        main_run(dirs.venv_must_exist(), parsed.run_args)
+        with _history.recorded(dirs.venv_dir, "run",
+                               target=os.path.basename(parsed.run_args[0])
+                               if parsed.run_args else '',
+                               args=parsed.run_args):
+            main_run(dirs.venv_must_exist(), parsed.run_args)
+    elif parsed.command == Commands.call and parsed.call_watch:
+        # a session of many runs is not recorded to the history
+        main_call_watch(parsed, dirs)
     elif parsed.command == Commands.call:
-
-        main_call(parsed, dirs)
-
+        with _history.recorded(dirs.venv_dir, "call",
+                               target=parsed.call.filename,
+                               args=parsed.args_to_python):
+            main_call(parsed, dirs)
     elif parsed.command == Commands.shell:
-        main_shell(dirs, parsed.shell_input, parsed.shell_delay)
+        with _history.recorded(dirs.venv_dir, "shell", target='', args=[]):
+            main_shell(dirs, parsed.shell_input, parsed.shell_delay)
+    elif parsed.command == Commands.stats:
+        main_stats(dirs)
+    elif parsed.command == Commands.shebang:
+        main_shebang(parsed, dirs)
+    elif parsed.command == Commands.expose:
+        main_expose(parsed, dirs)
+    elif parsed.command == Commands.completion:
+        main_completion(parsed)
+    elif parsed.command == Commands.compile:
+        main_compile(parsed, dirs)
+    elif parsed.command == Commands.config:
+        main_config(parsed, dirs)
+    elif parsed.command == Commands.cache:
+        main_cache(parsed, dirs)
+    elif parsed.command == Commands.pack:
+        main_pack(parsed, dirs)
+    elif parsed.command == Commands.unpack:
+        main_unpack(dirs)
+    elif parsed.command == Commands.warm:
+        main_warm(parsed, dirs)
+    elif parsed.command == Commands.tier:
+        main_tier(parsed, dirs)
+    elif parsed.command == Commands.snapshot:
+        main_snapshot(parsed, dirs)
+    elif parsed.command == Commands.rollback:
+        main_rollback(parsed, dirs)
+    elif parsed.command == Commands.upgrade_python:
+        main_upgrade_python(parsed, dirs)
+    elif parsed.command == Commands.install_wheels:
+        main_install_wheels(parsed, dirs)
+    elif parsed.command == Commands.prebuild:
+        main_prebuild(parsed, dirs)
+    elif parsed.command == Commands.key:
+        main_key(parsed, dirs)
+    elif parsed.command == Commands.save:
+        main_save(parsed, dirs)
+    elif parsed.command == Commands.restore:
+        main_restore(parsed, dirs)
+    elif parsed.command == Commands.verify:
+        main_verify(parsed, dirs)
+    elif parsed.command == Commands.fingerprint:
+        main_fingerprint(parsed, dirs)
     else:
         raise ValueError
@@ -0,0 +1,104 @@
+# SPDX-FileCopyrightText: (c) 2022 Artëm IG <github.com/rtmigo>
+# SPDX-License-Identifier: BSD-3-Clause
+
+"""The index of the top-level modules, that saves the child interpreters
+from looking for each import in each entry of sys.path.
+
+With `vien config modindex on`, the site-packages of the environment get
+`_vien_modindex.py` (a copy of `_modindex_finder.py`) imported through
+`vien-modindex.pth`. It loads `$VIRTUAL_ENV/vien-modindex.dat` and installs
+the finder, unless any of the indexed directories changed since indexing.
+`vien call` and `vien run` rebuild the stale index before starting the
+child.
+"""
+
+from __future__ import annotations
+
+import os
+import subprocess
+from pathlib import Path
+from typing import Optional
+
+from vien import _modindex_finder
+from vien._compile import site_packages_dirs
+from vien._core import venv_dir_to_python_exe
+
+FINDER_MODULE = "_vien_modindex"
+PTH_NAME = "vien-modindex.pth"
+
+_FINDER_SOURCE = Path(_modindex_finder.__file__)
+_WORKER = Path(__file__).with_name("_modindex_worker.py")
+
+
+def data_file(venv_dir: Path) -> Path:
+    return venv_dir / _modindex_finder.DATA_NAME
+
+
+def _write_if_changed(file: Path, text: str) -> None:
+    # each write changes the mtime of site-packages and makes the index
+    # stale
+    try:
+        if file.read_text() == text:
+            return
+    except FileNotFoundError:
+        pass
+    temp = file.with_name(file.name + ".vien-tmp")
+    temp.write_text(text)
+    os.replace(str(temp), str(file))
+
+
+def install_finder(venv_dir: Path) -> None:
+    site = site_packages_dirs(venv_dir)[0]
+    _write_if_changed(site / (FINDER_MODULE + ".py"),
+                      _FINDER_SOURCE.read_text())
+    _write_if_changed(site / PTH_NAME,
+                      f"import {FINDER_MODULE}; {FINDER_MODULE}.install()\n")
+
+
+def build(venv_dir: Path, project_dir: Path) -> None:
+    """Writes the index with the interpreter of the environment."""
+    env = {**os.environ, _modindex_finder.DISABLE_ENV: "0"}
+    env.pop("PYTHONPYCACHEPREFIX", None)
+    subprocess.check_call(
+        [str(venv_dir_to_python_exe(venv_dir)), str(_WORKER),
+         str(project_dir), str(data_file(venv_dir))],
+        env=env, cwd=str(project_dir))
+
+
+def _load(venv_dir: Path) -> Optional[dict]:
+    return _modindex_finder.load(str(data_file(venv_dir)))
+
+
+def is_fresh(venv_dir: Path, project_dir: Path) -> bool:
+    data = _load(venv_dir)
+    return data is not None \
+        and data["known"][:1] == [str(project_dir)] \
+        and _modindex_finder.is_fresh(data["stamps"])
+
+
+def refresh(venv_dir: Path, project_dir: Path) -> bool:
+    """Installs the finder and rebuilds the index if it is stale. Returns
+    True if the index was rebuilt."""
+    install_finder(venv_dir)
+    if is_fresh(venv_dir, project_dir):
+        return False
+    build(venv_dir, project_dir)
+    return True
+
+
+def remove(venv_dir: Path) -> None:
+    for site in site_packages_dirs(venv_dir):
+        for name in (PTH_NAME, FINDER_MODULE + ".py"):
+            try:
+                (site / name).unlink()
+            except FileNotFoundError:
+                pass
+    try:
+        data_file(venv_dir).unlink()
+    except FileNotFoundError:
+        pass
+
+
+def module_count(venv_dir: Path) -> int:
+    data = _load(venv_dir)
+    return 0 if data is None else len(data["index"])
@@ -0,0 +1,109 @@
+# SPDX-FileCopyrightText: (c) 2022 Artëm IG <github.com/rtmigo>
+# SPDX-License-Identifier: BSD-3-Clause
+
+"""The import finder answering the top-level imports from the module index.
+
+This file is copied to site-packages of the virtual environment as
+`_vien_modindex.py` and imported by the interpreter at startup through
+`vien-modindex.pth`. So it must not import vien, must work with any Python
+3.7+ and must be cheap to import.
+
+The index maps each top-level module name to the sys.path entries where
+it is found (in the order of sys.path at the time of indexing). Instead of
+looking for the module in each entry of sys.path, the finder looks only in
+those entries and in the entries that are unknown to the index (such as the
+directory of the script). The names missing from the index are left to the
+standard PathFinder.
+"""
+
+import marshal
+import os
+import sys
+from importlib.machinery import PathFinder
+
+DATA_NAME = "vien-modindex.dat"
+DISABLE_ENV = "VIEN_MODINDEX"
+VERSION = 1
+
+
+class IndexFinder:
+
+    def __init__(self, index, known):
+        self.index = index
+        self.known = frozenset(known)
+        self._path = None
+        self._search = dict()
+
+    def search_path(self, name):
+        """Returns the entries of sys.path where the module can be, or None
+        if it is not in the index."""
+        locations = self.index.get(name)
+        if locations is None:
+            return None
+        if self._path != sys.path:
+            self._path = list(sys.path)
+            self._search.clear()
+        result = self._search.get(name)
+        if result is None:
+            result = []
+            for entry in self._path:
+                if entry in locations:
+                    result.append(entry)
+                    break
+                if entry not in self.known:
+                    result.append(entry)
+            self._search[name] = result
+        return result
+
+    def find_spec(self, fullname, path=None, target=None):
+        if path is not None:
+            return None  # a submodule: the package knows where it is
+        search = self.search_path(fullname)
+        if not search:
+            return None
+        # if the index is wrong, the PathFinder will look everywhere
+        return PathFinder.find_spec(fullname, search, target)
+
+    def invalidate_caches(self):
+        # someone created new modules: the index may be stale
+        self.index = dict()
+        self._search.clear()
+
+
+def is_fresh(stamps):
+    """Whether the directories have not changed since indexing."""
+    for path, mtime in stamps:
+        try:
+            if os.stat(path).st_mtime_ns != mtime:
+                return False
+        except OSError:
+            if mtime != -1:
+                return False
+    return True
+
+
+def load(data_file):
+    try:
+        with open(data_file, "rb") as f:
+            data = marshal.load(f)
+    except (OSError, ValueError, EOFError, TypeError):
+        return None
+    if not isinstance(data, dict) or data.get("version") != VERSION:
+        return None
+    return data
+
+
+def install():
+    if os.environ.get(DISABLE_ENV) == "0":
+        return
+    # the .pth file is processed twice when lib64 is a symlink to lib
+    if any(isinstance(f, IndexFinder) for f in sys.meta_path):
+        return
+    data = load(os.path.join(sys.prefix, DATA_NAME))
+    if data is None or not is_fresh(data["stamps"]):
+        return
+    finder = IndexFinder(data["index"], data["known"])
+    meta_path = sys.meta_path
+    position = meta_path.index(PathFinder) \
+        if PathFinder in meta_path else len(meta_path)
+    meta_path.insert(position, finder)
@@ -0,0 +1,100 @@
+# SPDX-FileCopyrightText: (c) 2022 Artëm IG <github.com/rtmigo>
+# SPDX-License-Identifier: BSD-3-Clause
+
+"""Builds the module index of a virtual environment and a project. Used by
+`vien config modindex on` and refreshed by `vien call` and `vien run`.
+
+This script is run by the interpreter of the virtual environment (so the
+index sees its sys.path and its extension suffixes), not by vien. It must
+not import vien and must work with any Python 3.7+.
+
+Arguments: the project directory and the file to write the index to.
+"""
+
+import importlib.machinery
+import marshal
+import os
+import sys
+
+VERSION = 1
+
+_REGULAR, _NAMESPACE = 1, 2
+
+
+def top_level_names(directory):
+    """Returns {name: _REGULAR or _NAMESPACE} for the modules and
+    packages that the FileFinder would find in the directory."""
+    suffixes = importlib.machinery.all_suffixes()
+    result = dict()
+    for entry in os.scandir(directory):
+        name = entry.name
+        if entry.is_dir():
+            if not name.isidentifier():
+                continue
+            if any(os.path.isfile(os.path.join(entry.path, "__init__" + s))
+                   for s in suffixes):
+                result[name] = _REGULAR
+            else:
+                # may be a portion of a namespace package
+                result.setdefault(name, _NAMESPACE)
+            continue
+        for suffix in suffixes:
+            if name.endswith(suffix):
+                module = name[:-len(suffix)]
+                if module.isidentifier():
+                    result[module] = _REGULAR
+                break
+    return result
+
+
+def mtime(path):
+    try:
+        return os.stat(path).st_mtime_ns
+    except OSError:
+        return -1
+
+
+def build(entries):
+    """Returns the index data for the sys.path entries."""
+    index = dict()
+    namespaces = set()
+    known = []
+    stamps = []
+    for entry in entries:
+        if entry in known or os.path.isfile(entry):
+            # the files (zip archives) are left unknown, so the finder
+            # always looks into them
+            continue
+        # the stamp before the listing: a change during the listing
+        # makes the index stale, not wrong
+        stamps.append((entry, mtime(entry)))
+        known.append(entry)
+        if not os.path.isdir(entry):
+            continue
+        for name, kind in top_level_names(entry).items():
+            if kind == _NAMESPACE:
+                namespaces.add(name)
+            else:
+                index.setdefault(name, []).append(entry)
+    # the namespace packages are merged from many entries, the standard
+    # PathFinder knows how to do it
+    return {"version": VERSION, "stamps": stamps, "known": known,
+            "index": {name: tuple(locations)
+                      for name, locations in index.items()
+                      if name not in namespaces}}
+
+
+def main():
+    project_dir, data_file = sys.argv[1], sys.argv[2]
+    # sys.path[0] is the directory of this script. The children have the
+    # project directory there, or first in the PYTHONPATH
+    entries = [project_dir] + sys.path[1:]
+    data = build(entries)
+    temp = data_file + ".vien-tmp"
+    with open(temp, "wb") as f:
+        marshal.dump(data, f)
+    os.replace(temp, data_file)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,147 @@
+# SPDX-FileCopyrightText: (c) 2022 Artëm IG <github.com/rtmigo>
+# SPDX-License-Identifier: BSD-3-Clause
+
+"""Overlay environments for `vien run --with PKG`.
+
+An overlay is a small virtual environment that contains only the extra
+packages. Its site-packages chain to the site-packages of the project
+environment through a .pth file, so the interpreter of the overlay sees
+the packages of both, the overlay ones first. The project environment is
+neither changed nor copied.
+
+The overlays are kept in `$VIENDIR/overlays`, keyed by the project
+environment and the package set, so the next run with the same packages
+starts at once. The least recently used overlays beyond
+`$VIEN_OVERLAY_MAX` are removed.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import os
+import shutil
+import subprocess
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence
+
+from vien._compile import site_packages_dirs
+from vien._core import venv_dir_to_python_exe
+from vien._layers import chain_site_packages
+from vien._venv_cache import _exclusive_lock
+
+MAX_ENV = "VIEN_OVERLAY_MAX"
+DEFAULT_MAX = 8
+
+_COMPLETE_MARKER = ".vien-overlay-complete"
+
+# an overlay used recently may be used by a running program right now
+_IN_USE_SECONDS = 3600
+
+
+def overlays_dir(vien_dir: Path) -> Path:
+    return vien_dir / "overlays"
+
+
+def max_overlays() -> int:
+    try:
+        return int(os.environ[MAX_ENV])
+    except (KeyError, ValueError):
+        return DEFAULT_MAX
+
+
+def key(base_venv: Path, packages: Sequence[str]) -> str:
+    h = hashlib.sha256()
+    # the configuration changes when the base environment is recreated,
+    # possibly with another Python
+    cfg = base_venv / "pyvenv.cfg"
+    for part in [str(base_venv), cfg.read_text(),
+                 str(cfg.stat().st_mtime_ns)] + sorted(set(packages)):
+        h.update(part.encode())
+        h.update(b"\0")
+    return h.hexdigest()[:16]
+
+
+def _build(overlay: Path, base_venv: Path, packages: Sequence[str]) -> None:
+    # the interpreter of the base environment creates the overlay with the
+    # same Python. Pip is not installed: the one of the base is used
+    subprocess.run([str(venv_dir_to_python_exe(base_venv)), "-m", "venv",
+                    "--without-pip", str(overlay)],
+                   check=True, stdout=subprocess.DEVNULL)
+    chain_site_packages(overlay, base_venv)
+    # pip sees the packages of the base as installed, and does not
+    # install them again. It does not uninstall anything outside the
+    # overlay
+    subprocess.run([str(venv_dir_to_python_exe(overlay)), "-m", "pip",
+                    "install", "--disable-pip-version-check", "--quiet"]
+                   + list(packages), check=True)
+
+
+def get(vien_dir: Path, base_venv: Path, packages: Sequence[str]) -> Path:
+    """Returns the overlay with the packages on top of the `base_venv`,
+    creating it if needed."""
+    root = overlays_dir(vien_dir)
+    overlay = root / key(base_venv, packages)
+    if not (overlay / _COMPLETE_MARKER).exists():
+        with _exclusive_lock(root / (overlay.name + ".lock")):
+            # another process could build it while we were waiting
+            if not (overlay / _COMPLETE_MARKER).exists():
+                if overlay.exists():
+                    # the build was interrupted
+                    shutil.rmtree(str(overlay))
+                try:
+                    _build(overlay, base_venv, packages)
+                except BaseException:
+                    shutil.rmtree(str(overlay), ignore_errors=True)
+                    raise
+                (overlay / _COMPLETE_MARKER).write_text(
+                    "\n".join(sorted(set(packages))) + "\n")
+    # the mtime of the directory is the time of the last use
+    os.utime(str(overlay))
+    return overlay
+
+
+def child_env(overlay: Path, base_venv: Path,
+              env: Optional[Dict[str, str]]) -> Dict[str, str]:
+    """Returns the environment variables for running a command in the
+    overlay. The programs of the base environment, started by their own
+    interpreter, find the overlay packages through the PYTHONPATH."""
+    result = dict(env if env is not None else os.environ)
+    overlay_paths = [str(d) for d in site_packages_dirs(overlay)]
+    old_pythonpath = result.get("PYTHONPATH")
+    result["PYTHONPATH"] = os.pathsep.join(
+        overlay_paths + ([old_pythonpath] if old_pythonpath else []))
+    # the overlay is activated later, so its bin will be the first
+    result["PATH"] = os.pathsep.join(
+        [str(base_venv / "bin"), result.get("PATH", os.defpath)])
+    return result
+
+
+def evict(vien_dir: Path, keep: Optional[int] = None) -> List[Path]:
+    """Removes the least recently used overlays, so that at most `keep`
+    remain. Returns the removed ones."""
+    if keep is None:
+        keep = max_overlays()
+    root = overlays_dir(vien_dir)
+    if not root.is_dir():
+        return []
+    overlays = sorted((p for p in root.iterdir() if p.is_dir()),
+                      key=lambda p: p.stat().st_mtime, reverse=True)
+    now = time.time()
+    removed = []
+    for overlay in overlays[keep:]:
+        if now - overlay.stat().st_mtime < _IN_USE_SECONDS:
+            continue
+        shutil.rmtree(str(overlay), ignore_errors=True)
+        lock = root / (overlay.name + ".lock")
+        if lock.exists():
+            lock.unlink()
+        removed.append(overlay)
+    return removed
+
+
+def packages_of(overlay: Path) -> List[str]:
+    try:
+        return (overlay / _COMPLETE_MARKER).read_text().split()
+    except FileNotFoundError:
+        return []
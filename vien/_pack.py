@@ -0,0 +1,49 @@
+# SPDX-FileCopyrightText: (c) 2022 Artëm IG <github.com/rtmigo>
+# SPDX-License-Identifier: BSD-3-Clause
+
+"""Packing the pure-Python distributions of an environment into a zip.
+
+Importing from a site-packages tree costs a `stat` or `open` for each of
+many files. On network filesystems each of them is a round trip. After
+`vien pack` the pure-Python distributions are imported by `zipimport`
+from a single archive, that is opened once. The distributions with native
+extensions (and a few others that can not work from a zip) stay on disk.
+"""
+
+from __future__ import annotations
+
+import json
+import subprocess
+from pathlib import Path
+from typing import Dict, List, Sequence
+
+from vien._compile import site_packages_dirs
+from vien._core import venv_dir_to_python_exe
+
+_WORKER = Path(__file__).with_name("_pack_worker.py")
+
+
+def _run_worker(venv_dir: Path, args: List[str]) -> Dict:
+    output = subprocess.check_output(
+        [str(venv_dir_to_python_exe(venv_dir)), "-I", str(_WORKER)] + args)
+    return json.loads(output)
+
+
+def pack(venv_dir: Path, keep: Sequence[str] = ()) -> List[Dict]:
+    """Packs the distributions (except the `keep` ones) of each
+    site-packages directory. If the environment is already packed, it is
+    repacked, so the distributions installed since then are packed too.
+    """
+    return [_run_worker(venv_dir, ["pack", str(site), json.dumps(list(keep))])
+            for site in site_packages_dirs(venv_dir)]
+
+
+def unpack(venv_dir: Path) -> List[Dict]:
+    return [_run_worker(venv_dir, ["unpack", str(site)])
+            for site in site_packages_dirs(venv_dir)]
+
+
+def is_packed(venv_dir: Path) -> bool:
+    from vien._pack_worker import MANIFEST_NAME
+    return any((site / MANIFEST_NAME).exists()
+               for site in site_packages_dirs(venv_dir))
@@ -0,0 +1,214 @@
+# SPDX-FileCopyrightText: (c) 2022 Artëm IG <github.com/rtmigo>
+# SPDX-License-Identifier: BSD-3-Clause
+
+"""Moves the pure-Python distributions of site-packages into a zip archive
+and back. Used by `vien pack` and `vien unpack`.
+
+The archive contains precompiled .pyc files, so this script is run by the
+interpreter of the virtual environment, not by vien. It must not import
+vien and must work with any Python 3.7+.
+
+Arguments: "pack" or "unpack", the site-packages directory, and (for
+"pack") a JSON list of the distribution names to leave on disk.
+
+Prints a JSON object describing what was done.
+"""
+
+import csv
+import importlib.util
+import json
+import marshal
+import os
+import re
+import struct
+import sys
+import zipfile
+
+ZIP_NAME = "vien-packed.zip"
+PTH_NAME = "vien-packed.pth"
+MANIFEST_NAME = "vien-packed.json"
+
+# the installers and the things they need to find on disk
+ALWAYS_ON_DISK = {"pip", "setuptools", "wheel", "distribute"}
+
+NATIVE_SUFFIXES = (".so", ".pyd", ".dylib", ".dll")
+
+# the flags of an unchecked hash-based .pyc (PEP 552): the archive never
+# changes without repacking, so the source does not need to be checked
+_UNCHECKED_HASH = 0b01
+
+
+def normalize(name):
+    return re.sub(r"[-_.]+", "-", name).lower()
+
+
+def distributions(site):
+    """Yields (name, dist-info directory name, the files of the
+    distribution relative to site-packages)."""
+    for entry in sorted(os.listdir(site)):
+        if not entry.endswith(".dist-info"):
+            continue
+        record = os.path.join(site, entry, "RECORD")
+        try:
+            with open(record, newline="", encoding="utf-8") as f:
+                files = [row[0] for row in csv.reader(f) if row]
+        except OSError:
+            continue
+        name = normalize(entry[:-len(".dist-info")].split("-")[0])
+        yield name, entry, files
+
+
+def reason_to_keep(name, files, keep):
+    """Returns why the distribution must stay on disk, or None."""
+    if name in ALWAYS_ON_DISK:
+        return "installer"
+    if name in keep:
+        return "excluded"
+    if any(f.endswith(NATIVE_SUFFIXES) or ".libs/" in f for f in files):
+        return "native extensions"
+    if any(f.endswith(".pth") for f in files):
+        return "path configuration file"
+    py_files = set(f for f in files if f.endswith(".py"))
+    for f in py_files:
+        parts = f.split("/")[:-1]
+        for i in range(1, len(parts) + 1):
+            if "/".join(parts[:i] + ["__init__.py"]) not in py_files:
+                # the parts of a namespace package may be in other
+                # distributions on disk
+                return "namespace package"
+    return None
+
+
+def files_to_move(site, dist_info, files):
+    for f in files:
+        if f.startswith("..") or f.startswith(dist_info + "/") \
+                or "__pycache__/" in f or os.path.isabs(f):
+            continue
+        if os.path.isfile(os.path.join(site, f)):
+            yield f
+
+
+def pyc_bytes(source, archive_path):
+    code = compile(source, archive_path, "exec", dont_inherit=True)
+    return importlib.util.MAGIC_NUMBER \
+        + struct.pack("<I", _UNCHECKED_HASH) \
+        + importlib.util.source_hash(source) \
+        + marshal.dumps(code)
+
+
+def remove_empty_dirs(site, files):
+    dirs = set()
+    for f in files:
+        parent = os.path.dirname(f)
+        while parent:
+            dirs.add(parent)
+            parent = os.path.dirname(parent)
+    for d in sorted(dirs, key=len, reverse=True):
+        path = os.path.join(site, d)
+        cache = os.path.join(path, "__pycache__")
+        if os.path.isdir(cache):
+            for name in os.listdir(cache):
+                os.unlink(os.path.join(cache, name))
+            os.rmdir(cache)
+        try:
+            os.rmdir(path)
+        except OSError:
+            pass  # not empty
+
+
+def pack(site, keep):
+    zip_path = os.path.join(site, ZIP_NAME)
+    manifest = []
+    packed = []
+    kept = {}
+    temp = zip_path + ".vien-tmp"
+    with zipfile.ZipFile(temp, "w", zipfile.ZIP_STORED) as archive:
+        for name, dist_info, files in distributions(site):
+            reason = reason_to_keep(name, files, keep)
+            if reason is not None:
+                kept[name] = reason
+                continue
+            moved = list(files_to_move(site, dist_info, files))
+            for f in moved:
+                path = os.path.join(site, f)
+                st = os.stat(path)
+                with open(path, "rb") as src:
+                    data = src.read()
+                archive.write(path, f)
+                if f.endswith(".py"):
+                    try:
+                        archive.writestr(
+                            f[:-3] + ".pyc",
+                            pyc_bytes(data, os.path.join(zip_path, f)))
+                    except (SyntaxError, ValueError):
+                        pass  # zipimport will report it, as Python would
+                manifest.append({"path": f, "dist": dist_info,
+                                 "mode": st.st_mode & 0o7777,
+                                 "mtime": st.st_mtime})
+            packed.append(name)
+    if not manifest:
+        os.unlink(temp)
+        return {"packed": [], "kept": kept, "files": 0}
+
+    os.replace(temp, zip_path)
+    with open(os.path.join(site, MANIFEST_NAME), "w") as f:
+        json.dump({"files": manifest, "packed": packed}, f)
+    with open(os.path.join(site, PTH_NAME), "w") as f:
+        # the zip goes to sys.path after the site-packages, so the
+        # packages installed later (on disk) take precedence. The path is
+        # relative to the site-packages, so the environment may be moved
+        f.write(ZIP_NAME + "\n")
+    # only now, when the archive is complete, the files can be removed
+    for item in manifest:
+        os.unlink(os.path.join(site, item["path"]))
+    remove_empty_dirs(site, [item["path"] for item in manifest])
+    return {"packed": packed, "kept": kept, "files": len(manifest)}
+
+
+def unpack(site):
+    manifest_path = os.path.join(site, MANIFEST_NAME)
+    zip_path = os.path.join(site, ZIP_NAME)
+    try:
+        with open(manifest_path) as f:
+            manifest = json.load(f)
+    except FileNotFoundError:
+        return {"unpacked": [], "files": 0}
+    pth = os.path.join(site, PTH_NAME)
+    if os.path.exists(pth):
+        # first of all, so a half-unpacked environment does not use
+        # the archive
+        os.unlink(pth)
+    with zipfile.ZipFile(zip_path) as archive:
+        for item in manifest["files"]:
+            path = os.path.join(site, item["path"])
+            if os.path.exists(path) or not os.path.isdir(
+                    os.path.join(site, item["dist"])):
+                # the distribution was upgraded or removed since packing:
+                # the files on disk are newer than the archived ones
+                continue
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            temp = path + ".vien-tmp"
+            with archive.open(item["path"]) as src, open(temp, "wb") as dst:
+                dst.write(src.read())
+            os.chmod(temp, item["mode"])
+            os.utime(temp, (item["mtime"], item["mtime"]))
+            os.replace(temp, path)
+    os.unlink(manifest_path)
+    os.unlink(zip_path)
+    return {"unpacked": manifest["packed"], "files": len(manifest["files"])}
+
+
+def main():
+    command, site = sys.argv[1], sys.argv[2]
+    if command == "pack":
+        unpack(site)
+        result = pack(site, set(normalize(n) for n in json.loads(sys.argv[3])))
+    elif command == "unpack":
+        result = unpack(site)
+    else:
+        raise ValueError(command)
+    print(json.dumps(result))
+
+
+if __name__ == "__main__":
+    main()
@@ -62,6 +62,27 @@ class Commands(Enum):
     run = "run"
     call = "call"
     path = "path"
+    stats = "stats"
+    shebang = "shebang"
+    expose = "expose"
+    completion = "completion"
+    compile = "compile"
+    config = "config"
+    cache = "cache"
+    pack = "pack"
+    unpack = "unpack"
+    warm = "warm"
+    tier = "tier"
+    snapshot = "snapshot"
+    rollback = "rollback"
+    upgrade_python = "upgrade-python"
+    install_wheels = "install-wheels"
+    prebuild = "prebuild"
+    key = "key"
+    save = "save"
+    restore = "restore"
+    verify = "verify"
+    fingerprint = "fingerprint"
 
 
 class TempColumns:
@@ -95,6 +116,7 @@ class ParsedArgs:
         with TempColumns(80):
 
             self._call: Optional[ParsedCall] = None
+            self._call_watch = False
 
             if args is None:
                 args = sys.argv[1:]
@@ -130,6 +152,10 @@ class ParsedArgs:
                 help="create new virtual environment")
             parser_init.add_argument('python', type=str, default=None,
                                      nargs='?')
+            parser_init.add_argument(
+                "--base", default=None, metavar="NAME",
+                help="inherit the packages of the environment of the "
+                     "project NAME (or of the environment at the path)")
 
             subparsers.add_parser(Commands.delete.name,
                                   help="delete existing environment")
@@ -139,6 +165,10 @@ class ParsedArgs:
                 help="delete existing environment and create new")
             parser_reinit.add_argument('python', type=str, default=None,
                                        nargs='?')
+            parser_reinit.add_argument(
+                "--base", default=None, metavar="NAME",
+                help="inherit the packages of the environment of the "
+                     "project NAME (or of the environment at the path)")
 
             if is_posix or enable_windows_all_args:
                 shell_parser = subparsers.add_parser(
@@ -152,6 +182,18 @@ class ParsedArgs:
                 parser_run = subparsers.add_parser(
                     Commands.run.name,
                     help="run a shell command in the environment")
+                parser_run.add_argument(
+                    "--ephemeral", action='store_true',
+                    help="run in a new environment in /dev/shm, that is "
+                         "removed after the command")
+                parser_run.add_argument(
+                    "--python", default=None, dest="run_python",
+                    help="the interpreter of the --ephemeral environment")
+                parser_run.add_argument(
+                    "--with", action='append', default=[], dest="run_with",
+                    metavar="PKG",
+                    help="add the package for this run, leaving the "
+                         "environment unchanged (may be repeated)")
                 parser_run.add_argument('otherargs', nargs=argparse.REMAINDER)
 
             parser_call = subparsers.add_parser(
@@ -162,6 +204,11 @@ class ParsedArgs:
                                      type=str,
                                      dest="outdated_call_project_dir",
                                      help=argparse.SUPPRESS)
+            # like the args_to_python, this one is for help only: we find
+            # it in the args ourselves
+            parser_call.add_argument("--watch", action='store_true',
+                                     help="run again each time the project "
+                                          "files change (Linux only)")
             # this arg is for help only. Actually it's buggy (at least in 3.7),
             # so we will never use its result, and get those args other way
             parser_call.add_argument('args_to_python', nargs=argparse.REMAINDER)
@@ -171,6 +218,230 @@ class ParsedArgs:
                 help="show the path of the environment "
                      "for the project")
 
+            subparsers.add_parser(
+                Commands.stats.name,
+                help="show latency and failure statistics of the commands "
+                     "recorded with VIEN_HISTORY=1")
+
+            if is_posix:
+                parser_shebang = subparsers.add_parser(
+                    Commands.shebang.name,
+                    help="create launchers that run .py files in the "
+                         "environment without starting vien")
+                shebang_subparsers = parser_shebang.add_subparsers(
+                    dest='shebang_command', required=True)
+                parser_install = shebang_subparsers.add_parser(
+                    "install",
+                    help="create a launcher for a .py file")
+                parser_install.add_argument("file", type=str)
+                parser_install.add_argument(
+                    "-o", "--output", type=str, default=None,
+                    help="the launcher file (default: the .py file "
+                         "name without the extension)")
+                parser_check = shebang_subparsers.add_parser(
+                    "check",
+                    help="find launchers that need to be installed again")
+                parser_check.add_argument(
+                    "launchers", type=str, nargs='*',
+                    help="the launcher files (default: all launchers "
+                         "in the project directory)")
+
+            if is_posix:
+                parser_expose = subparsers.add_parser(
+                    Commands.expose.name,
+                    help="make console scripts of the environment "
+                         "runnable from $VIENDIR/bin")
+                parser_expose.add_argument(
+                    "scripts", type=str, nargs='*',
+                    help="the script names (default: all the scripts "
+                         "installed into the environment)")
+                parser_expose.add_argument(
+                    "--remove", action='store_true',
+                    help="remove the shims instead of creating them")
+                parser_expose.add_argument(
+                    "--force", action='store_true',
+                    help="replace the shims of other environments")
+
+            parser_compile = subparsers.add_parser(
+                Commands.compile.name,
+                help="byte-compile the environment and the project")
+            parser_compile.add_argument(
+                "-O", "--optimize", type=int, choices=[0, 1, 2],
+                action='append', default=None,
+                help="optimization level, like for 'python -O'. "
+                     "Can be repeated (default: 0)")
+            parser_compile.add_argument(
+                "--invalidation-mode",
+                choices=["timestamp", "checked-hash", "unchecked-hash"],
+                default="timestamp",
+                help="how Python decides that a .pyc is outdated")
+            parser_compile.add_argument(
+                "-j", "--jobs", type=int, default=0,
+                help="the number of processes (default: the number of "
+                     "CPUs)")
+            parser_compile.add_argument(
+                "--only", choices=["venv", "project"], default=None,
+                help="compile only the environment or only the project")
+
+            parser_config = subparsers.add_parser(
+                Commands.config.name,
+                help="show or change the settings of the project")
+            parser_config.add_argument("key", nargs='?', default=None)
+            parser_config.add_argument("value", nargs='?', default=None)
+            parser_config.add_argument("--unset", action='store_true',
+                                       help="remove the setting")
+
+            parser_cache = subparsers.add_parser(
+                Commands.cache.name,
+                help="manage the bytecode cache of the project")
+            parser_cache.add_argument("cache_command", choices=["clear"])
+            parser_cache.add_argument(
+                "--all", action='store_true', dest="cache_all",
+                help="clear the caches of all the projects")
+
+            parser_pack = subparsers.add_parser(
+                Commands.pack.name,
+                help="move the pure-Python packages of the environment "
+                     "into a zip archive")
+            parser_pack.add_argument(
+                "--exclude", nargs='+', default=[], metavar="NAME",
+                help="the distributions to leave on disk")
+
+            subparsers.add_parser(
+                Commands.unpack.name,
+                help="move the packed packages back to the disk")
+
+            parser_warm = subparsers.add_parser(
+                Commands.warm.name,
+                help="load the files of the environment into the page "
+                     "cache")
+            parser_warm.add_argument(
+                "--files", default=None, metavar="LIST",
+                help="warm only the files listed in this file (one path "
+                     "per line)")
+            parser_warm.add_argument(
+                "-j", "--jobs", type=int, default=0,
+                help="the number of threads")
+
+            parser_tier = subparsers.add_parser(
+                Commands.tier.name,
+                help="show or change where the environment is stored "
+                     "($VIEN_FAST_DIR or $VIENDIR)")
+            parser_tier.add_argument(
+                "tier_command", nargs='?', default="status",
+                choices=["status", "promote", "demote", "sweep"])
+
+            parser_snapshot = subparsers.add_parser(
+                Commands.snapshot.name,
+                help="save the state of the environment to restore it with "
+                     "'rollback'")
+            parser_snapshot.add_argument(
+                "snapshot_name", nargs='?', default=None, metavar="NAME",
+                help="by default, the current date and time")
+            parser_snapshot.add_argument(
+                "--list", action='store_true', dest="snapshot_list",
+                help="list the snapshots instead")
+
+            parser_rollback = subparsers.add_parser(
+                Commands.rollback.name,
+                help="restore the environment from a snapshot")
+            parser_rollback.add_argument(
+                "snapshot_name", nargs='?', default=None, metavar="NAME",
+                help="by default, the most recent snapshot")
+
+            parser_upgrade = subparsers.add_parser(
+                Commands.upgrade_python.value,
+                help="move the environment to another interpreter, keeping "
+                     "the installed packages")
+            parser_upgrade.add_argument("upgrade_python", metavar="python")
+            parser_upgrade.add_argument(
+                "--find-links", default=None, metavar="DIR",
+                help="the wheels for the packages that are installed "
+                     "again (by default, $VIENDIR/wheels)")
+
+            parser_wheels = subparsers.add_parser(
+                Commands.install_wheels.value,
+                help="install downloaded wheels without pip (no dependency "
+                     "resolution)")
+            parser_wheels.add_argument(
+                "wheels", nargs='+', metavar="WHEEL",
+                help="a .whl file or a directory with .whl files")
+            parser_wheels.add_argument(
+                "-j", "--jobs", type=int, default=0,
+                help="the number of threads")
+            parser_wheels.add_argument(
+                "--no-compile", action='store_false', dest="wheels_compile",
+                help="do not byte-compile the installed modules")
+
+            parser_prebuild = subparsers.add_parser(
+                Commands.prebuild.name,
+                help="build the wheels of the local sdists into "
+                     "$VIENDIR/wheels")
+            parser_prebuild.add_argument(
+                "--sources", required=True, metavar="DIR",
+                help="the directory with the sdists")
+            parser_prebuild.add_argument(
+                "-r", "--requirement", action='append', default=[],
+                dest="prebuild_requirements", metavar="FILE",
+                help="build only the sdists of these requirements "
+                     "(by default, all of them)")
+            parser_prebuild.add_argument(
+                "-j", "--jobs", type=int, default=0,
+                help="the number of concurrent builds")
+
+            parser_key = subparsers.add_parser(
+                Commands.key.name,
+                help="print the key of the environment for CI caches: a "
+                     "hash of the interpreter and the dependency files")
+            parser_save = subparsers.add_parser(
+                Commands.save.name,
+                help="archive the environment into a cache directory, "
+                     "by its key")
+            parser_restore = subparsers.add_parser(
+                Commands.restore.name,
+                help="unpack the environment archived by 'save' with the "
+                     "same key")
+            for p in (parser_save, parser_restore):
+                p.add_argument(
+                    "--cache-dir", required=True, metavar="DIR",
+                    dest="archive_cache_dir",
+                    help="the directory with the archives")
+                p.add_argument(
+                    "-j", "--jobs", type=int, default=0,
+                    help="the number of threads")
+            for p in (parser_key, parser_restore):
+                p.add_argument(
+                    "--python", default=None, dest="archive_python",
+                    help="the interpreter the environment is created with "
+                         "(default: the one of the environment, if it "
+                         "exists, or the current one)")
+            for p in (parser_key, parser_save, parser_restore):
+                p.add_argument(
+                    "-f", "--file", action='append', default=None,
+                    dest="archive_files", metavar="FILE",
+                    help="a dependency file (default: the requirements "
+                         "files, pyproject.toml, setup.py and the like "
+                         "found in the project directory)")
+
+            parser_verify = subparsers.add_parser(
+                Commands.verify.name,
+                help="check the installed files against the hashes of "
+                     "their RECORD")
+            parser_fingerprint = subparsers.add_parser(
+                Commands.fingerprint.name,
+                help="print a hash of the contents of the environment")
+            for p in (parser_verify, parser_fingerprint):
+                p.add_argument(
+                    "-j", "--jobs", type=int, default=0,
+                    help="the number of threads")
+
+            parser_completion = subparsers.add_parser(
+                Commands.completion.name,
+                help="print the bash completion script, or update the "
+                     "data it uses")
+            parser_completion.add_argument(
+                "completion_command", choices=["bash", "update"])
+
             if not args:
                 print(usage_doc())
                 parser.print_help()
@@ -209,6 +480,10 @@ class ParsedArgs:
 
                 # todo Remove later. [call -p] is outdated since 2021-05
                 self.args_to_python = _remove_leading_p(self.args_to_python)
+                self._call_watch = bool(self.args_to_python) \
+                                   and self.args_to_python[0] == "--watch"
+                if self._call_watch:
+                    self.args_to_python = self.args_to_python[1:]
                 self._call = ParsedCall(args)
             else:
                 # if some args were not recognized, parsing everything stricter
@@ -228,6 +503,12 @@ class ParsedArgs:
         assert self._call is not None
         return self._call
 
+    @property
+    def call_watch(self) -> bool:
+        if self.command != Commands.call:
+            raise RuntimeError("The current command is not 'call'")
+        return self._call_watch
+
     @property
     def project_dir_arg(self) -> Optional[str]:
         """Returns either outdated [call -p ARG] or normal [vien -p ARG]
@@ -247,6 +528,12 @@ class ParsedArgs:
         # assert self._ns.python is not None
         return self._ns.python
 
+    @property
+    def base(self) -> Optional[str]:
+        if self.command not in (Commands.create, Commands.recreate):
+            raise RuntimeError
+        return self._ns.base
+
     @property
     def shell_input(self) -> Optional[str]:
         if self.command != Commands.shell:
@@ -259,8 +546,243 @@ class ParsedArgs:
             raise RuntimeError
         return self._ns.delay
 
+    @property
+    def shebang_command(self) -> str:
+        if self.command != Commands.shebang:
+            raise RuntimeError
+        return self._ns.shebang_command
+
+    @property
+    def shebang_file(self) -> str:
+        if self.command != Commands.shebang:
+            raise RuntimeError
+        return self._ns.file
+
+    @property
+    def shebang_output(self) -> Optional[str]:
+        if self.command != Commands.shebang:
+            raise RuntimeError
+        return self._ns.output
+
+    @property
+    def shebang_launchers(self) -> List[str]:
+        if self.command != Commands.shebang:
+            raise RuntimeError
+        return self._ns.launchers
+
+    @property
+    def expose_scripts(self) -> List[str]:
+        if self.command != Commands.expose:
+            raise RuntimeError
+        return self._ns.scripts
+
+    @property
+    def expose_remove(self) -> bool:
+        if self.command != Commands.expose:
+            raise RuntimeError
+        return self._ns.remove
+
+    @property
+    def expose_force(self) -> bool:
+        if self.command != Commands.expose:
+            raise RuntimeError
+        return self._ns.force
+
+    @property
+    def completion_command(self) -> str:
+        if self.command != Commands.completion:
+            raise RuntimeError
+        return self._ns.completion_command
+
+    @property
+    def compile_optimize(self) -> List[int]:
+        if self.command != Commands.compile:
+            raise RuntimeError
+        return self._ns.optimize or [0]
+
+    @property
+    def compile_invalidation_mode(self) -> str:
+        if self.command != Commands.compile:
+            raise RuntimeError
+        return self._ns.invalidation_mode
+
+    @property
+    def compile_jobs(self) -> int:
+        if self.command != Commands.compile:
+            raise RuntimeError
+        return self._ns.jobs
+
+    @property
+    def compile_only(self) -> Optional[str]:
+        if self.command != Commands.compile:
+            raise RuntimeError
+        return self._ns.only
+
+    @property
+    def config_key(self) -> Optional[str]:
+        if self.command != Commands.config:
+            raise RuntimeError
+        return self._ns.key
+
+    @property
+    def config_value(self) -> Optional[str]:
+        if self.command != Commands.config:
+            raise RuntimeError
+        return self._ns.value
+
+    @property
+    def config_unset(self) -> bool:
+        if self.command != Commands.config:
+            raise RuntimeError
+        return self._ns.unset
+
+    @property
+    def cache_command(self) -> str:
+        if self.command != Commands.cache:
+            raise RuntimeError
+        return self._ns.cache_command
+
+    @property
+    def cache_all(self) -> bool:
+        if self.command != Commands.cache:
+            raise RuntimeError
+        return self._ns.cache_all
+
+    @property
+    def pack_exclude(self) -> List[str]:
+        if self.command != Commands.pack:
+            raise RuntimeError
+        return self._ns.exclude
+
+    @property
+    def warm_files(self) -> Optional[str]:
+        if self.command != Commands.warm:
+            raise RuntimeError
+        return self._ns.files
+
+    @property
+    def warm_jobs(self) -> int:
+        if self.command != Commands.warm:
+            raise RuntimeError
+        return self._ns.jobs
+
+    @property
+    def tier_command(self) -> str:
+        if self.command != Commands.tier:
+            raise RuntimeError
+        return self._ns.tier_command
+
+    @property
+    def snapshot_name(self) -> Optional[str]:
+        if self.command not in (Commands.snapshot, Commands.rollback):
+            raise RuntimeError
+        return self._ns.snapshot_name
+
+    @property
+    def upgrade_python(self) -> str:
+        if self.command != Commands.upgrade_python:
+            raise RuntimeError
+        return self._ns.upgrade_python
+
+    @property
+    def upgrade_find_links(self) -> Optional[str]:
+        if self.command != Commands.upgrade_python:
+            raise RuntimeError
+        return self._ns.find_links
+
+    @property
+    def wheels(self) -> List[str]:
+        if self.command != Commands.install_wheels:
+            raise RuntimeError
+        return self._ns.wheels
+
+    @property
+    def wheels_jobs(self) -> int:
+        if self.command != Commands.install_wheels:
+            raise RuntimeError
+        return self._ns.jobs
+
+    @property
+    def wheels_compile(self) -> bool:
+        if self.command != Commands.install_wheels:
+            raise RuntimeError
+        return self._ns.wheels_compile
+
+    @property
+    def prebuild_sources(self) -> str:
+        if self.command != Commands.prebuild:
+            raise RuntimeError
+        return self._ns.sources
+
+    @property
+    def prebuild_requirements(self) -> List[str]:
+        if self.command != Commands.prebuild:
+            raise RuntimeError
+        return self._ns.prebuild_requirements
+
+    @property
+    def prebuild_jobs(self) -> int:
+        if self.command != Commands.prebuild:
+            raise RuntimeError
+        return self._ns.jobs
+
+    @property
+    def archive_cache_dir(self) -> str:
+        if self.command not in (Commands.save, Commands.restore):
+            raise RuntimeError
+        return self._ns.archive_cache_dir
+
+    @property
+    def archive_python(self) -> Optional[str]:
+        if self.command not in (Commands.key, Commands.restore):
+            raise RuntimeError
+        return self._ns.archive_python
+
+    @property
+    def archive_files(self) -> Optional[List[str]]:
+        if self.command not in (Commands.key, Commands.save,
+                                Commands.restore):
+            raise RuntimeError
+        return self._ns.archive_files
+
+    @property
+    def archive_jobs(self) -> int:
+        if self.command not in (Commands.save, Commands.restore):
+            raise RuntimeError
+        return self._ns.jobs
+
+    @property
+    def integrity_jobs(self) -> int:
+        if self.command not in (Commands.verify, Commands.fingerprint):
+            raise RuntimeError
+        return self._ns.jobs
+
+    @property
+    def snapshot_list(self) -> bool:
+        if self.command != Commands.snapshot:
+            raise RuntimeError
+        return self._ns.snapshot_list
+
     @property
     def run_args(self) -> List[str]:
         if self.command != Commands.run:
             raise RuntimeError
         return self._ns.otherargs
+
+    @property
+    def run_ephemeral(self) -> bool:
+        if self.command != Commands.run:
+            raise RuntimeError
+        return self._ns.ephemeral
+
+    @property
+    def run_python(self) -> Optional[str]:
+        if self.command != Commands.run:
+            raise RuntimeError
+        return self._ns.run_python
+
+    @property
+    def run_with(self) -> List[str]:
+        if self.command != Commands.run:
+            raise RuntimeError
+        return self._ns.run_with
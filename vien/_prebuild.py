@@ -0,0 +1,215 @@
+# SPDX-FileCopyrightText: (c) 2022 Artëm IG <github.com/rtmigo>
+# SPDX-License-Identifier: BSD-3-Clause
+
+"""Building the wheels of the source distributions for `vien prebuild`.
+
+The sdists of a local directory are built concurrently, each by its own
+`pip wheel` process, in an isolated build environment, with the
+interpreter of the project environment. The wheels are kept in
+`$VIENDIR/wheels`. Their file names contain the name, the version and
+the interpreter and ABI tags, so a wheel built once is found by any later
+build for the same interpreter, and is not built again.
+
+Pip gets the directory in `PIP_FIND_LINKS` when it runs in a vien
+environment, and prefers a built wheel to the sdist of the same version.
+So the next `vien run pip install -r requirements.txt` in a new
+environment installs the wheels instead of building them. Pip splits the
+variable by whitespace, so a directory with spaces in the path is not
+added there.
+"""
+
+from __future__ import annotations
+
+import os
+import re
+import shutil
+import subprocess
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+from vien._core import venv_dir_to_python_exe
+
+_SDIST_SUFFIXES = (".tar.gz", ".zip", ".tar.bz2", ".tgz")
+
+# the ABI tag is like cp311, or cp313t for a free-threaded build, or
+# cp311d for a debug one
+_TAGS_SCRIPT = ("import sys, sysconfig; "
+                "soabi = sysconfig.get_config_var('SOABI') or ''; "
+                "abi = 'cp' + soabi.split('-')[1] "
+                "if soabi.startswith('cpython-') "
+                "else 'cp%d%d' % sys.version_info[:2] "
+                "+ getattr(sys, 'abiflags', ''); "
+                "print('cp%d%d' % sys.version_info[:2], abi, "
+                "sys.version_info[0], "
+                "sysconfig.get_platform().replace('-', '_')"
+                ".replace('.', '_'))")
+
+
+class PrebuildError(Exception):
+    pass
+
+
+class Sdist(NamedTuple):
+    name: str  # normalized
+    version: str
+    path: Path
+
+
+class PrebuildResult(NamedTuple):
+    built: List[str]
+    cached: List[str]
+    failed: List[Tuple[str, str]]  # the sdist and the error
+
+
+def normalize(name: str) -> str:
+    return re.sub(r"[-_.]+", "-", name).lower()
+
+
+def _version_key(version: str):
+    # good enough for choosing the newest of the local sdists
+    return [(0, int(p)) if p.isdigit() else (-1, p)
+            for p in re.split(r"[.+-]", version)]
+
+
+def find_sdists(sources: Path) -> Dict[str, List[Sdist]]:
+    """Returns the sdists of the directory by the normalized names, the
+    newest first."""
+    result: Dict[str, List[Sdist]] = {}
+    for path in sorted(sources.iterdir()):
+        suffix = next((s for s in _SDIST_SUFFIXES
+                       if path.name.endswith(s)), None)
+        if suffix is None or "-" not in path.name:
+            continue
+        name, version = path.name[:-len(suffix)].rsplit("-", 1)
+        result.setdefault(normalize(name), []).append(
+            Sdist(normalize(name), version, path))
+    for sdists in result.values():
+        sdists.sort(key=lambda s: _version_key(s.version), reverse=True)
+    return result
+
+
+def parse_requirements(text: str) -> List[Tuple[str, Optional[str]]]:
+    """Returns the names and the pinned versions (or None) of the
+    requirements. The options, URLs and markers are ignored."""
+    result = []
+    for line in text.splitlines():
+        line = line.split("#", 1)[0].split(";", 1)[0].strip()
+        if not line or line.startswith("-") or "://" in line:
+            continue
+        match = re.match(r"([A-Za-z0-9][A-Za-z0-9._-]*)\s*(\[[^\]]*\])?"
+                         r"\s*(==\s*([^\s,]+))?", line)
+        if match is None:
+            continue
+        result.append((normalize(match.group(1)), match.group(4)))
+    return result
+
+
+def select(sdists: Dict[str, List[Sdist]],
+           requirements: Optional[Sequence[Tuple[str, Optional[str]]]]
+           ) -> List[Sdist]:
+    """Returns the sdists to build: the pinned versions of the required
+    distributions, or the newest ones. Without the requirements, the
+    newest version of each sdist."""
+    if requirements is None:
+        return [versions[0] for _, versions in sorted(sdists.items())]
+    result = []
+    for name, pinned in requirements:
+        candidates = [s for s in sdists.get(name, [])
+                      if pinned is None or s.version == pinned]
+        if candidates:
+            result.append(candidates[0])
+    return result
+
+
+def interpreter_tags(venv_dir: Path) -> Tuple[str, str, str, str]:
+    """Returns the tags of the interpreter: like cp311, cp311 (the ABI),
+    3 and linux_x86_64."""
+    output = subprocess.check_output(
+        [str(venv_dir_to_python_exe(venv_dir)), "-c", _TAGS_SCRIPT],
+        universal_newlines=True)
+    implementation, abi, major, platform = output.split()
+    return implementation, abi, major, platform
+
+
+def cached_wheel(wheels_dir: Path, sdist: Sdist,
+                 tags: Tuple[str, str, str, str]) -> Optional[Path]:
+    """Returns the wheel built before for the interpreter, if any."""
+    implementation, abi, major, platform = tags
+    # the stable ABI is not available in the free-threaded builds
+    abis = ("none", abi) if abi.endswith("t") else ("none", "abi3", abi)
+    if not wheels_dir.is_dir():
+        return None
+    for wheel in wheels_dir.glob("*.whl"):
+        parts = wheel.name[:-len(".whl")].split("-")
+        if len(parts) < 5 or normalize(parts[0]) != sdist.name \
+                or parts[1] != sdist.version:
+            continue
+        python, platforms = parts[-3].split("."), parts[-1].split(".")
+        if any(p in (implementation, "py" + major, "py" + major + "0")
+               for p in python) \
+                and any(p in abis for p in parts[-2].split(".")) \
+                and any(p in ("any", platform) for p in platforms):
+            return wheel
+    return None
+
+
+def build(venv_dir: Path, sdist: Sdist, wheels_dir: Path,
+          find_links: Sequence[Path] = ()) -> Path:
+    """Builds the wheel with `pip wheel` and moves it to the
+    `wheels_dir`."""
+    wheels_dir.mkdir(parents=True, exist_ok=True)
+    temp = Path(tempfile.mkdtemp(prefix=".vien-build-", dir=str(wheels_dir)))
+    try:
+        args = [str(venv_dir_to_python_exe(venv_dir)), "-m", "pip", "wheel",
+                "--no-deps", "--disable-pip-version-check", "--quiet",
+                "--wheel-dir", str(temp)]
+        for d in find_links:
+            args += ["--find-links", str(d)]
+        result = subprocess.run(args + [str(sdist.path)],
+                                stdout=subprocess.PIPE,
+                                stderr=subprocess.STDOUT)
+        if result.returncode != 0:
+            raise PrebuildError(
+                result.stdout.decode(errors="replace").strip())
+        built = list(temp.glob("*.whl"))
+        if len(built) != 1:
+            raise PrebuildError(f"pip built {len(built)} wheels")
+        target = wheels_dir / built[0].name
+        # a concurrent build of the same wheel is not a problem
+        os.replace(str(built[0]), str(target))
+        return target
+    finally:
+        shutil.rmtree(str(temp), ignore_errors=True)
+
+
+def prebuild(venv_dir: Path, sources: Path, wheels_dir: Path,
+             requirements: Optional[Sequence[Tuple[str, Optional[str]]]],
+             jobs: int = 0) -> PrebuildResult:
+    """Builds the wheels of the sdists not built before, concurrently."""
+    if not sources.is_dir():
+        raise PrebuildError(f"{sources} is not a directory.")
+    tags = interpreter_tags(venv_dir)
+    to_build, cached = [], []
+    for sdist in select(find_sdists(sources), requirements):
+        if cached_wheel(wheels_dir, sdist, tags) is not None:
+            cached.append(sdist.path.name)
+        else:
+            to_build.append(sdist)
+    built, failed = [], []
+
+    def build_one(sdist: Sdist) -> None:
+        try:
+            # the build dependencies may be in the sources too
+            built.append(build(venv_dir, sdist, wheels_dir,
+                               [sources, wheels_dir]).name)
+        except PrebuildError as e:
+            failed.append((sdist.path.name, str(e)))
+
+    # each build is a separate pip process, so the threads only wait
+    workers = jobs if jobs > 0 else (os.cpu_count() or 1)
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        list(pool.map(build_one, to_build))
+    return PrebuildResult(built=sorted(built), cached=cached,
+                          failed=sorted(failed))
@@ -0,0 +1,216 @@
+# SPDX-FileCopyrightText: (c) 2022 Artëm IG <github.com/rtmigo>
+# SPDX-License-Identifier: BSD-3-Clause
+
+"""Keeping the bytecode of a project out of the project tree.
+
+With the `pycache` setting, the children get `PYTHONPYCACHEPREFIX`
+(Python 3.8+) pointing to a directory managed by vien: in the temp dir,
+in `/dev/shm` or in a chosen directory. So the .pyc files are never read
+or written on the filesystem of the project, that may be slow or
+read-only.
+
+The cache is trimmed to `$VIEN_PYCACHE_MAX_BYTES` (oldest files first), at
+most once per `TRIM_INTERVAL` seconds.
+
+A base directory holds the caches of many projects. vien marks the bases it
+uses, and does not take a directory that has other files: clearing the
+caches removes only the `<project>_venv-<digest>` directories in it.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import os
+import re
+import shutil
+import stat
+import tempfile
+import time
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+from vien import _settings
+
+MAX_BYTES_ENV = "VIEN_PYCACHE_MAX_BYTES"
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+
+TRIM_INTERVAL = 3600
+
+_TRIMMED_MARKER = ".vien-trimmed"
+
+# written to the base directories used by vien
+_BASE_MARKER = ".vien-pycache"
+
+_CACHE_NAME = re.compile(r".+_venv-[0-9a-f]{8}")
+
+
+def _user() -> str:
+    return str(os.getuid()) if hasattr(os, "getuid") else "user"
+
+
+def base_dir(setting: str) -> Optional[Path]:
+    """Returns the directory containing the caches of all the projects,
+    or None if the caches are not used."""
+    if setting == "off":
+        return None
+    if setting == "local":
+        return Path(tempfile.gettempdir()) / f"vien-pycache-{_user()}"
+    if setting == "shm":
+        return Path("/dev/shm") / f"vien-pycache-{_user()}"
+    path = Path(os.path.expanduser(setting))
+    if not path.is_absolute():
+        raise ValueError(f"Not an absolute path: {setting}")
+    return path
+
+
+def cache_dir(venv_dir: Path, setting: Optional[str] = None) -> Optional[Path]:
+    """Returns the PYTHONPYCACHEPREFIX for the children, or None if the
+    project does not use it."""
+    if setting is None:
+        setting = _settings.get(venv_dir, "pycache")
+        if setting is None:
+            return None
+    base = base_dir(setting)
+    if base is None:
+        return None
+    # there may be many VIENDIRs with the same project names
+    digest = hashlib.sha1(str(venv_dir).encode()).hexdigest()[:8]
+    return base / f"{venv_dir.name}-{digest}"
+
+
+def _is_cache(entry: os.DirEntry) -> bool:
+    return bool(_CACHE_NAME.fullmatch(entry.name)) \
+        and entry.is_dir(follow_symlinks=False)
+
+
+def _prepare_private(directory: Path) -> None:
+    """Creates the directory. Raises PermissionError if it could be
+    written by someone else."""
+    # /tmp and /dev/shm are shared with other users: someone could create
+    # the directory before us and put their own files there
+    directory.mkdir(mode=0o700, parents=True, exist_ok=True)
+    st = os.lstat(str(directory))
+    if hasattr(os, "getuid") and (st.st_uid != os.getuid()
+                                  or not stat.S_ISDIR(st.st_mode)
+                                  or st.st_mode & 0o022):
+        raise PermissionError(f"{directory} is not a private directory of "
+                              f"the current user.")
+
+
+def prepare_base(base: Path) -> None:
+    """Creates the base directory of the caches. Raises PermissionError if
+    it could be written by someone else, or if it has files not created
+    by vien."""
+    _prepare_private(base)
+    marker = base / _BASE_MARKER
+    if marker.exists():
+        return
+    with os.scandir(str(base)) as entries:
+        if not all(_is_cache(entry) for entry in entries):
+            raise PermissionError(f"{base} is not empty and was not "
+                                  f"created by vien.")
+    marker.touch()
+
+
+def check_setting(setting: str) -> None:
+    """Raises ValueError or OSError if the setting cannot be used: the
+    path is not absolute, there is no /dev/shm, the directory is the home
+    directory, or it is not private, or has other files."""
+    base = base_dir(setting)
+    if base is None:
+        return
+    if setting == "shm" and not base.parent.is_dir():
+        raise ValueError(f"There is no {base.parent} on this system.")
+    if base.resolve() in (Path.home().resolve(), Path(base.anchor)):
+        raise ValueError(f"{base} is not a directory for the cache only.")
+    prepare_base(base)
+
+
+def prepare(directory: Path) -> None:
+    """Creates the directory. Raises PermissionError if the parent
+    directory could be written by someone else."""
+    _prepare_private(directory.parent)
+    directory.mkdir(mode=0o700, exist_ok=True)
+
+
+def child_prefix(venv_dir: Path) -> Optional[str]:
+    """Returns the value of PYTHONPYCACHEPREFIX for the children, creating
+    the directory if needed."""
+    directory = cache_dir(venv_dir)
+    if directory is None:
+        return None
+    prepare_base(directory.parent)
+    directory.mkdir(mode=0o700, exist_ok=True)
+    return str(directory)
+
+
+def max_bytes() -> int:
+    try:
+        return int(os.environ[MAX_BYTES_ENV])
+    except (KeyError, ValueError):
+        return DEFAULT_MAX_BYTES
+
+
+def _files(directory: Path) -> List[Tuple[float, int, str]]:
+    result = []
+    for root, _, names in os.walk(str(directory)):
+        for name in names:
+            path = os.path.join(root, name)
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue
+            result.append((st.st_mtime, st.st_size, path))
+    return result
+
+
+def trim(directory: Path, limit: int) -> int:
+    """Removes the oldest files until the total size is within the limit.
+    Returns the number of removed bytes."""
+    files = _files(directory)
+    excess = sum(size for _, size, _ in files) - limit
+    removed = 0
+    for _, size, path in sorted(files):
+        if removed >= excess:
+            break
+        try:
+            os.unlink(path)
+            removed += size
+        except OSError:
+            pass
+    return removed
+
+
+def trim_if_due(directory: Path) -> None:
+    marker = directory / _TRIMMED_MARKER
+    try:
+        if time.time() - os.stat(str(marker)).st_mtime < TRIM_INTERVAL:
+            return
+    except FileNotFoundError:
+        pass
+    if not directory.exists():
+        return
+    marker.touch()
+    trim(directory, max_bytes())
+
+
+def clear(directory: Path) -> bool:
+    """Removes the cache. Returns False if there was no cache."""
+    if not directory.exists():
+        return False
+    shutil.rmtree(str(directory))
+    return True
+
+
+def clear_all(base: Path) -> List[Path]:
+    """Removes the caches of all the projects from the base directory used
+    by vien, but not the base directory itself and nothing else in it.
+    Returns the removed caches."""
+    if not (base / _BASE_MARKER).exists():
+        return []
+    with os.scandir(str(base)) as entries:
+        caches = sorted(Path(entry.path) for entry in entries
+                        if _is_cache(entry))
+    for cache in caches:
+        shutil.rmtree(str(cache))
+    return caches
@@ -0,0 +1,70 @@
+# SPDX-FileCopyrightText: (c) 2022 Artëm IG <github.com/rtmigo>
+# SPDX-License-Identifier: BSD-3-Clause
+
+"""Per-project settings, changed by `vien config`.
+
+The settings of `$VIENDIR/<project>_venv` are stored in
+`$VIENDIR/settings/<project>_venv.json`, next to the environments rather
+than inside them, so they survive `vien recreate`.
+"""
+
+from __future__ import annotations
+
+import os
+from pathlib import Path
+from typing import Dict, Optional
+
+# the known settings and their descriptions
+KNOWN = {
+    "pycache": "where the children keep the .pyc files: 'off' (next to the "
+               "sources), 'local' (temp dir), 'shm' (/dev/shm) or "
+               "a directory path",
+    "modindex": "'on' makes the children find the top-level modules with "
+                "an index instead of scanning sys.path",
+}
+
+
+def settings_file(venv_dir: Path) -> Path:
+    return venv_dir.parent / "settings" / (venv_dir.name + ".json")
+
+
+class SettingsError(ValueError):
+    pass
+
+
+def load(venv_dir: Path) -> Dict[str, str]:
+    file = settings_file(venv_dir)
+    try:
+        text = file.read_text()
+    except FileNotFoundError:
+        # the common case: no settings, and no need to import json
+        return {}
+    import json
+    try:
+        settings = json.loads(text)
+    except ValueError as e:
+        raise SettingsError(f"The settings file {file} is malformed: {e}")
+    if not isinstance(settings, dict):
+        raise SettingsError(f"The settings file {file} is malformed.")
+    return settings
+
+
+def get(venv_dir: Path, key: str) -> Optional[str]:
+    return load(venv_dir).get(key)
+
+
+def set_value(venv_dir: Path, key: str, value: Optional[str]) -> None:
+    """Changes the setting. The None value removes it."""
+    import json
+    if key not in KNOWN:
+        raise KeyError(key)
+    settings = load(venv_dir)
+    if value is None:
+        settings.pop(key, None)
+    else:
+        settings[key] = value
+    file = settings_file(venv_dir)
+    file.parent.mkdir(parents=True, exist_ok=True)
+    temp = file.with_name(file.name + ".vien-tmp")
+    temp.write_text(json.dumps(settings, indent=2, sort_keys=True))
+    os.replace(str(temp), str(file))
@@ -0,0 +1,143 @@
+# SPDX-FileCopyrightText: (c) 2022 Artëm IG <github.com/rtmigo>
+# SPDX-License-Identifier: BSD-3-Clause
+
+"""Launchers that run a .py file in the virtual environment without vien.
+
+A file with the `#!/usr/bin/env vien -p .. call -m` shebang starts `env`,
+then vien with its own interpreter, and only then the interpreter of the
+virtual environment. The `vien shebang install` command writes a `sh`
+launcher that does what vien would do, but resolved in advance: it sets
+PYTHONPATH and execs the interpreter of the environment with the module
+name of the file.
+
+The launcher remembers the identity of the environment. After
+`vien recreate` the environment is a different one, and
+`vien shebang check` reports the launcher as stale.
+"""
+
+from __future__ import annotations
+
+import os
+import shlex
+import stat
+from pathlib import Path
+from typing import Dict, Iterator, List, NamedTuple, Optional
+
+from vien._call_funcs import relative_fn_to_module_name, relative_inner_path
+
+_FIRST_LINES = "#!/bin/sh\n# Generated by `vien shebang install`.\n"
+_META_PREFIX = "# vien-"
+
+
+class Launcher(NamedTuple):
+    source: Path
+    project_dir: Path
+    venv_dir: Path
+    venv_id: str
+
+
+def venv_id(venv_dir: Path) -> str:
+    """Returns a string that changes when the environment is recreated,
+    even at the same path."""
+    st = os.stat(str(venv_dir / "pyvenv.cfg"))
+    return f"{st.st_dev}:{st.st_ino}:{st.st_mtime_ns}"
+
+
+def module_name(source: Path, project_dir: Path) -> str:
+    """/abc/project/pkg/main.py -> pkg.main"""
+    return relative_fn_to_module_name(relative_inner_path(source, project_dir))
+
+
+def launcher_text(source: Path, project_dir: Path, venv_dir: Path,
+                  python_exe: Path) -> str:
+    meta = {"source": source, "project-dir": project_dir,
+            "venv": venv_dir, "venv-id": venv_id(venv_dir)}
+    q_project = shlex.quote(str(project_dir))
+    return (_FIRST_LINES
+            + "".join(f"{_META_PREFIX}{k}: {v}\n" for k, v in meta.items())
+            + f'export PYTHONPATH={q_project}'
+              '${PYTHONPATH:+:"$PYTHONPATH"}\n'
+            + f"exec {shlex.quote(str(python_exe))} "
+              f"-m {module_name(source, project_dir)} \"$@\"\n")
+
+
+def default_launcher_path(source: Path) -> Path:
+    """pkg/main.py -> pkg/main"""
+    return source.with_suffix('')
+
+
+def write_executable(path: Path, text: str) -> None:
+    """Writes the script atomically: a running script is never seen
+    half-written."""
+    temp = path.with_name(path.name + ".vien-tmp")
+    temp.write_text(text)
+    mode = os.stat(str(temp)).st_mode
+    os.chmod(str(temp), mode | stat.S_IXUSR | stat.S_IXGRP | stat.S_IXOTH)
+    os.replace(str(temp), str(path))
+
+
+def install(source: Path, project_dir: Path, venv_dir: Path,
+            python_exe: Path, launcher: Path) -> None:
+    write_executable(launcher, launcher_text(source, project_dir, venv_dir,
+                                             python_exe))
+
+
+def read_launcher(path: Path) -> Optional[Launcher]:
+    """Returns the launcher info, or None if the file is not a launcher."""
+    try:
+        with path.open("rb") as f:
+            head = f.read(4096)
+    except OSError:
+        return None
+    if not head.startswith(_FIRST_LINES.encode()):
+        return None
+    meta: Dict[str, str] = {}
+    for line in head.decode(errors="replace").splitlines():
+        if line.startswith(_META_PREFIX):
+            key, _, value = line[len(_META_PREFIX):].partition(": ")
+            meta[key] = value
+    try:
+        return Launcher(source=Path(meta["source"]),
+                        project_dir=Path(meta["project-dir"]),
+                        venv_dir=Path(meta["venv"]),
+                        venv_id=meta["venv-id"])
+    except KeyError:
+        return None
+
+
+def problem(launcher: Launcher) -> Optional[str]:
+    """Returns the reason why the launcher is stale, or None if it is not.
+    """
+    if not launcher.source.exists():
+        return f"{launcher.source} does not exist"
+    if not (launcher.venv_dir / "pyvenv.cfg").exists():
+        return f"{launcher.venv_dir} does not exist"
+    if venv_id(launcher.venv_dir) != launcher.venv_id:
+        return f"{launcher.venv_dir} was recreated"
+    return None
+
+
+def find_launchers(root: Path) -> Iterator[Path]:
+    """Finds the executable launchers in the directory tree, skipping the
+    hidden directories."""
+    for dir_path, dir_names, file_names in os.walk(str(root)):
+        dir_names[:] = [d for d in dir_names if not d.startswith(".")]
+        for name in file_names:
+            path = Path(dir_path, name)
+            if os.access(str(path), os.X_OK) \
+                    and read_launcher(path) is not None:
+                yield path
+
+
+def check(launchers: List[Path]) -> List[str]:
+    """Returns the messages about the stale launchers."""
+    result = []
+    for path in launchers:
+        launcher = read_launcher(path)
+        if launcher is None:
+            result.append(f"{path}: not a launcher")
+            continue
+        reason = problem(launcher)
+        if reason is not None:
+            result.append(f"{path}: stale, {reason}")
+    return result
@@ -0,0 +1,159 @@
+# SPDX-FileCopyrightText: (c) 2022 Artëm IG <github.com/rtmigo>
+# SPDX-License-Identifier: BSD-3-Clause
+
+"""Snapshots of the environments for `vien snapshot` and `vien rollback`.
+
+A snapshot is a copy of the environment, kept in
+`$VIENDIR/snapshots/<project>_venv/<name>`. Where the filesystem supports
+reflinks (Btrfs, XFS and the like), the files are copy-on-write clones:
+the snapshot takes milliseconds and almost no disk space, and a block is
+copied only when the environment writes it. Elsewhere, the files are
+copied.
+
+The files are never hard links to the ones of the environment: a link
+would share the file, so a program (or root, for whom the permissions do
+not matter) writing into it in place would silently change every
+snapshot.
+
+The rollback copies the snapshot the same way (so the snapshot may be
+restored many times) next to the environment, and swaps them with
+`renameat2(RENAME_EXCHANGE)` on Linux, so the environment is always
+there. Elsewhere, the swap is two renames.
+
+Only `$VIEN_SNAPSHOTS_MAX` most recent snapshots of each environment are
+kept.
+"""
+
+from __future__ import annotations
+
+import os
+import shutil
+import stat
+import time
+from pathlib import Path
+from typing import List, Optional
+
+from vien._clone import clone_tree
+from vien._venv_cache import _exclusive_lock
+
+MAX_ENV = "VIEN_SNAPSHOTS_MAX"
+DEFAULT_MAX = 5
+
+
+class SnapshotError(Exception):
+    pass
+
+
+def snapshots_dir(venv_dir: Path) -> Path:
+    return venv_dir.parent / "snapshots" / venv_dir.name
+
+
+def max_snapshots() -> int:
+    try:
+        return max(1, int(os.environ[MAX_ENV]))
+    except (KeyError, ValueError):
+        return DEFAULT_MAX
+
+
+def _check_name(name: str) -> None:
+    if not name or name.startswith(".") or "/" in name \
+            or (os.altsep and os.altsep in name) or os.sep in name:
+        raise SnapshotError(f"Invalid snapshot name: {name!r}")
+
+
+def snapshots(venv_dir: Path) -> List[Path]:
+    """Returns the snapshots of the environment, the oldest first."""
+    root = snapshots_dir(venv_dir)
+    if not root.is_dir():
+        return []
+    # the mtime of the snapshot directory is the time it was taken
+    return sorted((p for p in root.iterdir()
+                   if p.is_dir() and not p.name.startswith(".")),
+                  key=lambda p: p.stat().st_mtime)
+
+
+def _rmtree(path: Path) -> None:
+    def make_writable_and_retry(func, p, exc_info):
+        # read-only files cannot be removed on Windows
+        os.chmod(p, stat.S_IWRITE)
+        func(p)
+
+    shutil.rmtree(str(path), onerror=make_writable_and_retry)
+
+
+def remove_old(venv_dir: Path, keep: Optional[int] = None) -> List[Path]:
+    """Removes the snapshots except the `keep` most recent. Returns the
+    removed ones."""
+    if keep is None:
+        keep = max_snapshots()
+    old = snapshots(venv_dir)[:-keep] if keep > 0 else snapshots(venv_dir)
+    for snapshot in old:
+        _rmtree(snapshot)
+    return old
+
+
+def _real_dir(venv_dir: Path) -> Path:
+    # the environment may be a symlink to $VIEN_FAST_DIR
+    return Path(os.path.realpath(str(venv_dir)))
+
+
+def take(venv_dir: Path, name: Optional[str] = None) -> Path:
+    """Takes a snapshot of the environment and returns it."""
+    if name is None:
+        name = time.strftime("%Y%m%d-%H%M%S")
+    _check_name(name)
+    root = snapshots_dir(venv_dir)
+    with _exclusive_lock(root / ".lock"):
+        snapshot = root / name
+        if snapshot.exists():
+            raise SnapshotError(f"Snapshot {name!r} already exists.")
+        temp = root / f".{name}.vien-tmp"
+        if temp.exists():
+            _rmtree(temp)
+        clone_tree(_real_dir(venv_dir), temp, link=False)
+        os.replace(str(temp), str(snapshot))
+        os.utime(str(snapshot))
+        remove_old(venv_dir)
+    return snapshot
+
+
+def swap(a: Path, b: Path) -> None:
+    """Swaps the two directories, atomically where possible."""
+    from vien import _tier
+    try:
+        _tier.exchange(a, b)
+        return
+    except (_tier.TierError, OSError):
+        pass  # not Linux, or the filesystem cannot exchange
+    away = a.with_name(a.name + ".away")
+    os.rename(str(b), str(away))
+    os.rename(str(a), str(b))
+    os.rename(str(away), str(a))
+
+
+def rollback(venv_dir: Path, name: Optional[str] = None) -> Path:
+    """Restores the environment from the snapshot (by default, the most
+    recent one) and returns the snapshot."""
+    if name is None:
+        existing = snapshots(venv_dir)
+        if not existing:
+            raise SnapshotError(f"There are no snapshots of {venv_dir}.")
+        snapshot = existing[-1]
+    else:
+        _check_name(name)
+        snapshot = snapshots_dir(venv_dir) / name
+        if not snapshot.is_dir():
+            raise SnapshotError(f"Snapshot {name!r} does not exist.")
+    with _exclusive_lock(snapshots_dir(venv_dir) / ".lock"):
+        real = _real_dir(venv_dir)
+        temp = real.with_name(real.name + ".vien-rollback")
+        if temp.exists():
+            _rmtree(temp)
+        clone_tree(snapshot, temp, link=False)
+        if real.exists():
+            swap(temp, real)
+            # the temp path is the replaced environment now
+            _rmtree(temp)
+        else:
+            os.rename(str(temp), str(real))
+    return snapshot
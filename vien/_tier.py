@@ -0,0 +1,263 @@
+# SPDX-FileCopyrightText: (c) 2022 Artëm IG <github.com/rtmigo>
+# SPDX-License-Identifier: BSD-3-Clause
+
+"""Keeping the used environments on a fast local disk (Linux only).
+
+`$VIENDIR` may be on a big but slow network volume. With `$VIEN_FAST_DIR`
+set, an environment is moved to the fast directory when it is used, and
+`$VIENDIR/<project>_venv` becomes a symlink to it. So the path of the
+environment never changes: the scripts, launchers and shims that contain
+it keep working. The environments not used for `$VIEN_TIER_IDLE_DAYS` are
+moved back.
+
+The move is a copy followed by `renameat2(RENAME_EXCHANGE)`, that swaps
+the directory and the symlink atomically: a concurrent `vien call` sees
+either the old or the new location, never a missing one. The moves of the
+same environment are serialized by a lock file.
+
+While a child runs, vien holds a shared lock on another file, and a move
+holds it exclusively from the copy to the removal of the old directory.
+So a child never writes into a directory that is then removed: the move
+waits for the children (or skips an environment in use), and the children
+wait for the move. The idle environments are moved back by a detached
+process, so no command waits for copying them.
+
+The time of the last use is the mtime of the symlink itself, so tracking
+it costs one `utime` call.
+"""
+
+from __future__ import annotations
+
+import errno
+import os
+import shutil
+import sys
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import IO, Iterator, List, Optional
+
+from vien._clone import clone_tree
+
+FAST_DIR_ENV = "VIEN_FAST_DIR"
+IDLE_DAYS_ENV = "VIEN_TIER_IDLE_DAYS"
+DEFAULT_IDLE_DAYS = 7.0
+
+SWEEP_INTERVAL = 3600
+
+_SWEPT_MARKER = ".vien-swept"
+
+# run by a detached interpreter, that may not have vien in its sys.path
+_SWEEP_SCRIPT = ("import sys; from pathlib import Path; "
+                 "sys.path.insert(0, sys.argv[1]); "
+                 "from vien._tier import sweep; "
+                 "sweep(Path(sys.argv[2]), Path(sys.argv[3]))")
+
+_AT_FDCWD = -100
+_RENAME_EXCHANGE = 2
+
+
+class TierError(Exception):
+    pass
+
+
+def fast_dir() -> Optional[Path]:
+    value = os.environ.get(FAST_DIR_ENV)
+    if not value:
+        return None
+    path = Path(os.path.expanduser(os.path.expandvars(value)))
+    if not path.is_absolute():
+        raise TierError(f"${FAST_DIR_ENV} is not an absolute path: {value}")
+    return path
+
+
+def idle_seconds() -> float:
+    try:
+        return float(os.environ[IDLE_DAYS_ENV]) * 86400
+    except (KeyError, ValueError):
+        return DEFAULT_IDLE_DAYS * 86400
+
+
+def fast_path(venv_dir: Path, fast: Path) -> Path:
+    import hashlib
+    # there may be many VIENDIRs with the same project names
+    digest = hashlib.sha1(str(venv_dir).encode()).hexdigest()[:8]
+    return fast / f"{venv_dir.name}-{digest}"
+
+
+def is_promoted(venv_dir: Path) -> bool:
+    return venv_dir.is_symlink()
+
+
+def exchange(a: Path, b: Path) -> None:
+    """Atomically swaps the two paths."""
+    if not sys.platform.startswith("linux"):
+        raise TierError("Moving the environments requires Linux.")
+    import ctypes  # not needed by the runs that do not move anything
+    libc = ctypes.CDLL(None, use_errno=True)
+    renameat2 = getattr(libc, "renameat2", None)
+    if renameat2 is None:
+        raise TierError("The C library does not support renameat2.")
+    if renameat2(_AT_FDCWD, os.fsencode(str(a)), _AT_FDCWD,
+                 os.fsencode(str(b)), _RENAME_EXCHANGE) != 0:
+        e = ctypes.get_errno()
+        raise OSError(e, os.strerror(e), str(a), None, str(b))
+
+
+def _remove(path: Path) -> None:
+    if path.is_symlink() or path.is_file():
+        path.unlink()
+    elif path.is_dir():
+        shutil.rmtree(str(path))
+
+
+def lock_file(venv_dir: Path) -> Path:
+    return venv_dir.with_name(venv_dir.name + ".tier-lock")
+
+
+def use_lock_file(venv_dir: Path) -> Path:
+    return venv_dir.with_name(venv_dir.name + ".tier-use")
+
+
+def remove_lock(venv_dir: Path) -> None:
+    for file in (lock_file(venv_dir), use_lock_file(venv_dir)):
+        try:
+            file.unlink()
+        except FileNotFoundError:
+            pass
+
+
+def _flock(f: IO, operation: int) -> bool:
+    """Returns False if the non-blocking lock is held by another process."""
+    import fcntl
+    try:
+        fcntl.flock(f.fileno(), operation)
+    except OSError as e:
+        if e.errno not in (errno.EAGAIN, errno.EACCES):
+            raise
+        return False
+    return True
+
+
+@contextmanager
+def in_use(venv_dir: Path) -> Iterator[None]:
+    """Keeps the environment from being moved while a child uses it.
+    Waits for the move in progress, if any."""
+    import fcntl
+    try:
+        f = use_lock_file(venv_dir).open("a")
+    except OSError:
+        # a read-only VIENDIR: the environment is not moved anyway
+        yield
+        return
+    with f:
+        _flock(f, fcntl.LOCK_SH)
+        yield
+
+
+@contextmanager
+def _locked(venv_dir: Path, wait: bool) -> Iterator[bool]:
+    """Yields False if another process is moving the environment, or if
+    a child uses it and not `wait`."""
+    import fcntl
+    with lock_file(venv_dir).open("w") as f, \
+            use_lock_file(venv_dir).open("a") as u:
+        if not _flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB) \
+                or not _flock(u, fcntl.LOCK_EX
+                              | (0 if wait else fcntl.LOCK_NB)):
+            yield False
+            return
+        # the leftovers of an interrupted move
+        _remove(venv_dir.with_name(venv_dir.name + ".vien-tmp"))
+        yield True
+
+
+def promote(venv_dir: Path, fast: Path, wait: bool = False) -> bool:
+    """Moves the environment to the fast directory. Returns False if it
+    is already there (or being moved by another process, or used by a
+    child and not `wait`)."""
+    with _locked(venv_dir, wait) as acquired:
+        if not acquired or venv_dir.is_symlink() or not venv_dir.is_dir():
+            return False
+        target = fast_path(venv_dir, fast)
+        fast.mkdir(parents=True, exist_ok=True)
+        _remove(target)
+        temp = venv_dir.with_name(venv_dir.name + ".vien-tmp")
+        clone_tree(venv_dir, target, link=False)
+        os.symlink(str(target), str(temp))
+        exchange(temp, venv_dir)
+        # the temp path is the old directory now
+        shutil.rmtree(str(temp))
+    return True
+
+
+def demote(venv_dir: Path, fast: Path, wait: bool = False) -> bool:
+    """Moves the environment back to VIENDIR. Returns False if it is
+    already there (or being moved by another process, or used by a child
+    and not `wait`)."""
+    with _locked(venv_dir, wait) as acquired:
+        if not acquired or not venv_dir.is_symlink():
+            return False
+        target = Path(os.readlink(str(venv_dir)))
+        if target.parent != fast:
+            raise TierError(f"{venv_dir} is a symlink not made by vien.")
+        temp = venv_dir.with_name(venv_dir.name + ".vien-tmp")
+        clone_tree(target, temp, link=False)
+        exchange(temp, venv_dir)
+        # the temp path is the symlink now
+        temp.unlink()
+        shutil.rmtree(str(target))
+    return True
+
+
+def remove_promoted(venv_dir: Path) -> None:
+    """Deletes the environment moved to the fast directory."""
+    target = Path(os.readlink(str(venv_dir)))
+    venv_dir.unlink()
+    if target.is_dir():
+        shutil.rmtree(str(target))
+
+
+def touch(venv_dir: Path) -> None:
+    """Records the use of the promoted environment."""
+    os.utime(str(venv_dir), follow_symlinks=False)
+
+
+def sweep(vien_dir: Path, fast: Path,
+          idle: Optional[float] = None) -> List[Path]:
+    """Moves back the environments that were not used for `idle` seconds,
+    except the ones in use. Returns the moved ones."""
+    if idle is None:
+        idle = idle_seconds()
+    now = time.time()
+    result = []
+    for entry in sorted(vien_dir.glob("*_venv")):
+        try:
+            if entry.is_symlink() \
+                    and now - os.lstat(str(entry)).st_mtime > idle \
+                    and demote(entry, fast):
+                result.append(entry)
+        except (OSError, TierError):
+            continue
+    return result
+
+
+def start_sweep_if_due(vien_dir: Path, fast: Path) -> bool:
+    """Starts the sweep in a detached process, if there was none for
+    SWEEP_INTERVAL. Returns whether it was started."""
+    marker = fast / _SWEPT_MARKER
+    try:
+        if time.time() - os.stat(str(marker)).st_mtime < SWEEP_INTERVAL:
+            return False
+    except FileNotFoundError:
+        pass
+    if not fast.is_dir():
+        return False
+    marker.touch()
+    import subprocess
+    subprocess.Popen(
+        [sys.executable, "-c", _SWEEP_SCRIPT,
+         str(Path(__file__).parent.parent), str(vien_dir), str(fast)],
+        stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL, start_new_session=True)
+    return True
@@ -0,0 +1,101 @@
+# SPDX-FileCopyrightText: (c) 2022 Artëm IG <github.com/rtmigo>
+# SPDX-License-Identifier: BSD-3-Clause
+
+# This module is imported before any other part of vien, so the moment of
+# its import is the start of the "import" phase. It must not import vien
+# modules itself.
+
+from __future__ import annotations
+
+import time
+
+_IMPORT_STARTED_NS = time.perf_counter_ns()
+
+import os  # noqa: E402
+import sys  # noqa: E402
+from typing import List, Optional, Tuple  # noqa: E402
+
+TRACE_ENV = "VIEN_TRACE"
+
+
+class NullTracer:
+    """The tracer used when VIEN_TRACE is not set. All calls are no-op."""
+
+    enabled = False
+
+    def phase(self, name: str) -> None:
+        pass
+
+    def flush(self) -> None:
+        pass
+
+
+class Tracer:
+    """Measures the phases of vien's own work and writes them as
+    JSON lines.
+
+    Each call to `phase` ends the current phase and starts the next one.
+    The destination is either "stderr" or a file path, to which the lines
+    are appended.
+    """
+
+    enabled = True
+
+    def __init__(self, destination: str,
+                 started_ns: Optional[int] = None):
+        self.destination = destination
+        self.started_ns = time.perf_counter_ns() \
+            if started_ns is None else started_ns
+        self._last_ns = self.started_ns
+        self.events: List[Tuple[str, int, int]] = list()
+
+    def phase(self, name: str) -> None:
+        now = time.perf_counter_ns()
+        self.events.append((name, self._last_ns, now))
+        self._last_ns = now
+
+    def lines(self) -> List[str]:
+        import json  # not imported at startup unless tracing is enabled
+        pid = os.getpid()
+        result = [
+            json.dumps({"pid": pid,
+                        "phase": name,
+                        "start_ns": start - self.started_ns,
+                        "duration_ns": end - start},
+                       separators=(',', ':'))
+            for name, start, end in self.events]
+        if self.events:
+            result.append(json.dumps(
+                {"pid": pid,
+                 "phase": "total",
+                 "start_ns": 0,
+                 "duration_ns": self.events[-1][2] - self.started_ns},
+                separators=(',', ':')))
+        return result
+
+    def flush(self) -> None:
+        text = "".join(line + "\n" for line in self.lines())
+        self.events.clear()
+        if not text:
+            return
+        if self.destination.lower() in ("1", "stderr"):
+            sys.stderr.write(text)
+            sys.stderr.flush()
+        else:
+            try:
+                with open(self.destination, "a", encoding="utf-8") as f:
+                    f.write(text)
+            except OSError as e:
+                # the trace is not worth replacing the exit code of the
+                # command
+                print(f"Failed to write the trace: {e}", file=sys.stderr)
+
+
+def tracer_from_env():
+    destination = os.environ.get(TRACE_ENV)
+    if not destination or destination == "0":
+        return NullTracer()
+    return Tracer(destination, started_ns=_IMPORT_STARTED_NS)
+
+
+tracer = tracer_from_env()
@@ -0,0 +1,222 @@
+# SPDX-FileCopyrightText: (c) 2022 Artëm IG <github.com/rtmigo>
+# SPDX-License-Identifier: BSD-3-Clause
+
+"""Moving an environment to another interpreter for `vien upgrade-python`.
+
+A new environment is created next to the old one. The pure-Python
+distributions (the wheels tagged `py3-none-any` and the like) do not
+depend on the interpreter, so their files, as listed in the RECORD, are
+linked into the new site-packages as they are. Only the shebangs naming a
+versioned interpreter (`bin/python3.9`) are rewritten, with their hashes
+in the RECORD files. The other
+distributions are installed again, of the same versions, preferring the
+wheels in the local wheel directory.
+
+The new environment replaces the old one only when everything is done,
+with an atomic swap, so a failed upgrade leaves the old environment as it
+was. Then the distributions are byte-compiled for the new interpreter;
+a failure there does not undo the upgrade, the bytecode is only written
+later, by the interpreter itself.
+
+The files in site-packages that are not listed in any RECORD are not
+carried over. The ones written by vien itself (the module index) are
+restored by the next run.
+"""
+
+from __future__ import annotations
+
+import csv
+import os
+import re
+import shutil
+import subprocess
+from email.parser import HeaderParser
+from pathlib import Path
+from typing import Dict, List, NamedTuple, Optional
+
+from vien._clone import _link_or_copy, relocate_venv
+from vien._compile import site_packages_dirs, compile_trees
+from vien._core import venv_dir_to_python_exe, get_wheels_dir
+from vien._integrity import update_records
+from vien._pycache import child_prefix
+from vien._snapshot import swap
+
+_VERSIONED_PYTHON = re.compile(rb"/bin/python\d+\.\d+\b")
+
+
+class UpgradeError(Exception):
+    pass
+
+
+class Distribution(NamedTuple):
+    name: str
+    version: str
+    dist_info: Path
+    pure: bool
+
+
+class UpgradeResult(NamedTuple):
+    carried: List[str]
+    reinstalled: List[str]
+    # installed without a .dist-info (by `setup.py develop` and the like)
+    lost: List[str]
+    python_exe: Path
+    # the upgrade is done, but the distributions were not byte-compiled
+    compile_error: Optional[str] = None
+
+
+def normalize(name: str) -> str:
+    return re.sub(r"[-_.]+", "-", name).lower()
+
+
+def _headers(file: Path):
+    return HeaderParser().parsestr(file.read_text(encoding="utf-8"))
+
+
+def is_pure(wheel_file: Path) -> bool:
+    """Whether the distribution was installed from a wheel that works with
+    any Python 3 interpreter."""
+    try:
+        wheel = _headers(wheel_file)
+    except FileNotFoundError:
+        return False  # not installed from a wheel
+    if str(wheel.get("Root-Is-Purelib", "")).strip().lower() != "true":
+        return False
+    tags = wheel.get_all("Tag") or []
+    for tag in tags:
+        python, abi, platform = tag.strip().split("-")
+        if abi != "none" or platform != "any" \
+                or not all(p.startswith("py") for p in python.split(".")):
+            return False
+    return bool(tags)
+
+
+def distributions(site: Path) -> List[Distribution]:
+    result = []
+    for dist_info in sorted(site.glob("*.dist-info")):
+        try:
+            metadata = _headers(dist_info / "METADATA")
+        except FileNotFoundError:
+            continue
+        result.append(Distribution(
+            name=str(metadata["Name"]), version=str(metadata["Version"]),
+            dist_info=dist_info, pure=is_pure(dist_info / "WHEEL")))
+    return result
+
+
+def _is_inside(path: str, directory: str) -> bool:
+    return path == directory or path.startswith(directory + os.sep)
+
+
+def _fix_shebang(script: Path) -> bool:
+    """Returns whether the script was rewritten."""
+    with script.open("rb") as f:
+        first = f.readline()
+    if not first.startswith(b"#!") or not _VERSIONED_PYTHON.search(first):
+        return False
+    data = script.read_bytes()
+    temp = script.with_name(script.name + ".vien-tmp")
+    temp.write_bytes(_VERSIONED_PYTHON.sub(b"/bin/python", first, count=1)
+                     + data[len(first):])
+    shutil.copymode(str(script), str(temp))
+    os.replace(str(temp), str(script))
+    return True
+
+
+def carry(dist: Distribution, old_venv: Path, new_venv: Path,
+          rewritten: List[Path]) -> int:
+    """Links the files of the distribution into the new environment.
+    Adds the scripts with rewritten shebangs to `rewritten`. Returns the
+    number of files."""
+    old_site = str(dist.dist_info.parent)
+    new_site = str(site_packages_dirs(new_venv)[0])
+    count = 0
+    with (dist.dist_info / "RECORD").open(newline="") as f:
+        for row in csv.reader(f):
+            if not row:
+                continue
+            src = os.path.normpath(os.path.join(old_site, row[0]))
+            if src.endswith(".pyc") or not os.path.lexists(src):
+                continue  # compiled by the new interpreter later
+            if _is_inside(src, old_site):
+                dst = os.path.join(new_site, os.path.relpath(src, old_site))
+            elif _is_inside(src, str(old_venv)):
+                dst = os.path.join(str(new_venv),
+                                   os.path.relpath(src, str(old_venv)))
+            else:
+                continue  # outside the environment
+            os.makedirs(os.path.dirname(dst), exist_ok=True)
+            _link_or_copy(src, dst, link=True)
+            if os.path.basename(os.path.dirname(dst)) == "bin" \
+                    and _fix_shebang(Path(dst)):
+                rewritten.append(Path(dst))
+            count += 1
+    return count
+
+
+def upgrade(venv_dir: Path, interpreter: str,
+            find_links: Optional[Path] = None) -> UpgradeResult:
+    """Recreates the environment with the `interpreter`, keeping the
+    installed distributions."""
+    from vien import _layers, _pack
+    if _layers.base_of(venv_dir) is not None:
+        raise UpgradeError("The environment is layered on a base: "
+                           "recreate it after upgrading the base.")
+    if _pack.is_packed(venv_dir):
+        raise UpgradeError("The environment is packed: "
+                           "run 'vien unpack' first.")
+    if find_links is None and get_wheels_dir().is_dir():
+        find_links = get_wheels_dir()
+
+    # the environment may be a symlink to $VIEN_FAST_DIR
+    real = Path(os.path.realpath(str(venv_dir)))
+    temp = real.with_name(real.name + ".vien-upgrade")
+    if temp.exists():
+        shutil.rmtree(str(temp))
+    try:
+        subprocess.run([interpreter, "-m", "venv", str(temp)], check=True,
+                       stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
+        present = {normalize(d.name)
+                   for d in distributions(site_packages_dirs(temp)[0])}
+        carried: List[str] = []
+        rewritten: List[Path] = []
+        to_reinstall: Dict[str, str] = {}
+        lost: List[str] = []
+        for site in site_packages_dirs(real):
+            lost += sorted(p.name[:-len(".egg-info")]
+                           for p in site.glob("*.egg-info"))
+            for dist in distributions(site):
+                if normalize(dist.name) in present:
+                    continue  # pip of the new interpreter
+                if dist.pure:
+                    carry(dist, real, temp, rewritten)
+                    carried.append(f"{dist.name}=={dist.version}")
+                else:
+                    to_reinstall[dist.name] = dist.version
+        # the RECORD files are carried as links: rewritten, not modified
+        update_records(temp, rewritten)
+        reinstalled = [f"{n}=={v}" for n, v in sorted(to_reinstall.items())]
+        if reinstalled:
+            args = [str(venv_dir_to_python_exe(temp)), "-m", "pip",
+                    "install", "--no-deps", "--disable-pip-version-check",
+                    "--quiet"]
+            if find_links is not None:
+                args += ["--find-links", str(find_links)]
+            subprocess.run(args + reinstalled, check=True)
+        swap(temp, real)
+    except BaseException:
+        shutil.rmtree(str(temp), ignore_errors=True)
+        raise
+    # the temp path is the old environment now
+    shutil.rmtree(str(temp))
+    relocate_venv(real, temp)
+    compile_error = None
+    try:
+        compile_trees(venv_dir, site_packages_dirs(venv_dir),
+                      pycache_prefix=child_prefix(venv_dir))
+    except (subprocess.CalledProcessError, OSError, ValueError) as e:
+        compile_error = str(e)
+    return UpgradeResult(carried=sorted(carried), reinstalled=reinstalled,
+                         lost=lost,
+                         python_exe=venv_dir_to_python_exe(venv_dir),
+                         compile_error=compile_error)
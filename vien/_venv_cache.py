@@ -0,0 +1,131 @@
+# SPDX-FileCopyrightText: (c) 2022 Artëm IG <github.com/rtmigo>
+# SPDX-License-Identifier: BSD-3-Clause
+
+"""Content-keyed cache of pristine virtual environments, cloned with hard
+links. Used by `vien.testing` and by `vien run --ephemeral`."""
+
+from __future__ import annotations
+
+import hashlib
+import os
+import shutil
+import stat
+import subprocess
+import sys
+import tempfile
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Optional, Sequence
+
+from vien._clone import clone_venv
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None  # type: ignore
+
+CACHE_ENV = "VIEN_TESTING_CACHE"
+
+_COMPLETE_MARKER = ".vien-testing-complete"
+
+# increase when the way of building the environments changes
+_LAYOUT_VERSION = "1"
+
+
+def default_cache_dir() -> Path:
+    from_env = os.environ.get(CACHE_ENV)
+    if from_env:
+        return Path(os.path.expanduser(from_env))
+    uid = os.getuid() if hasattr(os, "getuid") else "user"
+    return Path(tempfile.gettempdir()) / f"vien-testing-cache-{uid}"
+
+
+def _make_read_only(path: Path) -> None:
+    no_write = ~(stat.S_IWUSR | stat.S_IWGRP | stat.S_IWOTH)
+    for root, _, files in os.walk(str(path)):
+        for name in files:
+            file = os.path.join(root, name)
+            if not os.path.islink(file):
+                os.chmod(file, os.stat(file).st_mode & no_write)
+
+
+@contextmanager
+def _exclusive_lock(lock_file: Path):
+    lock_file.parent.mkdir(parents=True, exist_ok=True)
+    with lock_file.open("a") as f:
+        if fcntl is not None:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+
+class VenvCache:
+    """Content-keyed storage of pristine virtual environments."""
+
+    def __init__(self, cache_dir: Optional[Path] = None):
+        self.cache_dir = cache_dir if cache_dir is not None \
+            else default_cache_dir()
+
+    def key(self, interpreter: str, requirements: Sequence[str]) -> str:
+        real = os.path.realpath(shutil.which(interpreter) or interpreter)
+        st = os.stat(real)
+        h = hashlib.sha256()
+        for part in [_LAYOUT_VERSION, real, str(st.st_size),
+                     str(st.st_mtime_ns)] + sorted(requirements):
+            h.update(part.encode())
+            h.update(b"\0")
+        return h.hexdigest()[:24]
+
+    def get(self, interpreter: Optional[str] = None,
+            requirements: Sequence[str] = ()) -> Path:
+        """Returns the path to the pristine environment, building it first
+        if it is not cached yet. The returned environment must not be
+        modified."""
+        if interpreter is None:
+            interpreter = sys.executable
+        key = self.key(interpreter, requirements)
+        venv_dir = self.cache_dir / key
+        if (venv_dir / _COMPLETE_MARKER).exists():
+            return venv_dir
+
+        with _exclusive_lock(self.cache_dir / (key + ".lock")):
+            # another process could build it while we were waiting
+            if (venv_dir / _COMPLETE_MARKER).exists():
+                return venv_dir
+            if venv_dir.exists():
+                # the build was interrupted
+                shutil.rmtree(str(venv_dir))
+            self._build(venv_dir, interpreter, requirements)
+            _make_read_only(venv_dir)
+            (venv_dir / _COMPLETE_MARKER).touch()
+        return venv_dir
+
+    def _build(self, venv_dir: Path, interpreter: str,
+               requirements: Sequence[str]) -> None:
+        subprocess.run([interpreter, "-m", "venv", str(venv_dir)],
+                       check=True, stdout=subprocess.DEVNULL)
+        if requirements:
+            # importing here to avoid circular imports
+            from vien._core import venv_dir_to_python_exe
+            subprocess.run([str(venv_dir_to_python_exe(venv_dir)),
+                            "-m", "pip", "install", "--quiet"]
+                           + list(requirements), check=True)
+
+    def clone(self, venv_dir: Path, interpreter: Optional[str] = None,
+              requirements: Sequence[str] = ()) -> Path:
+        """Creates a virtual environment at `venv_dir` as a clone of the
+        cached one."""
+        clone_venv(self.get(interpreter, requirements), venv_dir)
+        marker = venv_dir / _COMPLETE_MARKER
+        if marker.exists():
+            marker.unlink()
+        return venv_dir
+
+    def clear(self) -> None:
+        if self.cache_dir.exists():
+            # the files are read-only, but the directories are not, so
+            # rmtree can remove them
+            shutil.rmtree(str(self.cache_dir))
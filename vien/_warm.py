@@ -0,0 +1,152 @@
+# SPDX-FileCopyrightText: (c) 2022 Artëm IG <github.com/rtmigo>
+# SPDX-License-Identifier: BSD-3-Clause
+
+"""The `warm` command: loading the files of the virtual environment into
+the page cache, so the next start does not wait for the disk.
+
+Each file gets `posix_fadvise(WILLNEED)`, which starts the readahead
+without waiting for it. Before that, `mincore` tells how much of the file
+was already in memory. On systems without them (such as macOS) the files
+are just read.
+"""
+
+from __future__ import annotations
+
+import ctypes
+import ctypes.util
+import mmap
+import os
+import stat
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Iterable, List, NamedTuple, Optional, Set, Tuple
+
+_READ_CHUNK = 1024 * 1024
+
+
+class WarmResult(NamedTuple):
+    files: int
+    bytes: int
+    # None if unknown
+    resident_bytes: Optional[int]
+
+
+class _Mincore:
+    """Counts the resident pages of a file with mmap and mincore."""
+
+    def __init__(self):
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or None,
+                           use_errno=True)
+        self.mmap = libc.mmap
+        self.mmap.restype = ctypes.c_void_p
+        self.mmap.argtypes = [ctypes.c_void_p, ctypes.c_size_t, ctypes.c_int,
+                              ctypes.c_int, ctypes.c_int, ctypes.c_long]
+        self.munmap = libc.munmap
+        self.munmap.argtypes = [ctypes.c_void_p, ctypes.c_size_t]
+        self.mincore = libc.mincore
+        self.mincore.argtypes = [ctypes.c_void_p, ctypes.c_size_t,
+                                 ctypes.c_char_p]
+        self.page_size = mmap.PAGESIZE
+
+    def resident_bytes(self, fd: int, size: int) -> Optional[int]:
+        if size == 0:
+            return 0
+        address = self.mmap(None, size, mmap.PROT_READ, mmap.MAP_SHARED, fd,
+                            0)
+        if address is None or address == ctypes.c_void_p(-1).value:
+            return None
+        try:
+            pages = (size + self.page_size - 1) // self.page_size
+            vector = ctypes.create_string_buffer(pages)
+            if self.mincore(address, size, vector) != 0:
+                return None
+            resident = sum(b & 1 for b in vector.raw)
+        finally:
+            self.munmap(address, size)
+        return min(resident * self.page_size, size)
+
+
+def _mincore() -> Optional[_Mincore]:
+    if not sys.platform.startswith("linux"):
+        return None
+    try:
+        return _Mincore()
+    except (OSError, AttributeError):
+        return None
+
+
+def venv_files(venv_dir: Path) -> List[Path]:
+    """Returns the regular files of the environment. The symlinks (such as
+    bin/python) are followed, each file is listed once."""
+    seen: Set[Tuple[int, int]] = set()
+    result = []
+    for root, dirs, names in os.walk(str(venv_dir)):
+        dirs.sort()
+        for name in sorted(names):
+            path = os.path.join(root, name)
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue
+            key = (st.st_dev, st.st_ino)
+            if stat.S_ISREG(st.st_mode) and key not in seen:
+                seen.add(key)
+                result.append(Path(path))
+    return result
+
+
+def read_file_list(file: Path) -> List[Path]:
+    """Reads the paths (one per line) saved from a previous run."""
+    return [Path(line) for line in file.read_text().splitlines()
+            if line.strip() and not line.startswith("#")]
+
+
+def _warm_file(path: Path,
+               mincore: Optional[_Mincore]) -> Tuple[int, Optional[int]]:
+    try:
+        fd = os.open(str(path), os.O_RDONLY)
+    except OSError:
+        return 0, 0
+    try:
+        size = os.fstat(fd).st_size
+        resident = None
+        if mincore is not None:
+            resident = mincore.resident_bytes(fd, size)
+        if hasattr(os, "posix_fadvise"):
+            os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_WILLNEED)
+        else:
+            while os.read(fd, _READ_CHUNK):
+                pass
+        return size, resident
+    finally:
+        os.close(fd)
+
+
+def warm(files: Iterable[Path], jobs: int = 0) -> WarmResult:
+    mincore = _mincore()
+    files = list(files)
+    # the threads are waiting for the syscalls, not for the GIL
+    with ThreadPoolExecutor(max_workers=jobs or None) as executor:
+        results = list(executor.map(lambda p: _warm_file(p, mincore), files))
+    resident: Optional[int] = None
+    counted = [r for _, r in results if r is not None]
+    if mincore is not None and len(counted) == len(results):
+        resident = sum(counted)
+    return WarmResult(files=len(files),
+                      bytes=sum(size for size, _ in results),
+                      resident_bytes=resident)
+
+
+def _mib(n: int) -> str:
+    return f"{n / (1024 * 1024):.1f} MiB"
+
+
+def format_result(result: WarmResult) -> str:
+    text = f"Warmed {result.files} files, {_mib(result.bytes)}."
+    if result.resident_bytes is not None:
+        percent = 100 * result.resident_bytes / result.bytes \
+            if result.bytes else 100
+        text += f" {_mib(result.resident_bytes)} ({percent:.0f}%) " \
+                f"were already in memory."
+    return text
@@ -0,0 +1,268 @@
+# SPDX-FileCopyrightText: (c) 2022 Artëm IG <github.com/rtmigo>
+# SPDX-License-Identifier: BSD-3-Clause
+
+"""The `call --watch` mode: restarting the child each time the project files
+change.
+
+The changes are detected with Linux inotify, called through ctypes. The venv,
+the interpreter and the environment variables are resolved once for the
+whole session, so a restart costs only the start of the child.
+"""
+
+from __future__ import annotations
+
+import ctypes
+import ctypes.util
+import errno
+import fnmatch
+import os
+import select
+import signal
+import struct
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+WATCH_IGNORE_ENV = "VIEN_WATCH_IGNORE"
+
+# matched against the names of files and directories (not the paths)
+DEFAULT_IGNORE = (".*", "__pycache__", "*.pyc", "*.pyo", "*~", "*.swp",
+                  "*_venv", "*.egg-info", "node_modules", "build", "dist")
+
+# the time without changes after which a burst of changes (like saving many
+# files at once or switching a git branch) is considered finished
+DEBOUNCE_SECONDS = 0.2
+
+# the time the child has to exit after SIGTERM, before we send SIGKILL
+TERMINATE_SECONDS = 2.0
+
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+IN_ISDIR = 0x40000000
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+
+_WATCH_MASK = (IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE
+               | IN_DELETE | IN_DELETE_SELF | IN_ONLYDIR)
+
+_EVENT_HEADER = struct.Struct("iIII")  # wd, mask, cookie, len
+
+
+class WatchNotSupported(Exception):
+    pass
+
+
+Event = Tuple[int, int, str]  # wd, mask, name
+
+
+def parse_events(buffer: bytes) -> List[Event]:
+    """Parses the `struct inotify_event` records read from the descriptor.
+    """
+    result = []
+    pos = 0
+    while pos + _EVENT_HEADER.size <= len(buffer):
+        wd, mask, _, length = _EVENT_HEADER.unpack_from(buffer, pos)
+        pos += _EVENT_HEADER.size
+        name = buffer[pos:pos + length].rstrip(b"\0")
+        pos += length
+        result.append((wd, mask, os.fsdecode(name)))
+    return result
+
+
+def ignore_patterns() -> List[str]:
+    """Returns the default patterns, plus the ones listed in
+    $VIEN_WATCH_IGNORE (separated like the PATH entries)."""
+    extra = os.environ.get(WATCH_IGNORE_ENV, "")
+    return list(DEFAULT_IGNORE) + [p for p in extra.split(os.pathsep) if p]
+
+
+def is_ignored(name: str, patterns: Iterable[str]) -> bool:
+    return any(fnmatch.fnmatchcase(name, p) for p in patterns)
+
+
+def _libc() -> ctypes.CDLL:
+    if not sys.platform.startswith("linux"):
+        raise WatchNotSupported("The watch mode requires Linux inotify.")
+    libc = ctypes.CDLL(ctypes.util.find_library("c") or None, use_errno=True)
+    if not hasattr(libc, "inotify_init1"):
+        raise WatchNotSupported("The C library does not support inotify.")
+    libc.inotify_init1.argtypes = [ctypes.c_int]
+    libc.inotify_add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p,
+                                       ctypes.c_uint32]
+    return libc
+
+
+class DirWatcher:
+    """Watches a directory tree for changes of the files, skipping the
+    ignored names. New subdirectories are watched as they appear."""
+
+    def __init__(self, root: Path, patterns: Sequence[str]):
+        self.root = root
+        self.patterns = patterns
+        self._libc = _libc()
+        self.fd = self._libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            e = ctypes.get_errno()
+            raise OSError(e, os.strerror(e))
+        self._dirs: Dict[int, Path] = {}
+        self._add_tree(root)
+
+    def close(self) -> None:
+        if self.fd >= 0:
+            os.close(self.fd)
+            self.fd = -1
+
+    def __enter__(self) -> DirWatcher:
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def _add_dir(self, path: Path) -> None:
+        wd = self._libc.inotify_add_watch(self.fd, os.fsencode(str(path)),
+                                          _WATCH_MASK)
+        if wd < 0:
+            e = ctypes.get_errno()
+            if e in (errno.ENOENT, errno.ENOTDIR, errno.EACCES):
+                # removed before we got to it, or unreadable
+                return
+            raise OSError(e, os.strerror(e), str(path))
+        self._dirs[wd] = path
+
+    def _add_tree(self, path: Path) -> None:
+        self._add_dir(path)
+        try:
+            entries = list(os.scandir(str(path)))
+        except OSError:
+            return
+        for entry in entries:
+            if entry.is_dir(follow_symlinks=False) \
+                    and not is_ignored(entry.name, self.patterns):
+                self._add_tree(Path(entry.path))
+
+    def _read(self) -> List[Event]:
+        try:
+            return parse_events(os.read(self.fd, 64 * 1024))
+        except BlockingIOError:
+            return []
+
+    def _handle(self, events: List[Event]) -> List[Path]:
+        """Updates the watches and returns the changed paths."""
+        changed = []
+        for wd, mask, name in events:
+            if mask & IN_Q_OVERFLOW:
+                # some events were lost, so we do not know what changed
+                changed.append(self.root)
+                continue
+            if mask & IN_IGNORED:
+                self._dirs.pop(wd, None)
+                continue
+            parent = self._dirs.get(wd)
+            if parent is None:
+                continue
+            if not name:
+                # the event is about the watched directory itself
+                changed.append(parent)
+                continue
+            if is_ignored(name, self.patterns):
+                continue
+            path = parent / name
+            if mask & IN_ISDIR and mask & (IN_CREATE | IN_MOVED_TO):
+                self._add_tree(path)
+            changed.append(path)
+        # creating or rewriting a file produces several events
+        return list(dict.fromkeys(changed))
+
+    def wait(self, timeout: Optional[float]) -> List[Path]:
+        """Waits for changes and returns the changed paths, or an empty list
+        if there were no changes within `timeout` seconds."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            remaining = None if deadline is None \
+                else max(0.0, deadline - time.monotonic())
+            ready, _, _ = select.select([self.fd], [], [], remaining)
+            if not ready:
+                return []
+            changed = self._handle(self._read())
+            if changed:
+                return changed
+
+    def wait_burst(self, timeout: Optional[float],
+                   debounce: float = DEBOUNCE_SECONDS) -> List[Path]:
+        """Like `wait`, but after the first change keeps collecting the
+        changes until there are none for `debounce` seconds."""
+        changed = self.wait(timeout)
+        if changed:
+            while True:
+                more = self.wait(debounce)
+                if not more:
+                    break
+                changed.extend(p for p in more if p not in changed)
+        return changed
+
+
+def _start(args: List[str], cwd: Optional[Path],
+           env: Optional[Dict[str, str]]) -> subprocess.Popen:
+    # in a new session the child and all its children can be killed together
+    return subprocess.Popen(args, cwd=None if cwd is None else str(cwd),
+                            env=env, start_new_session=True)
+
+
+def _stop(process: subprocess.Popen) -> None:
+    if process.poll() is not None:
+        return
+    for sig, timeout in ((signal.SIGTERM, TERMINATE_SECONDS),
+                         (signal.SIGKILL, None)):
+        try:
+            os.killpg(process.pid, sig)
+        except ProcessLookupError:
+            pass
+        try:
+            process.wait(timeout)
+            return
+        except subprocess.TimeoutExpired:
+            pass
+
+
+def _relative(path: Path, root: Path) -> str:
+    try:
+        return str(path.relative_to(root))
+    except ValueError:
+        return str(path)
+
+
+def watch_call(args: List[str], watch_dir: Path, *,
+               cwd: Optional[Path] = None,
+               env: Optional[Dict[str, str]] = None,
+               debounce: float = DEBOUNCE_SECONDS) -> None:
+    """Runs the `args` and restarts them each time the files in `watch_dir`
+    change. Returns only by an exception, like KeyboardInterrupt."""
+    with DirWatcher(watch_dir, ignore_patterns()) as watcher:
+        while True:
+            process = _start(args, cwd, env)
+            try:
+                while True:
+                    # while the child runs, we check now and then whether
+                    # it finished, to report the exit code
+                    changed = watcher.wait_burst(0.25, debounce)
+                    if changed:
+                        break
+                    if process.poll() is not None:
+                        print(f"Exited with code {process.returncode}. "
+                              f"Waiting for changes...", file=sys.stderr)
+                        changed = watcher.wait_burst(None, debounce)
+                        break
+            finally:
+                _stop(process)
+            names = sorted(set(_relative(p, watch_dir) for p in changed))
+            shown = ", ".join(names[:3]) + (", ..." if len(names) > 3 else "")
+            print(f"Changed: {shown}. Restarting...", file=sys.stderr)
@@ -0,0 +1,320 @@
+# SPDX-FileCopyrightText: (c) 2022 Artëm IG <github.com/rtmigo>
+# SPDX-License-Identifier: BSD-3-Clause
+
+"""Installing downloaded wheels without pip, for `vien install-wheels`.
+
+Pip spends most of the time of installing a wheel on things that are not
+needed when the set of wheels is already resolved: starting, checking the
+dependencies and the compatibility, building the install plan. This
+installer only unpacks. The wheels are unpacked concurrently by a thread
+pool (decompressing and writing release the GIL), and then byte-compiled
+by the compile worker running the interpreter of the environment, in
+parallel too.
+
+The layout follows the wheel specification: the files of the `.data`
+directory go to the scheme paths, the `#!python` shebangs are replaced
+with the interpreter of the environment, the console scripts of the
+`entry_points.txt` get launchers, and the RECORD is rewritten with the
+installed files. A distribution installed before is uninstalled first.
+
+Nothing is resolved or checked: the wheels are trusted to be compatible
+with the environment and with each other.
+"""
+
+from __future__ import annotations
+
+import base64
+import configparser
+import csv
+import hashlib
+import io
+import os
+import re
+import shutil
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path, PurePosixPath
+from typing import Dict, Iterable, List, NamedTuple, Optional, Set, \
+    Tuple
+
+from vien._common import is_posix
+from vien._compile import site_packages_dirs
+from vien._core import venv_dir_to_python_exe
+
+INSTALLER = "vien"
+
+_CHUNK = 1 << 20
+
+# the same as the launchers written by pip
+_LAUNCHER = """# -*- coding: utf-8 -*-
+import re
+import sys
+from {module} import {import_name}
+if __name__ == "__main__":
+    sys.argv[0] = re.sub(r'(-script\\.pyw|\\.exe)?$', '', sys.argv[0])
+    sys.exit({call}())
+"""
+
+
+class WheelError(Exception):
+    pass
+
+
+class InstallResult(NamedTuple):
+    installed: List[str]
+    files: int
+
+
+def normalize(name: str) -> str:
+    return re.sub(r"[-_.]+", "-", name).lower()
+
+
+def wheel_files(paths: Iterable[Path]) -> List[Path]:
+    """Returns the wheels: the files and the .whl files in the
+    directories."""
+    result = []
+    for path in paths:
+        if path.is_dir():
+            result.extend(sorted(path.glob("*.whl")))
+        else:
+            result.append(path)
+    return result
+
+
+def _record_hash(digest: bytes) -> str:
+    return "sha256=" + base64.urlsafe_b64encode(digest).decode() \
+        .rstrip("=")
+
+
+class _Scheme:
+    """Where the parts of a wheel go."""
+
+    def __init__(self, venv_dir: Path):
+        self.venv_dir = venv_dir
+        self.site = site_packages_dirs(venv_dir)[0]
+        self.scripts = venv_dir / ("bin" if is_posix else "Scripts")
+        self.python = venv_dir_to_python_exe(venv_dir)
+
+    def target(self, member: str, data_dir: str, name: str) -> Path:
+        parts = PurePosixPath(member).parts
+        if not parts or member.startswith("/") or ".." in parts \
+                or ":" in parts[0]:
+            raise WheelError(f"Unsafe path in the wheel: {member}")
+        if parts[0] != data_dir:
+            return self.site.joinpath(*parts)
+        if len(parts) < 3:
+            raise WheelError(f"Unexpected path in the wheel: {member}")
+        key, rest = parts[1], parts[2:]
+        if key in ("purelib", "platlib"):
+            return self.site.joinpath(*rest)
+        if key == "scripts":
+            return self.scripts.joinpath(*rest)
+        if key == "data":
+            return self.venv_dir.joinpath(*rest)
+        if key == "headers":
+            return self.venv_dir.joinpath("include", "site",
+                                          self.site.parent.name, name,
+                                          *rest)
+        raise WheelError(f"Unknown scheme in the wheel: {member}")
+
+
+def _dist_info_dir(z: zipfile.ZipFile, wheel: Path) -> str:
+    names = {PurePosixPath(n).parts[0] for n in z.namelist()
+             if PurePosixPath(n).parts[0].endswith(".dist-info")}
+    if len(names) != 1:
+        raise WheelError(f"{wheel.name}: expected one .dist-info directory")
+    return names.pop()
+
+
+def _write(z: zipfile.ZipFile, info: zipfile.ZipInfo, target: Path,
+           python: Optional[Path], made_dirs: Set[Path]) -> Tuple[str, int]:
+    """Writes the member to the target. With the `python`, replaces the
+    `#!python` shebang. Returns the hash and the size."""
+    if target.parent not in made_dirs:
+        target.parent.mkdir(parents=True, exist_ok=True)
+        made_dirs.add(target.parent)
+    try:
+        target.unlink()  # maybe a hard link to a snapshot
+    except FileNotFoundError:
+        pass
+    h = hashlib.sha256()
+    size = 0
+    with z.open(info) as src, target.open("wb") as dst:
+        first = True
+        while True:
+            chunk = src.read(_CHUNK)
+            if not chunk:
+                break
+            if first and python is not None \
+                    and chunk.startswith(b"#!python"):
+                end = chunk.find(b"\n")
+                rest = chunk[end:] if end >= 0 else b"\n"
+                chunk = b"#!" + str(python).encode() + rest
+            first = False
+            h.update(chunk)
+            size += len(chunk)
+            dst.write(chunk)
+    mode = (info.external_attr >> 16) & 0o777
+    if mode & 0o111 or python is not None:
+        target.chmod(0o755)
+    return _record_hash(h.digest()), size
+
+
+def _console_scripts(entry_points: str) -> Dict[str, str]:
+    parser = configparser.ConfigParser(delimiters=("=",))
+    # the names are case-sensitive
+    parser.optionxform = str  # type: ignore[assignment]
+    parser.read_string(entry_points)
+    result: Dict[str, str] = {}
+    for section in ("console_scripts", "gui_scripts"):
+        if parser.has_section(section):
+            result.update(parser.items(section))
+    return result
+
+
+def _launcher(python: Path, spec: str) -> bytes:
+    module, _, attr = spec.partition(":")
+    attr = attr.split("[")[0].strip()  # the extras are ignored
+    if not attr:
+        raise WheelError(f"Invalid entry point: {spec}")
+    return (f"#!{python}\n" + _LAUNCHER.format(
+        module=module.strip(), import_name=attr.split(".")[0],
+        call=attr)).encode()
+
+
+def _relative(path: Path, site: Path) -> str:
+    return Path(os.path.relpath(str(path), str(site))).as_posix()
+
+
+def installed_distributions(site: Path) -> Dict[str, Path]:
+    """Returns the .dist-info directories by the normalized names."""
+    return {normalize(d.name[:-len(".dist-info")].rsplit("-", 1)[0]): d
+            for d in site.glob("*.dist-info")}
+
+
+def _remove(site: Path, dist_info: Path) -> None:
+    dirs = set()
+    try:
+        with (dist_info / "RECORD").open(newline="") as f:
+            rows = [row for row in csv.reader(f) if row]
+    except FileNotFoundError:
+        rows = []
+    for row in rows:
+        path = Path(os.path.normpath(str(site / row[0])))
+        if path.is_symlink() or path.is_file():
+            path.unlink()
+            dirs.add(path.parent)
+            cache = path.parent / "__pycache__"
+            if path.suffix == ".py" and cache.is_dir():
+                for pyc in cache.glob(path.stem + ".*.pyc"):
+                    pyc.unlink()
+                dirs.add(cache)
+    shutil.rmtree(str(dist_info), ignore_errors=True)
+    # the emptied package directories
+    for d in sorted(dirs, key=lambda p: len(p.parts), reverse=True):
+        while site in d.parents and d.is_dir() and not any(d.iterdir()):
+            d.rmdir()
+            d = d.parent
+
+
+def uninstall(site: Path, name: str) -> bool:
+    """Removes the files of the installed distribution. Returns False if
+    it is not installed."""
+    dist_info = installed_distributions(site).get(normalize(name))
+    if dist_info is None:
+        return False
+    _remove(site, dist_info)
+    return True
+
+
+def install_wheel(venv_dir: Path, wheel: Path,
+                  installed: Optional[Dict[str, Path]] = None
+                  ) -> Tuple[str, List[str]]:
+    """Unpacks the wheel into the environment. Returns the name of the
+    distribution and the installed files, relative to site-packages.
+
+    The `installed` are the distributions found in the environment before,
+    to avoid listing site-packages for each wheel."""
+    scheme = _Scheme(venv_dir)
+    if installed is None:
+        installed = installed_distributions(scheme.site)
+    try:
+        z = zipfile.ZipFile(str(wheel))
+    except zipfile.BadZipFile as e:
+        raise WheelError(f"{wheel.name}: {e}")
+    with z:
+        dist_info = _dist_info_dir(z, wheel)
+        name, _, version = dist_info[:-len(".dist-info")].partition("-")
+        data_dir = f"{name}-{version}.data"
+        if normalize(name) in installed:
+            _remove(scheme.site, installed[normalize(name)])
+        records: List[Tuple[str, str, str]] = []
+        made_dirs: Set[Path] = set()
+        for info in z.infolist():
+            if info.is_dir():
+                continue
+            member = info.filename
+            if member == f"{dist_info}/RECORD":
+                continue  # written below
+            target = scheme.target(member, data_dir, name)
+            python = scheme.python \
+                if member.startswith(f"{data_dir}/scripts/") else None
+            digest, size = _write(z, info, target, python, made_dirs)
+            records.append((_relative(target, scheme.site), digest,
+                            str(size)))
+        try:
+            entry_points = z.read(f"{dist_info}/entry_points.txt").decode()
+        except KeyError:
+            entry_points = ""
+
+    for script, spec in _console_scripts(entry_points).items():
+        target = scheme.scripts / script
+        data = _launcher(scheme.python, spec)
+        if target.is_symlink() or target.exists():
+            target.unlink()
+        target.write_bytes(data)
+        target.chmod(0o755)
+        records.append((_relative(target, scheme.site),
+                        _record_hash(hashlib.sha256(data).digest()),
+                        str(len(data))))
+
+    installer = scheme.site / dist_info / "INSTALLER"
+    installer.write_text(INSTALLER + "\n")
+    records.append((_relative(installer, scheme.site), "", ""))
+    records.append((f"{dist_info}/RECORD", "", ""))
+    buffer = io.StringIO()
+    csv.writer(buffer, lineterminator="\n").writerows(records)
+    (scheme.site / dist_info / "RECORD").write_text(buffer.getvalue())
+    return f"{name}=={version}", [r[0] for r in records]
+
+
+def install(venv_dir: Path, wheels: List[Path], jobs: int = 0,
+            compile: bool = True) -> InstallResult:
+    """Installs the wheels concurrently, then byte-compiles them."""
+    if len({normalize(w.name.split("-")[0]) for w in wheels}) != len(wheels):
+        raise WheelError("Several wheels of the same distribution.")
+    site = site_packages_dirs(venv_dir)[0]
+    installed = installed_distributions(site)
+    # the old versions are removed before anything is unpacked: removing
+    # the directories emptied by one of them would race with writing the
+    # files of another wheel into the same directories
+    for wheel in wheels:
+        dist_info = installed.pop(normalize(wheel.name.split("-")[0]), None)
+        if dist_info is not None:
+            _remove(site, dist_info)
+    workers = jobs if jobs > 0 else min(32, (os.cpu_count() or 1) + 4)
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        done = list(pool.map(
+            lambda w: install_wheel(venv_dir, w, installed), wheels))
+    if compile and done:
+        from vien._compile import compile_trees
+        from vien._pycache import child_prefix
+        # only the installed packages and modules, not the whole
+        # site-packages
+        tops = sorted({f.split("/")[0] for _, files in done for f in files
+                       if not f.startswith("../")
+                       and not f.split("/")[0].endswith(".dist-info")})
+        compile_trees(venv_dir, [site / t for t in tops], jobs=jobs,
+                      pycache_prefix=child_prefix(venv_dir))
+    return InstallResult(installed=sorted(name for name, _ in done),
+                         files=sum(len(files) for _, files in done))
@@ -0,0 +1,179 @@
+# SPDX-FileCopyrightText: (c) 2022 Artëm IG <github.com/rtmigo>
+# SPDX-License-Identifier: BSD-3-Clause
+
+"""Asyncio API for running many processes in virtual environments
+concurrently.
+
+    import asyncio
+    from vien import aio
+
+    async def main():
+        exit_code = await aio.call("/abc/myProject", ["-m", "pkg/main.py"])
+
+        async with await aio.start_run("/abc/other", ["pytest"],
+                                       stdout=asyncio.subprocess.PIPE) as p:
+            async for line in p.stdout_lines():
+                print(line)
+            await p.wait(timeout=60)
+
+The arguments mean the same as for the `vien call` and `vien run` commands.
+Unlike the command line interface, the functions raise ordinary exceptions
+(subclasses of `VienError`) and return the exit codes of the children.
+
+The children are started in new process sessions. When waiting for
+a child times out or is cancelled, the child is killed together with its
+own children.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import os
+import signal
+from pathlib import Path
+from typing import AsyncIterator, Awaitable, Dict, Iterable, List, \
+    Optional, TypeVar, Union
+
+from vien._common import is_posix, need_posix
+from vien._core import venv_dir_to_python_exe, posix_run_sequence, \
+    bash_sequence_script
+from vien.api import existing_dirs, python_args, child_process_env
+
+T = TypeVar('T')
+
+PathLike = Union[str, Path]
+
+
+class VenvProcess:
+    """A child process running in a virtual environment."""
+
+    def __init__(self, process: asyncio.subprocess.Process):
+        self.process = process
+
+    @property
+    def pid(self) -> int:
+        return self.process.pid
+
+    @property
+    def returncode(self) -> Optional[int]:
+        return self.process.returncode
+
+    def kill(self) -> None:
+        """Kills the process and all the processes of its session."""
+        if self.process.returncode is not None:
+            return
+        try:
+            if is_posix:
+                os.killpg(self.process.pid, signal.SIGKILL)
+            else:
+                self.process.kill()
+        except ProcessLookupError:
+            pass
+
+    async def wait(self, timeout: Optional[float] = None) -> int:
+        """Waits for the process to finish and returns its exit code.
+        On timeout or cancellation kills the process before raising."""
+        try:
+            return await asyncio.wait_for(self.process.wait(), timeout)
+        except BaseException:
+            self.kill()
+            await self.process.wait()
+            raise
+
+    def stdout_lines(self) -> AsyncIterator[bytes]:
+        """Iterates the lines of the output. The process must be started
+        with `stdout=asyncio.subprocess.PIPE`."""
+        if self.process.stdout is None:
+            raise ValueError("The stdout is not a pipe.")
+        return _iter_lines(self.process.stdout)
+
+    def stderr_lines(self) -> AsyncIterator[bytes]:
+        """Iterates the lines of the error output. The process must be
+        started with `stderr=asyncio.subprocess.PIPE`."""
+        if self.process.stderr is None:
+            raise ValueError("The stderr is not a pipe.")
+        return _iter_lines(self.process.stderr)
+
+    async def __aenter__(self) -> VenvProcess:
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        self.kill()
+        await self.process.wait()
+
+
+async def _iter_lines(stream: asyncio.StreamReader) -> AsyncIterator[bytes]:
+    while True:
+        line = await stream.readline()
+        if not line:
+            return
+        yield line
+
+
+async def start_call(project_dir: PathLike, args: List[str], *,
+                     cwd: Optional[PathLike] = None,
+                     env: Optional[Dict[str, str]] = None,
+                     stdin=None, stdout=None, stderr=None) -> VenvProcess:
+    """Starts the Python of the virtual environment, like `vien call`.
+
+    The `args` are the arguments to Python: for example `["main.py"]` or
+    `["-B", "-m", "pkg/main.py", "arg1"]`. The `env` variables are added
+    to the environment of the child."""
+    dirs = existing_dirs(project_dir)
+    python_exe = venv_dir_to_python_exe(dirs.venv_dir)
+    process = await asyncio.create_subprocess_exec(
+        str(python_exe), *python_args(dirs, args, cwd),
+        cwd=None if cwd is None else str(cwd),
+        env=child_process_env(dirs, cwd, env),
+        stdin=stdin, stdout=stdout, stderr=stderr,
+        start_new_session=is_posix)
+    return VenvProcess(process)
+
+
+async def start_run(project_dir: PathLike, command: List[str], *,
+                    cwd: Optional[PathLike] = None,
+                    env: Optional[Dict[str, str]] = None,
+                    stdin=None, stdout=None, stderr=None) -> VenvProcess:
+    """Starts a shell command in the virtual environment, like `vien run`.
+    """
+    need_posix()
+    dirs = existing_dirs(project_dir)
+    script = bash_sequence_script(posix_run_sequence(dirs.venv_dir, command))
+    process = await asyncio.create_subprocess_exec(
+        "/bin/bash", "-c", script,
+        cwd=None if cwd is None else str(cwd),
+        env=child_process_env(dirs, cwd, env),
+        stdin=stdin, stdout=stdout, stderr=stderr,
+        start_new_session=True)
+    return VenvProcess(process)
+
+
+async def call(project_dir: PathLike, args: List[str], *,
+               timeout: Optional[float] = None, **kwargs) -> int:
+    """Runs Python of the virtual environment and returns the exit code.
+    Accepts the same keyword arguments as `start_call`."""
+    process = await start_call(project_dir, args, **kwargs)
+    return await process.wait(timeout)
+
+
+async def run(project_dir: PathLike, command: List[str], *,
+              timeout: Optional[float] = None, **kwargs) -> int:
+    """Runs a shell command in the virtual environment and returns the exit
+    code. Accepts the same keyword arguments as `start_run`."""
+    process = await start_run(project_dir, command, **kwargs)
+    return await process.wait(timeout)
+
+
+async def bounded_gather(aws: Iterable[Awaitable[T]], limit: int) -> List[T]:
+    """Like `asyncio.gather`, but runs at most `limit` awaitables at once.
+
+    Pass coroutines (not tasks) to really limit the number of processes:
+    a coroutine like `call(...)` starts its process only when awaited.
+    """
+    semaphore = asyncio.Semaphore(limit)
+
+    async def bounded(aw: Awaitable[T]) -> T:
+        async with semaphore:
+            return await aw
+
+    return await asyncio.gather(*(bounded(aw) for aw in aws))
@@ -0,0 +1,272 @@
+# SPDX-FileCopyrightText: (c) 2022 Artëm IG <github.com/rtmigo>
+# SPDX-License-Identifier: BSD-3-Clause
+
+"""Library API: the same operations as the `vien` commands, but without
+starting a new interpreter.
+
+    from vien import api
+
+    created = api.create("/abc/myProject")
+    print(created.python_exe)
+
+    result = api.call("/abc/myProject", ["-m", "pkg/main.py"],
+                      capture_output=True)
+    print(result.returncode, result.stdout)
+
+Unlike the command line interface, the functions never print anything and
+never exit the program: they return result objects and raise subclasses of
+`VienError`.
+"""
+
+from __future__ import annotations
+
+import os
+import shutil
+import subprocess
+import sys
+from pathlib import Path
+from typing import Dict, List, NamedTuple, Optional, Union
+
+from vien import _trace
+from vien._core import Dirs, child_env, venv_dir_to_python_exe, \
+    call_module_args, run_sequence_script
+from vien._exceptions import VienError, VenvExistsError, \
+    VenvDoesNotExistError, PyFileNotFoundError, CannotFindExecutableError, \
+    FailedToCreateVenvError, FailedToClearVenvError, PythonNotFoundError, \
+    PyFileArgNotFoundExit
+from vien._parsed_call import ParsedCall
+
+__all__ = ["create", "delete", "recreate", "path", "call", "run",
+           "CreateResult", "ProcessResult",
+           "VienError", "VenvExistsError", "VenvDoesNotExistError",
+           "PyFileNotFoundError", "CannotFindExecutableError",
+           "FailedToCreateVenvError", "FailedToClearVenvError",
+           "PythonNotFoundError"]
+
+PathLike = Union[str, Path]
+
+
+class CreateResult(NamedTuple):
+    project_dir: Path
+    venv_dir: Path
+    python_exe: Path
+
+
+class ProcessResult(NamedTuple):
+    returncode: int
+    # the outputs are None unless captured
+    stdout: Optional[bytes] = None
+    stderr: Optional[bytes] = None
+
+
+def resolve_interpreter(interpreter: Optional[str]) -> str:
+    """Returns the path to the Python executable for the `create` command.
+    The `interpreter` is either a path or a name like "python3.8". If it is
+    None, the current interpreter is used."""
+    if interpreter is None:
+        return sys.executable
+    exe = shutil.which(interpreter)
+    if not exe:
+        raise CannotFindExecutableError(interpreter)
+    return exe
+
+
+def path(project_dir: PathLike = '.') -> Path:
+    """Returns the path of the virtual environment for the project.
+    The environment does not have to exist."""
+    return Dirs(project_dir).venv_dir
+
+
+def existing_dirs(project_dir: PathLike) -> Dirs:
+    dirs = Dirs(project_dir)
+    if not dirs.venv_dir.exists():
+        raise VenvDoesNotExistError(dirs.venv_dir)
+    return dirs
+
+
+def create(project_dir: PathLike = '.',
+           interpreter: Optional[str] = None,
+           base: Optional[PathLike] = None) -> CreateResult:
+    """Creates the environment. With `base` (the directory of another
+    environment), the new one holds only its own packages and sees the
+    packages of the base too. The interpreter is the one of the base."""
+    dirs = Dirs(project_dir)
+    if dirs.venv_dir.exists():
+        raise VenvExistsError(dirs.venv_dir)
+
+    if base is not None:
+        if interpreter is not None:
+            raise ValueError("The interpreter is defined by the base.")
+        base = Path(base)
+        if not base.exists():
+            raise VenvDoesNotExistError(base)
+        args = [str(venv_dir_to_python_exe(base)), "-m", "venv",
+                "--without-pip", str(dirs.venv_dir)]
+    else:
+        args = [resolve_interpreter(interpreter), "-m", "venv",
+                str(dirs.venv_dir)]
+
+    result = subprocess.run(args,
+                            stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
+    if result.returncode != 0:
+        raise FailedToCreateVenvError(
+            dirs.venv_dir, output=result.stdout.decode(errors="replace"))
+    if base is not None:
+        from vien import _layers
+        _layers.layer(dirs.venv_dir, base)
+    return CreateResult(project_dir=dirs.project_dir,
+                        venv_dir=dirs.venv_dir,
+                        python_exe=venv_dir_to_python_exe(dirs.venv_dir))
+
+
+def delete(project_dir: PathLike = '.') -> Path:
+    """Deletes the virtual environment and returns its former path."""
+    venv_dir = existing_dirs(project_dir).venv_dir
+    delete_venv_dir(venv_dir)
+    return venv_dir
+
+
+def delete_venv_dir(venv_dir: Path) -> None:
+    if "_venv" not in venv_dir.name:
+        raise ValueError(venv_dir)
+    if not venv_dir.exists():
+        raise VenvDoesNotExistError(venv_dir)
+    from vien import _tier
+    _tier.remove_lock(venv_dir)
+    if venv_dir.is_symlink():
+        # moved to $VIEN_FAST_DIR
+        _tier.remove_promoted(venv_dir)
+        return
+
+    # todo try to use the same executable that created the environment
+    # If we use sys.executable, we may clear the venv in some incompatible way.
+    # But we can't just use executable from the venv when clearing it:
+    # Windows will fail with [WinError 5] Access is denied: '...python.exe'
+
+    # todo check we are not running the same executable we about to delete
+    # python_exe = venv_dir_to_python_exe(venv_dir)
+    result = subprocess.run(
+        [sys.executable, "-m", "venv", "--clear", str(venv_dir)],
+        capture_output=True, encoding=sys.stdout.encoding)
+    if result.returncode != 0:
+        raise FailedToClearVenvError(venv_dir, stdout=result.stdout,
+                                     stderr=result.stderr)
+    shutil.rmtree(str(venv_dir))
+
+
+def recreate(project_dir: PathLike = '.',
+             interpreter: Optional[str] = None,
+             base: Optional[PathLike] = None) -> CreateResult:
+    """Deletes and creates the environment. Without the `interpreter` and
+    `base`, a layered environment keeps its base."""
+    dirs = Dirs(project_dir)
+    if dirs.venv_dir.exists():
+        if base is None and interpreter is None:
+            from vien import _layers
+            base = _layers.base_of(dirs.venv_dir)
+        delete_venv_dir(dirs.venv_dir)
+    return create(dirs.project_dir, interpreter=interpreter, base=base)
+
+
+def python_args(dirs: Dirs, args: List[str],
+                cwd: Optional[PathLike] = None) -> List[str]:
+    """Converts the arguments of `call` to the arguments to Python:
+    for `-m file.py` the filename is replaced with the module name."""
+    try:
+        parsed = ParsedCall(["call"] + args)
+    except PyFileArgNotFoundExit:
+        raise ValueError("The arguments must include a .py file.")
+    filename = Path(cwd or '.', parsed.filename).absolute()
+    if not filename.exists():
+        raise PyFileNotFoundError(Path(parsed.filename))
+    if parsed.before_filename == "-m":
+        args = ["call"] + args
+        args[parsed.filename_idx] = str(filename)
+        return call_module_args(ParsedCall(args), dirs.project_dir)
+    return args
+
+
+def child_process_env(dirs: Dirs, cwd: Optional[PathLike],
+                      env: Optional[Dict[str, str]]
+                      ) -> Optional[Dict[str, str]]:
+    """Returns the environment variables for a child process, or None if
+    the child can inherit the environment unchanged."""
+    child_cwd = Path(cwd).absolute() if cwd is not None else None
+    result = child_env(dirs.project_dir, cwd=child_cwd,
+                       venv_dir=dirs.venv_dir)
+    if env:
+        result = {**(result if result is not None else os.environ), **env}
+    return result
+
+
+def _run_child(args, *, cwd: Optional[PathLike],
+               env: Optional[Dict[str, str]],
+               input: Optional[bytes], capture_output: bool,
+               timeout: Optional[float], **popen_kwargs) -> ProcessResult:
+    stdin = subprocess.PIPE if input is not None else None
+    output = subprocess.PIPE if capture_output else None
+    # this is what subprocess.run does, but we want to know separately
+    # the time of spawning and the time of running the child
+    with subprocess.Popen(args, cwd=None if cwd is None else str(cwd),
+                          env=env, stdin=stdin, stdout=output, stderr=output,
+                          **popen_kwargs) as process:
+        _trace.tracer.phase("spawn")
+        try:
+            stdout, stderr = process.communicate(input, timeout=timeout)
+        except:  # Including KeyboardInterrupt and TimeoutExpired
+            process.kill()
+            raise
+    _trace.tracer.phase("child")
+    return ProcessResult(process.returncode, stdout, stderr)
+
+
+def call(project_dir: PathLike, args: List[str], *,
+         cwd: Optional[PathLike] = None,
+         env: Optional[Dict[str, str]] = None,
+         input: Optional[bytes] = None,
+         capture_output: bool = False,
+         timeout: Optional[float] = None) -> ProcessResult:
+    """Runs Python of the virtual environment, like `vien call`.
+
+    The `args` are the arguments to Python: for example `["main.py"]` or
+    `["-B", "-m", "pkg/main.py", "arg1"]`. The `env` variables are added
+    to the environment of the child. On timeout the child is killed and
+    `subprocess.TimeoutExpired` is raised."""
+    dirs = existing_dirs(project_dir)
+    _trace.tracer.phase("venv_must_exist")
+    args_to_python = python_args(dirs, args, cwd)
+    _trace.tracer.phase("args_to_python")
+    python_exe = venv_dir_to_python_exe(dirs.venv_dir)
+    _trace.tracer.phase("venv_dir_to_python_exe")
+    return _run_child([str(python_exe)] + args_to_python,
+                      cwd=cwd, env=child_process_env(dirs, cwd, env),
+                      input=input,
+                      capture_output=capture_output, timeout=timeout)
+
+
+def run(project_dir: PathLike, command: List[str], *,
+        cwd: Optional[PathLike] = None,
+        env: Optional[Dict[str, str]] = None,
+        input: Optional[bytes] = None,
+        capture_output: bool = False,
+        timeout: Optional[float] = None) -> ProcessResult:
+    """Runs a shell command in the virtual environment, like `vien run`.
+    Accepts the same keyword arguments as `call`."""
+    return run_in(existing_dirs(project_dir), command, cwd=cwd, env=env,
+                  input=input, capture_output=capture_output,
+                  timeout=timeout)
+
+
+def run_in(dirs: Dirs, command: List[str], *,
+           cwd: Optional[PathLike] = None,
+           env: Optional[Dict[str, str]] = None,
+           input: Optional[bytes] = None,
+           capture_output: bool = False,
+           timeout: Optional[float] = None) -> ProcessResult:
+    """Like `run`, but in the environment of `dirs`, that may be other than
+    the project's one."""
+    script, executable = run_sequence_script(dirs.venv_dir, command)
+    return _run_child(script, shell=True, executable=executable,
+                      cwd=cwd, env=child_process_env(dirs, cwd, env),
+                      input=input,
+                      capture_output=capture_output, timeout=timeout)
@@ -0,0 +1,116 @@
+# SPDX-FileCopyrightText: (c) 2022 Artëm IG <github.com/rtmigo>
+# SPDX-License-Identifier: BSD-3-Clause
+
+"""Helpers for testing code that works with vien virtual environments.
+
+Creating a virtual environment takes seconds, so the helpers build each
+distinct environment only once and then give every test its own clone made
+of hard links, which takes milliseconds.
+
+    from vien.testing import VenvTestCase
+
+    class MyTest(VenvTestCase):
+        def test_something(self):
+            self.create_venv()  # same as `vien create`, but fast
+            ...
+
+The pristine environments are cached in `$VIEN_TESTING_CACHE` (by default,
+a directory in the system temp dir). The cache key is computed from the
+interpreter file and the requirements, so a cached environment is never
+stale. Several test processes can share the cache: an environment is built
+by one of them while the others wait.
+
+The cached files are read-only. The clones share them, so tests must
+replace or delete the files of the environment, but not modify them
+in place.
+"""
+
+from __future__ import annotations
+
+import os
+import shutil
+import tempfile
+import unittest
+from pathlib import Path
+from typing import Optional, Sequence
+
+# the cache is shared with `vien run --ephemeral`
+from vien._venv_cache import VenvCache
+
+_default_cache: Optional[VenvCache] = None
+
+
+def default_cache() -> VenvCache:
+    global _default_cache
+    if _default_cache is None:
+        _default_cache = VenvCache()
+    return _default_cache
+
+
+class TempProject:
+    """Context manager that creates a temporary project directory and
+    a temporary VIENDIR, and makes the project directory the current
+    working directory until exit."""
+
+    def __init__(self, project_name: str = "project",
+                 cache: Optional[VenvCache] = None):
+        self.project_name = project_name
+        self.cache = cache
+        self.temp_dir: Optional[Path] = None
+        self._old_cwd: Optional[str] = None
+        self._old_vien_dir: Optional[str] = None
+
+    @property
+    def vien_dir(self) -> Path:
+        assert self.temp_dir is not None
+        return self.temp_dir / "viendir"
+
+    @property
+    def project_dir(self) -> Path:
+        assert self.temp_dir is not None
+        return self.temp_dir / self.project_name
+
+    @property
+    def venv_dir(self) -> Path:
+        return self.vien_dir / (self.project_name + "_venv")
+
+    def create_venv(self, interpreter: Optional[str] = None,
+                    requirements: Sequence[str] = ()) -> Path:
+        """Does the same as `vien create`, but much faster."""
+        cache = self.cache if self.cache is not None else default_cache()
+        return cache.clone(self.venv_dir, interpreter, requirements)
+
+    def __enter__(self) -> TempProject:
+        self.temp_dir = Path(tempfile.mkdtemp())
+        self.project_dir.mkdir()
+        self.vien_dir.mkdir()
+        self._old_cwd = os.getcwd()
+        self._old_vien_dir = os.environ.get("VIENDIR")
+        os.environ["VIENDIR"] = str(self.vien_dir)
+        os.chdir(str(self.project_dir))
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        assert self._old_cwd is not None and self.temp_dir is not None
+        os.chdir(self._old_cwd)
+        if self._old_vien_dir is None:
+            del os.environ["VIENDIR"]
+        else:
+            os.environ["VIENDIR"] = self._old_vien_dir
+        shutil.rmtree(str(self.temp_dir), ignore_errors=True)
+
+
+class VenvTestCase(unittest.TestCase):
+    """Each test runs inside a fresh `TempProject`."""
+
+    project: TempProject
+
+    def setUp(self):
+        super().setUp()
+        self.project = TempProject()
+        self.project.__enter__()
+        self.addCleanup(self.project.__exit__, None, None, None)
+
+    def create_venv(self, interpreter: Optional[str] = None,
+                    requirements: Sequence[str] = ()) -> Path:
+        return self.project.create_venv(interpreter, requirements)